@@ -33,6 +33,7 @@ setup(name='PyVehiclesDynamics',
 	  version=version,
       download_url='http://github.com/AndreaCensi/dynamics/tarball/%s' % version,
       
+      python_requires='>=3.7',
       package_dir={'':'src'},
       packages=find_packages('src'),
       install_requires=[
@@ -40,6 +41,10 @@ setup(name='PyVehiclesDynamics',
         'PyContracts>=1.2,<2'
       ],
       tests_require=['nose'],
-      entry_points={},
+      entry_points={
+        'console_scripts': [
+            'vehicles_dynamics_bench = vehicles_dynamics.benchmarks:main',
+        ]
+      },
 )
 
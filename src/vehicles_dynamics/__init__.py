@@ -2,15 +2,72 @@ __version__ = '1.1'
 
 import numpy as np
 from contracts import contract
+import importlib
 import logging
 
-logging.basicConfig()
 logger = logging.getLogger("vehicles_dynamics")
-logger.setLevel(logging.DEBUG)
 
 
 from .exceptions import *
+from .validation import *
+from .instrumentation import *
+from .commands_checker import *
 from .interface import *
+from .batch import *
+from .noise import *
+from .step_cache import *
+from .exponentials import *
+from .quaternions import *
+from .compact import *
+from .integrators import *
+from .linearization import *
 from .lie_kinematics import *
 from .lie_dynamics import *
-from .specializations import *
+from .registry import *
+
+# The tools built on the core (which import multiprocessing, asyncio,
+# hashlib, ...) are imported on first use, like the specializations.
+_lazy_modules = {
+    'montecarlo': ['simulate_particles'],
+    'fleet_store': ['FLEET_STORE_VERSION', 'FleetSnapshot', 'FleetStore'],
+    'service': ['SimulationService', 'ServiceClient', 'step_batch'],
+    'trajectory_log': ['MAGIC', 'MAX_RECORDS', 'trajectory_dtype',
+                       'TrajectoryWriter', 'load_trajectory',
+                       'trajectory_to_yaml'],
+    'primitives': ['PRIMITIVES_VERSION', 'ENV_PRIMITIVES_CACHE',
+                   'MotionPrimitives', 'car_parameters', 'commands_grid',
+                   'primitives_key', 'generate_primitives',
+                   'default_cache_dir', 'load_primitives'],
+    'steering': ['MAX_SEGMENTS', 'SteeringPaths', 'turning_radius',
+                 'steering_commands', 'dubins_words', 'dubins_paths',
+                 'reeds_shepp_words', 'reeds_shepp_families',
+                 'reeds_shepp_paths'],
+}
+_lazy_names = dict((name, module)
+                   for module, names in _lazy_modules.items()
+                   for name in names)
+
+
+def __getattr__(name):
+    # The specializations are imported on first use; see registry.py.
+    if name in builtin_dynamics:
+        value = get_builtin_dynamics(name)
+        globals()[name] = value
+        return value
+    if name in _lazy_names:
+        module = importlib.import_module('.' + _lazy_names[name], __name__)
+        value = getattr(module, name)
+        globals()[name] = value
+        return value
+    msg = 'module %r has no attribute %r' % (__name__, name)
+    raise AttributeError(msg)
+
+
+def __dir__():
+    return sorted(set(globals()) | set(builtin_dynamics) | set(_lazy_names))
+
+
+# 'from vehicles_dynamics import *' exports the dynamics and the tools
+# too, as it did when they were imported eagerly (it imports them).
+__all__ = sorted(set(name for name in globals() if not name.startswith('_'))
+                 | set(builtin_dynamics) | set(_lazy_names))
@@ -0,0 +1,116 @@
+'''
+    Vectorized helpers for working with stacks of matrix Lie group
+    and Lie algebra elements, stored as arrays of shape (..., k, k).
+'''
+from . import contract, np
+
+# algebra name -> (basis, dual basis)
+_bases = {}
+
+
+def algebra_basis(algebra):
+    '''
+        Returns a tuple (basis, dual), where basis is an array (n, k, k)
+        such that basis[i] = algebra.algebra_from_vector(e_i), and
+        dual is an array (k*k, n) that recovers the coordinates of an
+        element of the algebra from its flattened entries.
+
+        The result is cached per algebra.
+    '''
+    key = str(algebra)
+    if not key in _bases:
+        n = algebra.get_dimension()
+        basis = np.array([algebra.algebra_from_vector(e) for e in np.eye(n)])
+        k = basis.shape[1]
+        dual = np.linalg.pinv(basis.reshape(n, k * k))
+        _bases[key] = (basis, dual)
+    return _bases[key]
+
+
+def vectors_from_algebra(algebra, a):
+    '''
+        Batched version of algebra.vector_from_algebra(): converts an
+        array (..., k, k) of elements of the algebra to an
+        array (..., n) of coordinates.
+    '''
+    a = np.asarray(a)
+    _, dual = algebra_basis(algebra)
+    k = a.shape[-1]
+    return np.dot(a.reshape(a.shape[:-2] + (k * k,)), dual)
+
+
+def algebra_from_vectors(algebra, v):
+    '''
+        Batched version of algebra.algebra_from_vector(): converts an
+        array (..., n) of coordinates to an array (..., k, k) of
+        elements of the algebra.
+    '''
+    v = np.asarray(v)
+    basis, _ = algebra_basis(algebra)
+    n, k, _ = basis.shape
+    return np.dot(v, basis.reshape(n, k * k)).reshape(v.shape[:-1] + (k, k))
+
+
+@contract(a='array')
+def expm_batch(a, order=18):
+    '''
+        Matrix exponential of an array (..., k, k) of square matrices,
+        computed with scaling and squaring of a truncated Taylor series.
+
+        This is the generic fallback used for pose spaces that
+        do not provide a closed form. The result is float32 if
+        the argument is, float64 otherwise.
+    '''
+    a = np.asarray(a)
+    if a.dtype != np.float32:
+        a = a.astype('float64')
+    k = a.shape[-1]
+    norm = np.max(np.sum(np.abs(a), axis=-2)) if a.size else 0.0
+    # scale so that the norm is at most 0.5
+    s = int(max(0, np.ceil(np.log2(norm)) + 1)) if norm > 0 else 0
+    x = a / (2.0 ** s)
+    eye = np.eye(k, dtype=a.dtype)
+    # Horner evaluation of sum_i x^i / i!
+    result = eye + x / order
+    for i in range(order - 1, 0, -1):
+        result = eye + np.matmul(x, result) / i
+    for _ in range(s):
+        result = np.matmul(result, result)
+    return result
+
+
+
+def _is_rotation_group(space):
+    ''' True for SO2, SO3 and their algebras (no translation part). '''
+    return str(space).lower() in ['so2', 'so3']
+
+
+def embed_in_SE3(pose_space, g):
+    '''
+        Embeds an array (..., k, k) of elements of a subgroup of SE3
+        (SE2, SO2, SO3, Tran1/2/3, SE3) into an array (..., 4, 4),
+        without going through the checks of pose_space.embed_in().
+    '''
+    g = np.asarray(g)
+    out = np.zeros(g.shape[:-2] + (4, 4))
+    out[..., [0, 1, 2, 3], [0, 1, 2, 3]] = 1
+    _embed(pose_space, g, out)
+    return out
+
+
+def embed_in_se3(algebra, a):
+    ''' Same as embed_in_SE3(), for the corresponding algebras. '''
+    a = np.asarray(a)
+    out = np.zeros(a.shape[:-2] + (4, 4))
+    _embed(algebra, a, out)
+    return out
+
+
+def _embed(space, x, out):
+    k = x.shape[-1]
+    if _is_rotation_group(space):
+        out[..., :k, :k] = x
+    else:
+        d = k - 1
+        out[..., :d, :d] = x[..., :d, :d]
+        out[..., :d, 3] = x[..., :d, d]
@@ -0,0 +1,263 @@
+'''
+    Speed benchmarks of the specializations.
+
+    For each dynamics, with and without noise, measures the
+    throughput (steps/second) and latency (seconds/step) of
+    integrate(), joint_state(), pose2state(), state_to_yaml(),
+    and of integrate_batch() for batch sizes from 1 to 100k. For the
+    dynamics with a quaternion form of the states (SO3 and SE3),
+    integrate_quaternions() is measured on the same batches, to
+    compare it with the matrices of integrate_batch().
+
+    The results are stored as JSON, and two result files can be
+    compared to find regressions: ::
+
+        vehicles_dynamics_bench run -o new.json
+        vehicles_dynamics_bench compare old.json new.json
+'''
+from . import (contract, np, __version__, create_dynamics, SimpleKinematics,
+    SimpleDynamics, set_validation_level, get_validation_level)
+from geometry import SE3
+import argparse
+import json
+import platform
+import sys
+import time
+
+# name, dynamics, parameters
+benchmark_dynamics = [
+    ('SimpleCar', 'SimpleCar',
+     dict(max_linear_velocity=1, max_steering_angle=0.5, L=1, axis_dist=0.5)),
+    ('CarWithWheels', 'CarWithWheels',
+     dict(max_linear_velocity=1, max_steering_angle=0.5, L=1, axis_dist=0.5)),
+    ('DubinsCar', 'DubinsCar',
+     dict(max_linear_velocity=1, max_steering_angle=0.5, L=1, axis_dist=0.5)),
+    ('ReedsSheepCar', 'ReedsSheepCar',
+     dict(max_linear_velocity=1, max_steering_angle=0.5, L=1, axis_dist=0.5)),
+    ('DifferentialDrive', 'DifferentialDrive',
+     dict(max_linear_velocity=1, max_angular_velocity=1)),
+    ('SE2Dynamics', 'SE2Dynamics',
+     dict(max_linear_velocity=[1, 1], max_angular_velocity=1)),
+    ('SE2Forward', 'SE2Forward',
+     dict(linear_velocity=1, max_angular_velocity=1)),
+    ('SO3Vel', 'SO3Vel', dict(max_angular_velocity=[1, 1, 1])),
+    ('SO3Force', 'SO3Force', dict(max_force=[1, 1, 1], mass=1, damping=0.1)),
+    ('SE3Vel', 'SE3Vel', dict(max_angular_velocity=[1, 1, 1],
+                              max_linear_velocity=[1, 1, 1])),
+    ('SE3Force', 'SE3Force', dict(max_force=[1] * 6, mass=1, damping=0.1)),
+    ('CircleVel', 'CircleVel', dict(max_velocity=1)),
+    ('CircleForce', 'CircleForce', dict(max_force=1, mass=1, damping=0.1)),
+    ('EuclideanVel', 'EuclideanVel', dict(ndim=2, max_velocity=[1, 1])),
+    ('EuclideanForce', 'EuclideanForce',
+     dict(ndim=2, max_force=[1, 1], mass=1, damping=0.1)),
+]
+
+batch_sizes = [1, 10, 100, 1000, 10000, 100000]
+
+operations = ['integrate', 'joint_state', 'pose2state', 'state_to_yaml',
+              'integrate_batch', 'integrate_quaternions']
+
+# the operations measured for each batch size
+batch_operations = ['integrate_batch', 'integrate_quaternions']
+
+
+def make_dynamics(name, params, noise):
+    '''
+        Creates the dynamics; if noise is True, adds noise to the
+        kinematic part. Returns None if the dynamics has no noise model.
+    '''
+    dynamics = create_dynamics(name, **params)
+    if noise:
+        kinematics = getattr(dynamics, 'car', dynamics)
+        if (not isinstance(kinematics, SimpleKinematics) or
+            isinstance(kinematics, SimpleDynamics)):
+            return None
+        n = kinematics.pose_space.get_algebra().get_dimension()
+        kinematics.noise_drift = np.ones(n) * 0.01
+        kinematics.noise_mult = np.ones(n) * 0.1
+        kinematics.seed_noise(0)
+    return dynamics
+
+
+@contract(min_time='>0', steps_per_call='int,>=1', returns='dict')
+def time_calls(f, min_time, steps_per_call=1):
+    '''
+        Calls f() repeatedly for at least *min_time* seconds. Returns
+        a dict with the number of calls, the total time, the
+        throughput and the latency per step.
+    '''
+    f() # warm up
+    calls = 0
+    start = time.perf_counter()
+    while True:
+        f()
+        calls += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            break
+    steps = calls * steps_per_call
+    return dict(calls=calls, seconds=elapsed,
+                steps_per_second=steps / elapsed,
+                latency=elapsed / steps)
+
+
+def benchmark_one(dynamics, operation, batch_size, min_time):
+    ''' Times one operation; returns None if it is not supported. '''
+    dt = 0.1
+    m = dynamics.get_commands_spec()['shape'][0]
+    # (discrete and bounded commands, such as those of DubinsCar)
+    valid = dynamics.get_commands_checker().clip
+    commands = valid(np.random.uniform(-1, 1, m))
+    state = dynamics.integrate(dynamics.pose2state(SE3.unity()), commands, dt)
+    if operation == 'integrate':
+        f = lambda: dynamics.integrate(state, commands, dt)
+    elif operation == 'joint_state':
+        f = lambda: dynamics.joint_state(state)
+    elif operation == 'pose2state':
+        pose = SE3.unity()
+        f = lambda: dynamics.pose2state(pose)
+    elif operation == 'state_to_yaml':
+        f = lambda: dynamics.state_to_yaml(state)
+    elif operation == 'integrate_batch':
+        if not hasattr(dynamics, 'integrate_batch'):
+            return None
+        pose, vel = state
+        poses = np.tile(pose, (batch_size, 1, 1))
+        vels = np.tile(vel, (batch_size, 1, 1))
+        many = valid(np.random.uniform(-1, 1, (batch_size, m)))
+        f = lambda: dynamics.integrate_batch(poses, vels, many, dt)
+    elif operation == 'integrate_quaternions':
+        if not hasattr(dynamics, 'integrate_quaternions'):
+            return None
+        pose, vel = state
+        states = dynamics.quaternion_states(np.tile(pose, (batch_size, 1, 1)),
+                                            np.tile(vel, (batch_size, 1, 1)))
+        many = valid(np.random.uniform(-1, 1, (batch_size, m)))
+        f = lambda: dynamics.integrate_quaternions(*(states + (many, dt)))
+    else:
+        raise ValueError('Unknown operation %r.' % operation)
+    return time_calls(f, min_time, steps_per_call=batch_size)
+
+
+def run_benchmarks(names=None, min_time=0.2, sizes=None, ops=None):
+    '''
+        Runs the benchmarks and returns the results as a dict
+        that can be written as JSON.
+    '''
+    if sizes is None:
+        sizes = batch_sizes
+    if ops is None:
+        ops = operations
+    np.random.seed(0)
+    results = []
+    for name, dynamics_name, params in benchmark_dynamics:
+        if names is not None and not name in names:
+            continue
+        for noise in [False, True]:
+            dynamics = make_dynamics(dynamics_name, params, noise)
+            if dynamics is None:
+                continue
+            for operation in ops:
+                if operation in batch_operations:
+                    todo = sizes
+                else:
+                    todo = [1]
+                for batch_size in todo:
+                    r = benchmark_one(dynamics, operation, batch_size,
+                                      min_time)
+                    if r is None:
+                        continue
+                    r.update(dynamics=name, noise=noise,
+                             operation=operation, batch_size=batch_size)
+                    results.append(r)
+    return dict(version=__version__,
+                python=platform.python_version(),
+                numpy=np.__version__,
+                machine=platform.machine(),
+                validation=get_validation_level(),
+                results=results)
+
+
+def result_key(r):
+    return (r['dynamics'], r['noise'], r['operation'], r['batch_size'])
+
+
+@contract(old='dict', new='dict', threshold='>=0', returns='list(dict)')
+def compare_benchmarks(old, new, threshold=0.1):
+    '''
+        Compares two benchmark results. Returns the list of the
+        measurements present in both, with the ratio of the
+        throughputs (new / old) and a flag that is True if
+        it is less than 1 - threshold.
+    '''
+    old_results = dict((result_key(r), r) for r in old['results'])
+    comparison = []
+    for r in new['results']:
+        key = result_key(r)
+        if not key in old_results:
+            continue
+        ratio = r['steps_per_second'] / old_results[key]['steps_per_second']
+        comparison.append(dict(dynamics=r['dynamics'], noise=r['noise'],
+                               operation=r['operation'],
+                               batch_size=r['batch_size'],
+                               ratio=ratio,
+                               regression=ratio < 1 - threshold))
+    return comparison
+
+
+def format_results(results):
+    lines = []
+    for r in results['results']:
+        lines.append('%-18s noise=%-5s %-21s N=%-7d %12.0f steps/s %10.2f us'
+                     % (r['dynamics'], r['noise'], r['operation'],
+                        r['batch_size'], r['steps_per_second'],
+                        r['latency'] * 1e6))
+    return '\n'.join(lines)
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(prog='vehicles_dynamics_bench',
+                                     description=__doc__.split('\n')[1])
+    commands = parser.add_subparsers(dest='command')
+    run = commands.add_parser('run', help='Runs the benchmarks.')
+    run.add_argument('-o', '--output', help='JSON file for the results.')
+    run.add_argument('--dynamics', nargs='*', help='Subset of dynamics.')
+    run.add_argument('--min-time', type=float, default=0.2,
+                     help='Seconds per measurement.')
+    run.add_argument('--validation', default=None,
+                     help='Validation level (off, boundary-only, full).')
+    compare = commands.add_parser('compare', help='Compares two results.')
+    compare.add_argument('old')
+    compare.add_argument('new')
+    compare.add_argument('--threshold', type=float, default=0.1,
+                         help='Relative slowdown considered a regression.')
+    options = parser.parse_args(args)
+
+    if options.command == 'run':
+        if options.validation is not None:
+            set_validation_level(options.validation)
+        results = run_benchmarks(names=options.dynamics,
+                                 min_time=options.min_time)
+        print(format_results(results))
+        if options.output:
+            with open(options.output, 'w') as f:
+                json.dump(results, f, indent=1)
+        return 0
+    elif options.command == 'compare':
+        with open(options.old) as f:
+            old = json.load(f)
+        with open(options.new) as f:
+            new = json.load(f)
+        comparison = compare_benchmarks(old, new, options.threshold)
+        for c in comparison:
+            print('%-18s noise=%-5s %-21s N=%-7d %6.2fx %s' %
+                  (c['dynamics'], c['noise'], c['operation'], c['batch_size'],
+                   c['ratio'], 'REGRESSION' if c['regression'] else ''))
+        return 1 if any(c['regression'] for c in comparison) else 0
+    else:
+        parser.print_help()
+        return 2
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,123 @@
+'''
+    Validation of the commands against the commands specification.
+
+    The spec of a dynamics (see Dynamics.get_commands_spec()) gives,
+    for each of the m channels, a format ('C' for continuous, 'D' for
+    discrete, that is, integer values) and a range [lower, upper].
+    It is compiled once in a CommandsChecker, which checks a single
+    command (an array (m,)) or a whole batch (an array (N, m)) with a
+    few vectorized operations.
+
+    What to do with invalid commands is chosen per instance, with
+    Dynamics.set_commands_mode():
+
+    - 'raise': raise InvalidCommands (the default);
+    - 'round': round the 'D' channels to the nearest integer; then,
+               raise if the commands are still out of range;
+    - 'clip':  clip all the channels to their range, and round
+               the 'D' channels; only raise for non-finite values.
+'''
+from . import np
+
+COMMANDS_RAISE = 'raise'
+COMMANDS_ROUND = 'round'
+COMMANDS_CLIP = 'clip'
+
+commands_modes = [COMMANDS_RAISE, COMMANDS_ROUND, COMMANDS_CLIP]
+
+
+class CommandsChecker(object):
+    ''' The compiled form of a commands spec. '''
+
+    def __init__(self, spec):
+        shape = tuple(spec['shape'])
+        m = int(np.prod(shape))
+        formats = list(spec.get('format', ['C'] * m))
+        ranges = np.array(spec['range'], dtype='float64').reshape(m, 2)
+        if len(formats) != m:
+            msg = ('The spec has %d formats but %d channels.' %
+                   (len(formats), m))
+            raise ValueError(msg)
+        for f in formats:
+            if not f in ['C', 'D']:
+                raise ValueError('Unknown format %r in the spec.' % f)
+        self.shape = shape
+        self.lower = ranges[:, 0].reshape(shape)
+        self.upper = ranges[:, 1].reshape(shape)
+        self.discrete = np.array([f == 'D' for f in formats]).reshape(shape)
+        self.any_discrete = bool(np.any(self.discrete))
+        if np.any(self.lower > self.upper):
+            raise ValueError('Invalid ranges in the spec: %s' % spec['range'])
+
+    def __repr__(self):
+        return 'CommandsChecker(shape=%s)' % (self.shape,)
+
+    def invalid(self, commands):
+        '''
+            Returns a boolean array with the shape of commands, True
+            for the invalid values: out of range, non-integer for the
+            'D' channels, or not finite.
+        '''
+        bad = ~((commands >= self.lower) & (commands <= self.upper))
+        if self.any_discrete:
+            bad |= self.discrete & (commands != np.round(commands))
+        return bad
+
+    def describe(self, commands, bad):
+        ''' Returns a message describing the first invalid value. '''
+        if bad.shape != commands.shape:
+            return ('Expected commands of shape (..., %s), got %s.' %
+                    (', '.join(map(str, self.shape)), commands.shape))
+        index = tuple(int(i) for i in np.argwhere(bad)[0])
+        channel = index[commands.ndim - len(self.shape):]
+        return ('The value %r at %s is not valid for format %r '
+                'and range [%g, %g].' %
+                (float(commands[index]), index,
+                 'D' if self.discrete[channel] else 'C',
+                 self.lower[channel], self.upper[channel]))
+
+    def round(self, commands):
+        ''' Returns the commands with the 'D' channels rounded. '''
+        if not self.any_discrete:
+            return commands
+        return np.where(self.discrete, np.round(commands), commands)
+
+    def clip(self, commands):
+        '''
+            Returns the commands clipped to the ranges, with the
+            'D' channels rounded (to an integer in the range).
+        '''
+        clipped = np.clip(commands, self.lower, self.upper)
+        if not self.any_discrete:
+            return clipped
+        rounded = np.clip(np.round(clipped), np.ceil(self.lower),
+                          np.floor(self.upper))
+        return np.where(self.discrete, rounded, clipped)
+
+    def apply(self, commands, mode):
+        '''
+            Checks the commands (an array (..., m)) according to mode
+            (see the module documentation). Returns the pair
+            (commands, bad), where commands are the commands to use
+            (the same array, if nothing changed) and bad is None if
+            they are valid, or else the mask of the invalid values.
+        '''
+        commands = np.asarray(commands)
+        if commands.shape[commands.ndim - len(self.shape):] != self.shape:
+            return commands, np.ones(commands.shape, dtype='bool')
+        if mode == COMMANDS_CLIP:
+            commands = self.clip(commands)
+        elif mode == COMMANDS_ROUND:
+            commands = self.round(commands)
+        bad = self.invalid(commands)
+        if not np.any(bad):
+            return commands, None
+        return commands, bad
+
+
+def check_commands_mode(mode):
+    ''' Raises ValueError if mode is not one of commands_modes. '''
+    if not mode in commands_modes:
+        msg = ('Invalid commands mode %r; expected one of %s.' %
+               (mode, commands_modes))
+        raise ValueError(msg)
@@ -0,0 +1,137 @@
+'''
+    Compact representation of the states (pose, vel) as flat
+    float64 vectors, containing only the free entries of the matrices.
+
+    For example, a state of SE2 is stored as 7 numbers: ::
+
+        [cos(theta), sin(theta), x, y, omega, vx, vy]
+
+    instead of two 3x3 matrices. The conversion copies entries
+    without doing any arithmetic, so it is lossless.
+'''
+from . import contract, np, algebra_basis
+
+# Layouts of the groups, by name: (free entries, derived entries).
+# A derived entry (i, j, sign, k, l) is set to sign * m[k, l].
+_rotation2 = ([(0, 0), (1, 0)], [(1, 1, +1, 0, 0), (0, 1, -1, 1, 0)])
+_rotation3 = ([(i, j) for i in range(3) for j in range(3)], [])
+group_layouts = {
+    'SO2': _rotation2,
+    'SE2': (_rotation2[0] + [(0, 2), (1, 2)], _rotation2[1]),
+    'SO3': _rotation3,
+    'SE3': (_rotation3[0] + [(0, 3), (1, 3), (2, 3)], []),
+    'Tr1': ([(0, 1)], []),
+    'Tr2': ([(0, 2), (1, 2)], []),
+    'Tr3': ([(0, 3), (1, 3), (2, 3)], []),
+}
+
+
+class MatrixLayout(object):
+    '''
+        Describes how an array (..., k, k) of matrices of a given
+        space is packed in an array (..., n) of its free entries.
+    '''
+
+    def __init__(self, template, free, derived):
+        self.template = template
+        self.rows = np.array([i for i, _ in free], dtype='int')
+        self.cols = np.array([j for _, j in free], dtype='int')
+        self.derived = derived
+        self.size = len(free)
+
+    def pack(self, m, out):
+        out[...] = m[..., self.rows, self.cols]
+
+    def unpack(self, x):
+        x = np.asarray(x)
+        m = np.empty(x.shape[:-1] + self.template.shape)
+        m[...] = self.template
+        m[..., self.rows, self.cols] = x
+        for i, j, sign, k, l in self.derived:
+            m[..., i, j] = sign * m[..., k, l]
+        return m
+
+
+def group_layout(pose_space, k):
+    ''' Returns the MatrixLayout for the given subgroup of SE3. '''
+    key = str(pose_space)
+    if key in group_layouts:
+        free, derived = group_layouts[key]
+    else:
+        # fallback: all the entries
+        free, derived = [(i, j) for i in range(k) for j in range(k)], []
+    return MatrixLayout(np.eye(k), free, derived)
+
+
+def algebra_layout(algebra):
+    '''
+        Returns the MatrixLayout for the given algebra, derived from
+        its basis: the coordinates are the entries equal to +1 in each
+        basis element; the other nonzero entries are derived from them.
+    '''
+    basis, _ = algebra_basis(algebra)
+    n, k, _ = basis.shape
+    free = []
+    derived = []
+    for b in basis:
+        entries = list(zip(*np.nonzero(b)))
+        main = [e for e in entries if b[e] == 1][0]
+        free.append(main)
+        for e in entries:
+            if e != main:
+                derived.append((e[0], e[1], b[e], main[0], main[1]))
+    return MatrixLayout(np.zeros((k, k)), free, derived)
+
+
+class CompactLayout(object):
+    '''
+        The layout of the compact states of a pose space: the free
+        entries of the pose, followed by those of the velocity.
+
+        Both pack() and unpack() work on stacks of states, so a whole
+        trajectory or replay buffer can be converted at once.
+    '''
+
+    def __init__(self, pose_space):
+        algebra = pose_space.get_algebra()
+        k = algebra_basis(algebra)[0].shape[1]
+        self.pose_layout = group_layout(pose_space, k)
+        self.vel_layout = algebra_layout(algebra)
+        self.pose_size = self.pose_layout.size
+        self.vel_size = self.vel_layout.size
+        self.size = self.pose_size + self.vel_size
+
+    def __repr__(self):
+        return ('CompactLayout(pose_size=%d, vel_size=%d)' %
+                (self.pose_size, self.vel_size))
+
+    @contract(pose='array', vel='array')
+    def pack(self, pose, vel):
+        ''' Converts arrays (..., k, k) to an array (..., n). '''
+        out = np.empty(pose.shape[:-2] + (self.size,))
+        self.pose_layout.pack(pose, out[..., :self.pose_size])
+        self.vel_layout.pack(vel, out[..., self.pose_size:])
+        return out
+
+    def unpack(self, x):
+        ''' Converts an array (..., n) to a tuple of arrays (..., k, k). '''
+        x = np.asarray(x)
+        if x.shape[-1] != self.size:
+            msg = ('Expected compact states of size %d, got shape %s.' %
+                   (self.size, x.shape))
+            raise ValueError(msg)
+        pose = self.pose_layout.unpack(x[..., :self.pose_size])
+        vel = self.vel_layout.unpack(x[..., self.pose_size:])
+        return pose, vel
+
+
+# pose space name -> CompactLayout
+_layouts = {}
+
+
+def compact_layout(pose_space):
+    ''' Returns the (cached) CompactLayout for the given pose space. '''
+    key = str(pose_space)
+    if not key in _layouts:
+        _layouts[key] = CompactLayout(pose_space)
+    return _layouts[key]
@@ -2,7 +2,7 @@
 
 class DynamicsException(Exception):
     def __init__(self, dynamics, msg):
-        Exception.__init__(self, dynamics, msg)
+        Exception.__init__(self, msg)
         self.dynamics = dynamics
 
 
@@ -10,11 +10,13 @@ class InvalidState(DynamicsException):
     def __init__(self, dynamics, state):
         self.state = state
         msg = 'Invalid state %r for %s.' % (state, dynamics)
-        DynamicsException.__init__(dynamics, msg)
+        DynamicsException.__init__(self, dynamics, msg)
 
 
 class InvalidCommands(DynamicsException):
-    def __init__(self, dynamics, commands):
+    def __init__(self, dynamics, commands, reason=None):
         self.commands = commands
         msg = 'Invalid commands %r for %s.' % (commands, dynamics)
-        DynamicsException.__init__(dynamics, msg)
+        if reason is not None:
+            msg += ' ' + reason
+        DynamicsException.__init__(self, dynamics, msg)
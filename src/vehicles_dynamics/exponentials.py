@@ -0,0 +1,301 @@
+'''
+    Closed-form exponential maps for the pose spaces used by the
+    dynamics, replacing the generic matrix exponential.
+
+    Every function accepts either a single element of the algebra
+    (an array (k, k)) or a stack of them (an array (..., k, k)).
+    The result is float32 if the argument is, float64 otherwise.
+
+    The result can also be written in a given array *out*, of the
+    same shape. For single elements, the closed forms then do not
+    allocate any array: they work on Python floats (see
+    SimpleKinematics.integrate_into()).
+'''
+from . import np, expm_batch
+import math
+
+# Below this angle, the trigonometric ratios use their Taylor series.
+SMALL_ANGLE = 1e-3
+
+
+def _float_dtype(a):
+    ''' Returns the dtype of the result for the argument a. '''
+    if a.dtype == np.float32:
+        return a.dtype
+    return np.dtype('float64')
+
+
+def _sinc_cosc(w):
+    '''
+        Returns the two ratios sin(w)/w and (1-cos(w))/w,
+        elementwise and without singularity at w=0.
+    '''
+    small = np.abs(w) < SMALL_ANGLE
+    ws = np.where(small, 1.0, w)
+    w2 = w * w
+    sinc = np.where(small, 1 - w2 / 6 + w2 * w2 / 120, np.sin(ws) / ws)
+    cosc = np.where(small, w / 2 - w * w2 / 24 + w * w2 * w2 / 720,
+                    (1 - np.cos(ws)) / ws)
+    return sinc, cosc
+
+
+def _sinc_cosc_scalar(w):
+    ''' Scalar version of :py:func:`_sinc_cosc`. '''
+    if abs(w) < SMALL_ANGLE:
+        w2 = w * w
+        return (1 - w2 / 6 + w2 * w2 / 120,
+                w / 2 - w * w2 / 24 + w * w2 * w2 / 720)
+    return math.sin(w) / w, (1 - math.cos(w)) / w
+
+
+def _output(a, out):
+    ''' Returns out, or a new array for the result of the argument a. '''
+    if out is None:
+        out = np.empty(a.shape, dtype=_float_dtype(a))
+    return out
+
+
+def _copy_to(g, out):
+    ''' Returns g, copied in out if given. '''
+    if out is None:
+        return g
+    out[...] = g
+    return out
+
+
+def exp_SE2(a, out=None):
+    ''' Exponential map se2 -> SE2. '''
+    if a.ndim == 2:
+        w = a.item(1, 0)
+        vx, vy = a.item(0, 2), a.item(1, 2)
+        c, s = math.cos(w), math.sin(w)
+        sinc, cosc = _sinc_cosc_scalar(w)
+        g = _output(a, out)
+        g[0, 0] = c
+        g[0, 1] = -s
+        g[0, 2] = sinc * vx - cosc * vy
+        g[1, 0] = s
+        g[1, 1] = c
+        g[1, 2] = cosc * vx + sinc * vy
+        g[2, 0] = 0
+        g[2, 1] = 0
+        g[2, 2] = 1
+        return g
+    w = a[..., 1, 0]
+    vx = a[..., 0, 2]
+    vy = a[..., 1, 2]
+    c = np.cos(w)
+    s = np.sin(w)
+    sinc, cosc = _sinc_cosc(w)
+    g = np.zeros(a.shape, dtype=_float_dtype(a))
+    g[..., 0, 0] = c
+    g[..., 0, 1] = -s
+    g[..., 1, 0] = s
+    g[..., 1, 1] = c
+    g[..., 0, 2] = sinc * vx - cosc * vy
+    g[..., 1, 2] = cosc * vx + sinc * vy
+    g[..., 2, 2] = 1
+    return _copy_to(g, out)
+
+
+def exp_SO2(a, out=None):
+    ''' Exponential map so2 -> SO2 (a rotation by the angle a[1,0]). '''
+    if a.ndim == 2:
+        w = a.item(1, 0)
+        c, s = math.cos(w), math.sin(w)
+        g = _output(a, out)
+        g[0, 0] = c
+        g[0, 1] = -s
+        g[1, 0] = s
+        g[1, 1] = c
+        return g
+    w = a[..., 1, 0]
+    c = np.cos(w)
+    s = np.sin(w)
+    g = np.empty(a.shape, dtype=_float_dtype(a))
+    g[..., 0, 0] = c
+    g[..., 0, 1] = -s
+    g[..., 1, 0] = s
+    g[..., 1, 1] = c
+    return _copy_to(g, out)
+
+
+def _rodrigues_scalar(a):
+    '''
+        Returns the coordinates (w1, w2, w3) of the rotational part of
+        the element a (k, k) of so3 or se3, and the three ratios
+        sin(t)/t, (1-cos(t))/t^2, (t-sin(t))/t^3, where t = |w|.
+    '''
+    w = (a.item(2, 1), a.item(0, 2), a.item(1, 0))
+    t2 = w[0] * w[0] + w[1] * w[1] + w[2] * w[2]
+    theta = math.sqrt(t2)
+    if theta < SMALL_ANGLE:
+        k1 = 1 - t2 / 6 + t2 * t2 / 120
+        k2 = 0.5 - t2 / 24 + t2 * t2 / 720
+        k3 = 1.0 / 6 - t2 / 120 + t2 * t2 / 5040
+    else:
+        k1 = math.sin(theta) / theta
+        k2 = (1 - math.cos(theta)) / t2
+        k3 = (theta - math.sin(theta)) / (t2 * theta)
+    return w, t2, k1, k2, k3
+
+
+def _rotation_scalar(g, w, t2, c1, c2):
+    '''
+        Writes I + c1 * W + c2 * W^2 in g[:3, :3], where W = hat(w),
+        using W^2 = w w' - |w|^2 I.
+    '''
+    for i in range(3):
+        for j in range(3):
+            g[i, j] = c2 * w[i] * w[j]
+        g[i, i] += 1 - c2 * t2
+    g[0, 1] -= c1 * w[2]
+    g[1, 0] += c1 * w[2]
+    g[0, 2] += c1 * w[1]
+    g[2, 0] -= c1 * w[1]
+    g[1, 2] -= c1 * w[0]
+    g[2, 1] += c1 * w[0]
+
+
+def exp_SO3(a, out=None):
+    ''' Exponential map so3 -> SO3, using Rodrigues' formula. '''
+    if a.ndim == 2:
+        w, t2, k1, k2, _ = _rodrigues_scalar(a)
+        g = _output(a, out)
+        _rotation_scalar(g, w, t2, k1, k2)
+        return g
+    w = np.stack([a[..., 2, 1], a[..., 0, 2], a[..., 1, 0]], axis=-1)
+    theta = np.sqrt(np.sum(w * w, axis=-1))
+    small = theta < SMALL_ANGLE
+    ts = np.where(small, 1.0, theta)
+    t2 = theta * theta
+    # sin(t)/t and (1-cos(t))/t^2
+    k1 = np.where(small, 1 - t2 / 6 + t2 * t2 / 120, np.sin(ts) / ts)
+    k2 = np.where(small, 0.5 - t2 / 24 + t2 * t2 / 720,
+                  (1 - np.cos(ts)) / (ts * ts))
+    a2 = np.matmul(a, a)
+    dtype = _float_dtype(a)
+    k1 = np.asarray(k1, dtype=dtype)[..., np.newaxis, np.newaxis]
+    k2 = np.asarray(k2, dtype=dtype)[..., np.newaxis, np.newaxis]
+    return _copy_to(np.eye(3, dtype=dtype) + k1 * a + k2 * a2, out)
+
+
+def exp_SE3(a, out=None):
+    ''' 
+        Exponential map se3 -> SE3: Rodrigues' formula for the 
+        rotation, and the left Jacobian of SO3 for the translation.
+    '''
+    if a.ndim == 2:
+        w, t2, k1, k2, k3 = _rodrigues_scalar(a)
+        g = _output(a, out)
+        # first V = I + k2 * W + k3 * W^2, to compute the translation
+        _rotation_scalar(g, w, t2, k2, k3)
+        v = (a.item(0, 3), a.item(1, 3), a.item(2, 3))
+        for i in range(3):
+            g[i, 3] = g.item(i, 0) * v[0] + g.item(i, 1) * v[1] + \
+                g.item(i, 2) * v[2]
+        _rotation_scalar(g, w, t2, k1, k2)
+        g[3, 0] = 0
+        g[3, 1] = 0
+        g[3, 2] = 0
+        g[3, 3] = 1
+        return g
+    dtype = _float_dtype(a)
+    w = np.stack([a[..., 2, 1], a[..., 0, 2], a[..., 1, 0]], axis=-1)
+    theta = np.sqrt(np.sum(w * w, axis=-1))
+    small = theta < SMALL_ANGLE
+    ts = np.where(small, 1.0, theta)
+    t2 = theta * theta
+    # sin(t)/t, (1-cos(t))/t^2 and (t-sin(t))/t^3
+    k1 = np.where(small, 1 - t2 / 6 + t2 * t2 / 120, np.sin(ts) / ts)
+    k2 = np.where(small, 0.5 - t2 / 24 + t2 * t2 / 720,
+                  (1 - np.cos(ts)) / (ts * ts))
+    k3 = np.where(small, 1.0 / 6 - t2 / 120 + t2 * t2 / 5040,
+                  (ts - np.sin(ts)) / (ts * ts * ts))
+    k1 = np.asarray(k1, dtype=dtype)[..., np.newaxis, np.newaxis]
+    k2 = np.asarray(k2, dtype=dtype)[..., np.newaxis, np.newaxis]
+    k3 = np.asarray(k3, dtype=dtype)[..., np.newaxis, np.newaxis]
+    W = a[..., :3, :3]
+    W2 = np.matmul(W, W)
+    eye = np.eye(3, dtype=dtype)
+    g = np.zeros(a.shape, dtype=dtype)
+    g[..., :3, :3] = eye + k1 * W + k2 * W2
+    V = eye + k2 * W + k3 * W2
+    g[..., :3, 3] = np.matmul(V, a[..., :3, 3:4])[..., 0]
+    g[..., 3, 3] = 1
+    return _copy_to(g, out)
+
+
+def exp_Tran(a, out=None):
+    '''
+        Exponential map for the translation groups; as the algebra
+        is nilpotent (a^2 = 0), this is just the sum with the identity.
+    '''
+    eye = _identity(a.shape[-1], _float_dtype(a))
+    if out is None:
+        return eye + a
+    return np.add(eye, a, out=out)
+
+
+# (k, dtype) -> read-only identity matrix
+_identities = {}
+
+
+def _identity(k, dtype):
+    key = (k, dtype)
+    if not key in _identities:
+        eye = np.eye(k, dtype=dtype)
+        eye.flags.writeable = False
+        _identities[key] = eye
+    return _identities[key]
+
+
+# pose space name -> closed-form exponential
+closed_form_exponentials = {
+    'SE2': exp_SE2,
+    'SO2': exp_SO2,
+    'SO3': exp_SO3,
+    'SE3': exp_SE3,
+    'Tr1': exp_Tran,
+    'Tr2': exp_Tran,
+    'Tr3': exp_Tran,
+}
+
+
+def exponential_for(pose_space):
+    '''
+        Returns the function implementing the exponential map
+        for the given pose space, accepting single or stacked
+        elements of the algebra. If no closed form is known, the
+        generic path is used.
+    '''
+    key = str(pose_space)
+    if key in closed_form_exponentials:
+        return closed_form_exponentials[key]
+    return GenericExponential(pose_space)
+
+
+class GenericExponential(object):
+    ''' 
+        Fallback exponential map: uses the pose space's own 
+        group_from_algebra() for single elements, and the
+        vectorized matrix exponential for stacks.
+    '''
+
+    def __init__(self, pose_space):
+        self.pose_space = pose_space
+
+    def __call__(self, a, out=None):
+        if a.ndim == 2:
+            return _copy_to(self.pose_space.group_from_algebra(a), out)
+        else:
+            return _copy_to(expm_batch(a), out)
+
+
+def group_from_algebra_batch(pose_space, a):
+    '''
+        Batched version of pose_space.group_from_algebra():
+        converts an array (..., k, k) of elements of the algebra
+        to an array (..., k, k) of elements of the group.
+    '''
+    return exponential_for(pose_space)(np.asarray(a))
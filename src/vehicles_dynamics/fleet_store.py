@@ -0,0 +1,335 @@
+'''
+    A store of the latest states of a fleet of vehicles, in shared
+    memory: one process (the one stepping the dynamics) writes, and
+    any number of others (renderers, sensor simulators, loggers) read,
+    without pickling and without locks.
+
+    For N vehicles of a given dynamics, the store contains:
+
+        states       the compact states (N, compact_size())
+        joint_poses  the poses of the joints (N, J, 4, 4)
+        joint_vels   the velocities of the joints (N, J, 4, 4)
+        time         the time of the states, given by the writer
+
+    where J = num_joints(). The block has two slots for these arrays.
+    The writer fills the slot which is not published, and then
+    publishes it, so it never waits for the readers (double buffering).
+    Each slot has a sequence number, which is odd while the slot is
+    being written; a reader checks that it did not change during the
+    read, and retries otherwise (seqlock). ::
+
+        # in the stepping process
+        store = FleetStore.create(dynamics, num_vehicles)
+        store.write(states, time=t)
+
+        # in the other processes
+        store = FleetStore.attach(name)
+        snapshot = store.read()   # a consistent copy
+        view = store.view()       # without copying
+        render(view.joint_poses)
+        if not view.valid(): ...  # it was overwritten meanwhile
+
+    A view stays valid until the writer starts writing its slot
+    again, that is, for at least one more write.
+
+    The readers rely on the stores of the writer becoming visible
+    in the order of the program, which holds on x86-64 (numpy does
+    not give memory barriers).
+'''
+from . import contract, np
+from multiprocessing import resource_tracker, shared_memory
+import os
+
+FLEET_STORE_VERSION = 1
+
+# The header: int64 values.
+_HEADER_SIZE = 8
+_VERSION = 0
+_NUM_VEHICLES = 1
+_COMPACT_SIZE = 2
+_NUM_JOINTS = 3
+_GENERATION = 4 # number of writes published
+_SEQUENCE = 5 # + slot
+
+# returned by FleetStore._try_view() while the slot is being written
+_BUSY = object()
+
+
+class FleetSnapshot(object):
+    '''
+        The states of the fleet after a write; see FleetStore.read()
+        and FleetStore.view().
+    '''
+
+    def __init__(self, generation, time, states, joint_poses, joint_vels,
+                 store=None, slot=None, sequence=None):
+        self.generation = generation
+        self.time = time
+        self.states = states
+        self.joint_poses = joint_poses
+        self.joint_vels = joint_vels
+        self._store = store
+        self._slot = slot
+        self._sequence = sequence
+
+    def __repr__(self):
+        return ('FleetSnapshot(generation=%d, time=%g, vehicles=%d)' %
+                (self.generation, self.time, self.states.shape[0]))
+
+    def valid(self):
+        '''
+            Returns True if the arrays still contain this snapshot:
+            always for the copies, and for the views, until the
+            writer overwrites them.
+        '''
+        if self._store is None:
+            return True
+        return self._store._header[_SEQUENCE + self._slot] == self._sequence
+
+
+class FleetStore(object):
+    ''' A shared-memory fleet store; see the module documentation. '''
+
+    def __init__(self, memory, dynamics, owner):
+        ''' Use FleetStore.create() or FleetStore.attach(). '''
+        self._memory = memory
+        self.dynamics = dynamics
+        self._owner = owner
+        self._header = np.ndarray(_HEADER_SIZE, dtype='int64',
+                                  buffer=memory.buf)
+        if self._header[_VERSION] != FLEET_STORE_VERSION:
+            msg = ('The block %r is not a fleet store of version %d.' %
+                   (memory.name, FLEET_STORE_VERSION))
+            raise ValueError(msg)
+        self.num_vehicles, self.compact_size, self.num_joints = [
+            int(self._header[i])
+            for i in [_NUM_VEHICLES, _COMPACT_SIZE, _NUM_JOINTS]]
+        shapes = _slot_shapes(self.num_vehicles, self.compact_size,
+                              self.num_joints)
+        self._slots = []
+        offset = self._header.nbytes
+        for _ in range(2):
+            arrays = []
+            for shape in shapes:
+                a = np.ndarray(shape, dtype='float64', buffer=memory.buf,
+                               offset=offset)
+                arrays.append(a)
+                offset += a.nbytes
+            self._slots.append(arrays)
+
+    def __repr__(self):
+        return ('FleetStore(%r, vehicles=%d, generation=%d)' %
+                (self.name, self.num_vehicles, self.generation()))
+
+    @property
+    def name(self):
+        ''' The name of the shared memory block, for attach(). '''
+        return self._memory.name
+
+    @staticmethod
+    @contract(num_vehicles='int,>=1', name='None|str')
+    def create(dynamics, num_vehicles, name=None):
+        '''
+            Creates a store for *num_vehicles* of the dynamics, in a
+            new shared memory block. The calling process is the
+            writer, and must call unlink() when done.
+        '''
+        compact_size = dynamics.compact_size()
+        num_joints = dynamics.num_joints()
+        shapes = _slot_shapes(num_vehicles, compact_size, num_joints)
+        size = (_HEADER_SIZE * 8 +
+                2 * sum(int(np.prod(s)) * 8 for s in shapes))
+        memory = shared_memory.SharedMemory(name=name, create=True,
+                                            size=size)
+        header = np.ndarray(_HEADER_SIZE, dtype='int64', buffer=memory.buf)
+        header[:] = 0
+        header[_NUM_VEHICLES] = num_vehicles
+        header[_COMPACT_SIZE] = compact_size
+        header[_NUM_JOINTS] = num_joints
+        header[_VERSION] = FLEET_STORE_VERSION
+        return FleetStore(memory, dynamics, owner=True)
+
+    @staticmethod
+    @contract(name='str')
+    def attach(name, dynamics=None):
+        '''
+            Opens the store with the given name, for reading. The
+            dynamics is optional; it is only used by states().
+        '''
+        memory = shared_memory.SharedMemory(name=name)
+        if os.name == 'posix':
+            # Otherwise the resource tracker of this process would
+            # destroy the block when the process exits, even though
+            # the writer and the other readers still use it.
+            resource_tracker.unregister(memory._name, 'shared_memory')
+        return FleetStore(memory, dynamics, owner=False)
+
+    def generation(self):
+        ''' Returns the number of writes so far. '''
+        return int(self._header[_GENERATION])
+
+    def write(self, states, time=0.0):
+        '''
+            Publishes the states of all the vehicles: a sequence of
+            states, or an array (N, compact_size()) of compact states.
+            Only one process can write.
+        '''
+        if self.dynamics is None:
+            raise ValueError('The store was attached without a dynamics.')
+        if len(states) != self.num_vehicles:
+            msg = 'Expected %d states, got %d.' % (self.num_vehicles,
+                                                   len(states))
+            raise ValueError(msg)
+        # (computed and checked first, so that the slot is busy for less
+        # time, and is never left half-written)
+        time = float(time)
+        if isinstance(states, np.ndarray) and states.ndim == 2:
+            compact_states = states
+        else:
+            compact_states = np.array([self.dynamics.to_compact(s)
+                                       for s in states])
+        shape = (self.num_vehicles, self.compact_size)
+        if compact_states.shape != shape:
+            msg = 'Expected compact states %s, got %s.' % (
+                shape, compact_states.shape)
+            raise ValueError(msg)
+        if not np.can_cast(compact_states.dtype, 'float64', 'same_kind'):
+            msg = 'Expected real compact states, got %s.' % (
+                compact_states.dtype)
+            raise ValueError(msg)
+        poses, vels = self.dynamics.joint_states_batch(states)
+        shape = (self.num_vehicles, self.num_joints, 4, 4)
+        if poses.shape != shape or vels.shape != shape:
+            msg = 'Expected joint states %s, got %s and %s.' % (
+                shape, poses.shape, vels.shape)
+            raise ValueError(msg)
+        header = self._header
+        generation = int(header[_GENERATION])
+        slot = (generation + 1) % 2
+        sequence = int(header[_SEQUENCE + slot])
+        header[_SEQUENCE + slot] = sequence + 1
+        times, compact, joint_poses, joint_vels = self._slots[slot]
+        times[0] = time
+        compact[...] = compact_states
+        joint_poses[...] = poses
+        joint_vels[...] = vels
+        header[_SEQUENCE + slot] = sequence + 2
+        header[_GENERATION] = generation + 1
+
+    @contract(max_retries='int,>=1')
+    def read(self, max_retries=1000):
+        '''
+            Returns a FleetSnapshot with a copy of the last states
+            written, or None if there was no write yet. Raises
+            RuntimeError if no consistent copy could be made in
+            *max_retries* attempts (all included: while the slot was
+            being written, and while it was being copied).
+        '''
+        for _ in range(max_retries):
+            snapshot = self._try_view()
+            if snapshot is None:
+                return None
+            if snapshot is _BUSY:
+                continue
+            copy = FleetSnapshot(snapshot.generation, snapshot.time,
+                                 snapshot.states.copy(),
+                                 snapshot.joint_poses.copy(),
+                                 snapshot.joint_vels.copy())
+            if snapshot.valid():
+                return copy
+        raise _too_many_retries(self.name, max_retries)
+
+    @contract(max_retries='int,>=1')
+    def view(self, max_retries=1000):
+        '''
+            Returns a FleetSnapshot of the last states written, whose
+            arrays are read-only views of the shared memory (None if
+            there was no write yet). Check valid() after using them.
+            Raises RuntimeError if the slot was being written in all
+            the *max_retries* attempts (for example, if the writer
+            died while writing).
+        '''
+        for _ in range(max_retries):
+            snapshot = self._try_view()
+            if snapshot is not _BUSY:
+                return snapshot
+        raise _too_many_retries(self.name, max_retries)
+
+    def _try_view(self):
+        '''
+            Returns the snapshot of view(), None if there was no write
+            yet, or _BUSY if the slot is being written.
+        '''
+        header = self._header
+        generation = int(header[_GENERATION])
+        if generation == 0:
+            return None
+        slot = generation % 2
+        sequence = int(header[_SEQUENCE + slot])
+        # odd: the writer has already started on this slot again
+        if sequence % 2 == 1:
+            return _BUSY
+        times, compact, joint_poses, joint_vels = [
+            _read_only(a) for a in self._slots[slot]]
+        # The writer might have gone on meanwhile, and written this
+        # slot again: the generation must come from its sequence.
+        # Write k goes to slot k % 2, and it is the (k + 1) // 2-th
+        # write of that slot, so k = sequence - slot.
+        generation = sequence - slot
+        snapshot = FleetSnapshot(generation, float(times[0]), compact,
+                                 joint_poses, joint_vels, store=self,
+                                 slot=slot, sequence=sequence)
+        # (the time was copied: it must be checked too)
+        if not snapshot.valid():
+            return _BUSY
+        return snapshot
+
+    def states(self, snapshot):
+        ''' Returns the list of the states of the snapshot. '''
+        if self.dynamics is None:
+            raise ValueError('The store was attached without a dynamics.')
+        return [self.dynamics.from_compact(x) for x in snapshot.states]
+
+    def close(self):
+        '''
+            Closes the access to the block from this process; the
+            views given by view() must have been released.
+        '''
+        self._header = None
+        self._slots = None
+        self._memory.close()
+
+    def unlink(self):
+        ''' Destroys the block; for the writer, once done. '''
+        if os.name == 'posix':
+            # (a reader in a process sharing our resource tracker
+            # unregistered the block in attach())
+            resource_tracker.register(self._memory._name, 'shared_memory')
+        self._memory.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+        if self._owner:
+            self.unlink()
+
+
+def _slot_shapes(num_vehicles, compact_size, num_joints):
+    ''' Shapes of the arrays of a slot: time, states, joint poses/vels. '''
+    return [(1,), (num_vehicles, compact_size),
+            (num_vehicles, num_joints, 4, 4),
+            (num_vehicles, num_joints, 4, 4)]
+
+
+def _read_only(a):
+    view = a.view()
+    view.flags.writeable = False
+    return view
+
+
+def _too_many_retries(name, max_retries):
+    msg = ('Could not read %r in %d attempts: the writer is too fast, '
+           'or it stopped while writing.' % (name, max_retries))
+    return RuntimeError(msg)
@@ -0,0 +1,140 @@
+'''
+    Per-stage profiling of the integration steps.
+
+    A StageProfiler collects, for each stage of a step (checking the
+    commands, computing the velocities or forces, sampling the noise,
+    the exponential map or the integrator, the composition of poses),
+    the number of calls and a histogram of the durations.
+
+    Profiling is enabled per instance, with Dynamics.set_profiler(),
+    or for all instances, with enable_profiling(). When it is
+    disabled, each stage costs a single comparison with None.
+
+    Example: ::
+
+        profiler = enable_profiling()
+        ... run the simulation ...
+        print(profiler.snapshot())
+        profiler.write_prometheus('/var/lib/node_exporter/dynamics.prom')
+'''
+from . import contract
+import bisect
+import time
+
+# Upper bounds of the histogram buckets, in seconds.
+DEFAULT_BUCKETS = [1e-6, 2.5e-6, 5e-6, 1e-5, 2.5e-5, 5e-5, 1e-4, 2.5e-4,
+                   5e-4, 1e-3, 2.5e-3, 5e-3, 1e-2, 1e-1, 1.0]
+
+
+class StageProfiler(object):
+    '''
+        Counters and timing histograms, per stage.
+
+        Not thread-safe: use one profiler per thread.
+    '''
+
+    @contract(buckets='None|seq(>0)')
+    def __init__(self, buckets=None):
+        if buckets is None:
+            buckets = DEFAULT_BUCKETS
+        self.buckets = sorted(buckets)
+        self.clock = time.perf_counter
+        self.reset()
+
+    def __repr__(self):
+        return 'StageProfiler(%s)' % ', '.join(sorted(self._counts))
+
+    def reset(self):
+        ''' Forgets all the measurements. '''
+        self._counts = {}
+        self._totals = {}
+        self._histograms = {}
+
+    def record(self, stage, seconds):
+        ''' Records one execution of the stage. '''
+        if not stage in self._counts:
+            self._counts[stage] = 0
+            self._totals[stage] = 0.0
+            self._histograms[stage] = [0] * (len(self.buckets) + 1)
+        self._counts[stage] += 1
+        self._totals[stage] += seconds
+        self._histograms[stage][bisect.bisect_left(self.buckets,
+                                                   seconds)] += 1
+
+    def lap(self, stage, start):
+        '''
+            Records the time elapsed since *start* for the stage,
+            and returns the current time, to be used as the start
+            of the next stage.
+        '''
+        now = self.clock()
+        self.record(stage, now - start)
+        return now
+
+    @contract(returns='dict')
+    def snapshot(self):
+        '''
+            Returns a dict stage -> dict(count, total, buckets), where
+            buckets is a list of (upper bound, cumulative count), the
+            last upper bound being float('inf').
+        '''
+        result = {}
+        bounds = self.buckets + [float('inf')]
+        for stage, counts in self._histograms.items():
+            cumulative = []
+            total = 0
+            for bound, c in zip(bounds, counts):
+                total += c
+                cumulative.append((bound, total))
+            result[stage] = dict(count=self._counts[stage],
+                                 total=self._totals[stage],
+                                 buckets=cumulative)
+        return result
+
+    @contract(prefix='str', returns='str')
+    def to_prometheus(self, prefix='vehicles_dynamics_stage'):
+        ''' Returns the snapshot in the Prometheus text format. '''
+        name = '%s_seconds' % prefix
+        lines = ['# HELP %s Duration of the integration stages.' % name,
+                 '# TYPE %s histogram' % name]
+        snapshot = self.snapshot()
+        for stage in sorted(snapshot):
+            s = snapshot[stage]
+            for bound, count in s['buckets']:
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                lines.append('%s_bucket{stage="%s",le="%s"} %d' %
+                             (name, stage, le, count))
+            lines.append('%s_sum{stage="%s"} %r' % (name, stage, s['total']))
+            lines.append('%s_count{stage="%s"} %d' % (name, stage, s['count']))
+        return '\n'.join(lines) + '\n'
+
+    @contract(filename='str')
+    def write_prometheus(self, filename, prefix='vehicles_dynamics_stage'):
+        ''' Writes the Prometheus text format to the given file. '''
+        with open(filename, 'w') as f:
+            f.write(self.to_prometheus(prefix))
+
+
+# Process-wide profiler (in a list so that it can be updated in place).
+_global_profiler = [None]
+
+
+def enable_profiling(profiler=None):
+    '''
+        Enables profiling for all the instances which do not
+        have their own profiler. Returns the profiler used.
+    '''
+    if profiler is None:
+        profiler = StageProfiler()
+    _global_profiler[0] = profiler
+    return profiler
+
+
+def disable_profiling():
+    ''' Disables the process-wide profiling. '''
+    _global_profiler[0] = None
+
+
+def get_profiler():
+    ''' Returns the process-wide profiler, or None. '''
+    return _global_profiler[0]
@@ -0,0 +1,285 @@
+'''
+    Integrators for SimpleDynamics.
+
+    The dynamics is: ::
+
+        d/dt pose = pose * vel
+        d/dt vel  = acceleration(vel)  (the forces are constant in a step)
+
+    All the integrators work on stacks of states, and return the
+    increment of the pose as an element of the group (so that
+    pose2 = pose1 * step), together with the new velocity.
+
+    - 'midpoint': one explicit midpoint step (the original scheme);
+    - 'rk4':      classic Runge-Kutta, in Runge-Kutta-Munthe-Kaas form;
+    - 'adaptive': Dormand-Prince 5(4) in RKMK form, with substeps
+                  chosen to keep the local error below a tolerance;
+    - 'exact':    the closed-form solution, for abelian pose spaces
+                  (Tran1/2/3, SO2); chosen automatically for them.
+
+    In RKMK form, the pose is written as pose1 * exp(omega), and
+    omega is integrated in the algebra using: ::
+
+        d/dt omega = dexpinv(-omega)(vel)
+                   = vel + 1/2 [omega, vel] + 1/12 [omega, [omega, vel]]
+
+    (the truncation does not affect the order, up to order 5).
+'''
+from . import contract, np, algebra_basis
+import math
+
+
+def commutator(a, b):
+    ''' The Lie bracket [a, b] of two stacks of matrices. '''
+    return np.matmul(a, b) - np.matmul(b, a)
+
+
+def dexpinv(omega, vel):
+    ''' Returns d/dt omega given vel; see the module documentation. '''
+    c = commutator(omega, vel)
+    return vel + 0.5 * c + (1.0 / 12) * commutator(omega, c)
+
+
+class Integrator(object):
+    ''' Interface for the integrators. '''
+
+    def increment(self, dynamics, vels, forces, dt):
+        '''
+            Returns a tuple (steps, vels2) of arrays (N, k, k) such
+            that pose2 = pose1 * steps and vels2 is the new velocity.
+        '''
+        raise NotImplementedError()
+
+
+class MidpointIntegrator(Integrator):
+    ''' One explicit Euler step for the velocity; midpoint for the pose. '''
+
+    def __repr__(self):
+        return 'MidpointIntegrator()'
+
+    def increment(self, dynamics, vels, forces, dt):
+        vels2 = vels + dt * dynamics._acceleration(vels, forces)
+        midvels = 0.5 * (vels + vels2)
+        steps = dynamics._group_from_algebra(midvels * dt)
+        return steps, vels2
+
+
+class ButcherTableau(object):
+    '''
+        Coefficients of an explicit Runge-Kutta method; *b_low* are
+        the weights of the embedded lower-order method, if any.
+    '''
+
+    def __init__(self, a, b, order, b_low=None, order_low=None):
+        self.a = [np.array(row, dtype='float64') for row in a]
+        self.b = np.array(b, dtype='float64')
+        self.order = order
+        self.b_low = None if b_low is None else np.array(b_low,
+                                                         dtype='float64')
+        self.order_low = order_low
+        self.stages = len(b)
+
+
+RK4 = ButcherTableau(a=[[],
+                        [1 / 2.],
+                        [0, 1 / 2.],
+                        [0, 0, 1]],
+                     b=[1 / 6., 1 / 3., 1 / 3., 1 / 6.],
+                     order=4)
+
+DOPRI54 = ButcherTableau(
+    a=[[],
+       [1 / 5.],
+       [3 / 40., 9 / 40.],
+       [44 / 45., -56 / 15., 32 / 9.],
+       [19372 / 6561., -25360 / 2187., 64448 / 6561., -212 / 729.],
+       [9017 / 3168., -355 / 33., 46732 / 5247., 49 / 176., -5103 / 18656.],
+       [35 / 384., 0, 500 / 1113., 125 / 192., -2187 / 6784., 11 / 84.]],
+    b=[35 / 384., 0, 500 / 1113., 125 / 192., -2187 / 6784., 11 / 84., 0],
+    order=5,
+    b_low=[5179 / 57600., 0, 7571 / 16695., 393 / 640., -92097 / 339200.,
+           187 / 2100., 1 / 40.],
+    order_low=4)
+
+
+def rkmk_stages(tableau, dynamics, vels, forces, h):
+    '''
+        Computes the stages of a RKMK step of size h. Returns the
+        lists of the derivatives of omega and of the velocity.
+    '''
+    domegas = []
+    dvels = []
+    for i in range(tableau.stages):
+        if i == 0:
+            v = vels
+            domega = v
+        else:
+            a = tableau.a[i]
+            omega = h * _combine(a, domegas)
+            v = vels + h * _combine(a, dvels)
+            domega = dexpinv(omega, v)
+        domegas.append(domega)
+        dvels.append(dynamics._acceleration(v, forces))
+    return domegas, dvels
+
+
+def _combine(weights, values):
+    ''' Returns sum_i weights[i] * values[i], skipping the zeros. '''
+    result = 0
+    for w, value in zip(weights, values):
+        if w != 0:
+            result = result + float(w) * value
+    return result
+
+
+class RKMKIntegrator(Integrator):
+    ''' Fixed-step Runge-Kutta-Munthe-Kaas integrator. '''
+
+    def __init__(self, tableau=RK4):
+        self.tableau = tableau
+
+    def __repr__(self):
+        return 'RKMKIntegrator(order=%d)' % self.tableau.order
+
+    def increment(self, dynamics, vels, forces, dt):
+        domegas, dvels = rkmk_stages(self.tableau, dynamics, vels, forces, dt)
+        omega = dt * _combine(self.tableau.b, domegas)
+        vels2 = vels + dt * _combine(self.tableau.b, dvels)
+        return dynamics._group_from_algebra(omega), vels2
+
+
+class AdaptiveRKMKIntegrator(Integrator):
+    '''
+        RKMK integrator with an embedded pair: each call to increment()
+        covers dt with as many substeps as needed to keep the
+        estimated local error below *tol* (relative to the size of
+        omega and the velocity, with absolute floor *tol*).
+
+        For stacks of states, the same substeps are used for all,
+        driven by the largest error.
+    '''
+
+    @contract(tol='>0', max_substeps='int,>=1')
+    def __init__(self, tableau=DOPRI54, tol=1e-8, max_substeps=10000):
+        if tableau.b_low is None:
+            raise ValueError('The tableau does not have an embedded pair.')
+        self.tableau = tableau
+        self.tol = tol
+        self.max_substeps = max_substeps
+
+    def __repr__(self):
+        return 'AdaptiveRKMKIntegrator(tol=%g)' % self.tol
+
+    def increment(self, dynamics, vels, forces, dt):
+        tableau = self.tableau
+        exponent = 1.0 / (tableau.order_low + 1)
+        total = None
+        t = 0.0
+        h = dt # try the whole step first
+        for _ in range(self.max_substeps):
+            if t >= dt:
+                break
+            last = h >= dt - t
+            if last:
+                h = dt - t
+            domegas, dvels = rkmk_stages(tableau, dynamics, vels, forces, h)
+            omega = h * _combine(tableau.b, domegas)
+            vels2 = vels + h * _combine(tableau.b, dvels)
+            omega_low = h * _combine(tableau.b_low, domegas)
+            vels2_low = vels + h * _combine(tableau.b_low, dvels)
+            error = max(self._error(omega, omega_low),
+                        self._error(vels2, vels2_low))
+            if error <= 1:
+                step = dynamics._group_from_algebra(omega)
+                total = step if total is None else np.matmul(total, step)
+                vels = vels2
+                t = dt if last else t + h
+            if error == 0:
+                factor = 5.0
+            else:
+                factor = min(5.0, max(0.2, 0.9 * error ** -exponent))
+            h = h * factor
+        else:
+            if t < dt:
+                msg = ('Could not reach tolerance %g in %d substeps.' %
+                       (self.tol, self.max_substeps))
+                raise ValueError(msg)
+        if total is None:
+            # dt == 0
+            total = dynamics._group_from_algebra(np.zeros_like(vels))
+        return total, vels
+
+    def _error(self, x, x_low):
+        scale = self.tol * (1 + np.abs(x))
+        return float(np.max(np.abs(x - x_low) / scale)) if x.size else 0.0
+
+
+class ExactIntegrator(Integrator):
+    '''
+        Exact solution for abelian pose spaces, where the velocity and
+        the displacement do not interact. With c = damping / mass
+        and a = forces / mass: ::
+
+            vel(t)   = vel0 + (a - c vel0) phi1(t)
+            omega(t) = vel0 phi1(t) + a phi2(t)
+
+        where phi1(t) = (1 - exp(-c t)) / c and phi2(t) = (t - phi1(t)) / c
+        (t and t^2/2 for c = 0), and pose(t) = pose0 * exp(omega(t)).
+    '''
+
+    def __repr__(self):
+        return 'ExactIntegrator()'
+
+    def increment(self, dynamics, vels, forces, dt):
+        c = float(dynamics.damping) / dynamics.mass
+        phi1, phi2 = exact_weights(c, dt)
+        a = forces / dynamics.mass
+        vels2 = vels + (a - c * vels) * phi1
+        omega = vels * phi1 + a * phi2
+        return dynamics._group_from_algebra(omega), vels2
+
+
+def exact_weights(c, t):
+    ''' Returns phi1(t), phi2(t) (see ExactIntegrator), computed stably. '''
+    x = c * t
+    if abs(x) < 1e-4:
+        # series expansions, to avoid the cancellations
+        phi1 = t * (1 - x / 2 + x * x / 6 - x * x * x / 24)
+        phi2 = t * t * (0.5 - x / 6 + x * x / 24 - x * x * x / 120)
+    else:
+        phi1 = -math.expm1(-x) / c
+        phi2 = (t - phi1) / c
+    return phi1, phi2
+
+
+def is_abelian(algebra):
+    ''' Returns True if all the brackets of the basis vanish. '''
+    basis, _ = algebra_basis(algebra)
+    for a in basis:
+        for b in basis:
+            if np.any(commutator(a, b) != 0):
+                return False
+    return True
+
+
+# name -> constructor
+integrators = {
+    'midpoint': MidpointIntegrator,
+    'rk4': RKMKIntegrator,
+    'adaptive': AdaptiveRKMKIntegrator,
+    'exact': ExactIntegrator,
+}
+
+
+def integrator_for(integrator, **params):
+    '''
+        Returns an Integrator: *integrator* is either an instance,
+        or one of the names in integrators, created with params.
+    '''
+    if isinstance(integrator, Integrator):
+        return integrator
+    if not integrator in integrators:
+        msg = ('Unknown integrator %r; expected one of %s.' %
+               (integrator, sorted(integrators)))
+        raise ValueError(msg)
+    return integrators[integrator](**params)
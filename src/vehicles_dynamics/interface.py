@@ -1,4 +1,7 @@
-from . import logger
+from . import (logger, np, contract_at, validation_enabled, validation_rank,
+    validation_level_from_rank, get_validation_level, VALIDATION_FULL,
+    VALIDATION_BOUNDARY, get_profiler, CommandsChecker, COMMANDS_RAISE,
+    check_commands_mode, InvalidCommands)
 from abc import ABCMeta, abstractmethod
 from contracts import contract, new_contract
 import traceback
@@ -20,6 +23,10 @@ class Dynamics:
     
     
         In general, "state" is an opaque variable from outside.
+        Every state also has a compact form, a flat float64 vector,
+        obtained with to_compact() and converted back with 
+        from_compact(); integrate(), joint_state() and state_to_yaml() 
+        accept both forms.
         
         The function:
         
@@ -47,6 +54,15 @@ class Dynamics:
     '''
     __metaclass__ = ABCMeta
 
+    # None means: use the process-wide validation level
+    _validation_rank = None
+    # None means: use the process-wide profiler, if any
+    _profiler = None
+    # what to do with invalid commands; see the commands_checker module
+    _commands_mode = COMMANDS_RAISE
+    # compiled from the commands spec on first use
+    _commands_checker = None
+
     @contract(commands_spec='dict',
               state_space='DifferentiableManifold')
     def __init__(self, state_space, commands_spec):
@@ -56,11 +72,82 @@ class Dynamics:
     @contract(commands='array')
     def check_commands(self, commands):
         ''' 
-            Raises an exception (InvalidCommands) if the commands 
-            are not valid. 
+            Checks a command (array (m,)) or a batch of commands 
+            (array (N, m)) against the commands spec, and raises 
+            InvalidCommands if they are not valid. Returns the commands 
+            to use: in the 'round' and 'clip' modes (see 
+            set_commands_mode()), they are corrected first.
         '''
-        # TODO: not implemented
-        pass
+        checker = self.get_commands_checker()
+        commands2, bad = checker.apply(commands, self._commands_mode)
+        if bad is not None:
+            raise InvalidCommands(self, commands,
+                                  checker.describe(commands2, bad))
+        return commands2
+
+    def _checked_commands(self, commands, level):
+        ''' 
+            Returns check_commands(commands) if the checks at the given
+            level are enabled, or if the commands need to be corrected;
+            otherwise returns the commands unchanged.
+        '''
+        if self._commands_mode != COMMANDS_RAISE or self._validating(level):
+            return self.check_commands(commands)
+        return commands
+
+    def set_commands_mode(self, mode):
+        ''' 
+            Sets what to do with invalid commands: 'raise' (the default),
+            'round' (round the discrete channels first) or 'clip' (clip 
+            all the channels to their range). The corrections are 
+            applied at any validation level.
+        '''
+        check_commands_mode(mode)
+        self._commands_mode = mode
+
+    def get_commands_mode(self):
+        return self._commands_mode
+
+    def get_commands_checker(self):
+        ''' Returns the CommandsChecker compiled from the commands spec. '''
+        if self._commands_checker is None:
+            self._commands_checker = CommandsChecker(self.get_commands_spec())
+        return self._commands_checker
+
+    def set_validation_level(self, level):
+        ''' 
+            Sets the validation level for this instance: one of 'off',
+            'boundary-only', 'full', or None to use the process default
+            (see the validation module).
+        '''
+        if level is None:
+            self._validation_rank = None
+        else:
+            self._validation_rank = validation_rank(level)
+
+    def get_validation_level(self):
+        ''' Returns the validation level in effect for this instance. '''
+        if self._validation_rank is None:
+            return get_validation_level()
+        return validation_level_from_rank(self._validation_rank)
+
+    def _validating(self, level):
+        ''' Returns True if the checks at the given level are enabled. '''
+        return validation_enabled(self._validation_rank, level)
+
+    def set_profiler(self, profiler):
+        ''' 
+            Sets the StageProfiler for this instance, or None to use 
+            the process-wide one (see the instrumentation module).
+        '''
+        self._profiler = profiler
+
+    def _active_profiler(self):
+        ''' Returns the StageProfiler in use, or None. '''
+        profiler = self._profiler
+        if profiler is None:
+            profiler = get_profiler()
+        return profiler
 
     @contract(returns='DifferentiableManifold')
     def get_state_space(self):
@@ -75,10 +162,21 @@ class Dynamics:
         """ Returns the commands specification. """
         return self._commands_spec
 
-    @contract(dt='>=0')
+    @contract_at(VALIDATION_FULL, dt='>=0')
     def integrate(self, state, commands, dt):
+        if self.is_compact(state):
+            # integrate in the usual form, return in the compact form
+            state2 = self.integrate(self.from_compact(state), commands, dt)
+            return self.to_compact(state2)
         #self._state_space.belongs(state)    
-        self.check_commands(commands)
+        profiler = self._active_profiler()
+        if profiler is not None:
+            start = profiler.clock()
+        if (self._validating(VALIDATION_FULL) or
+            self._commands_mode != COMMANDS_RAISE):
+            commands = self.check_commands(commands)
+            if profiler is not None:
+                profiler.lap('check_commands', start)
 
         try:
             new_state = self._integrate(state, commands, dt)
@@ -93,12 +191,86 @@ class Dynamics:
             logger.error(msg)
             raise
 
+        if profiler is not None:
+            profiler.lap('integrate', start)
         #self._state_space.belongs(new_state)
         return new_state
 
+    @contract_at(VALIDATION_FULL, dt='>=0')
+    def integrate_into(self, state, commands, dt, out):
+        ''' 
+            Same as integrate(), but writes the new state in the 
+            given arrays, which are returned: out is a tuple of arrays
+            (pose2, vel2) for the usual states, or an array for the
+            compact ones. It can be the state itself.
+            
+            This generic version calls integrate() and copies the
+            result; subclasses can avoid allocating the temporaries.
+        '''
+        copy_state(self.integrate(state, commands, dt), out)
+        return out
+
+    @contract_at(VALIDATION_BOUNDARY, commands_seq='array[TxM]', dt='>=0')
+    def rollout(self, state, commands_seq, dt):
+        ''' 
+            Integrates the dynamics for T steps, using the commands
+            commands_seq[t] at step t.
+            
+            The state must be a tuple (pose, vel) of arrays. Returns a
+            tuple (poses, vels) of contiguous arrays of shape (T+1, ...),
+            where poses[0], vels[0] is the initial state and 
+            poses[t], vels[t] is the state after t steps.
+            
+            This generic version calls integrate() at each step; 
+            subclasses can provide faster implementations.
+        '''
+        commands_seq = self._checked_commands(commands_seq,
+                                              VALIDATION_BOUNDARY)
+        T = commands_seq.shape[0]
+        pose, vel = state
+        dtype = np.result_type(pose, vel)
+        poses = np.empty((T + 1,) + np.shape(pose), dtype=dtype)
+        vels = np.empty((T + 1,) + np.shape(vel), dtype=dtype)
+        poses[0] = pose
+        vels[0] = vel
+        for t in range(T):
+            state = self.integrate(state, commands_seq[t], dt)
+            poses[t + 1], vels[t + 1] = state
+        return poses, vels
+
     def __str__(self):
         return self.__class__.__name__
 
+    @staticmethod
+    def is_compact(state):
+        ''' Returns True if the state is in the compact form. '''
+        return isinstance(state, np.ndarray) and state.ndim == 1
+
+    def _state_from(self, state):
+        ''' Returns the state in the usual form, converting if compact. '''
+        if self.is_compact(state):
+            return self.from_compact(state)
+        return state
+
+    def to_compact(self, state):
+        ''' 
+            Returns the compact form of the state: a flat float64
+            array of size compact_size(). 
+        '''
+        msg = 'Compact states not implemented for %s.' % self
+        raise NotImplementedError(msg)
+
+    def from_compact(self, x):
+        ''' Inverse of to_compact(). The conversion is lossless. '''
+        msg = 'Compact states not implemented for %s.' % self
+        raise NotImplementedError(msg)
+
+    @contract(returns='int,>=1')
+    def compact_size(self):
+        ''' Returns the size of the compact states. '''
+        msg = 'Compact states not implemented for %s.' % self
+        raise NotImplementedError(msg)
+
     # Interface that must be implemented
 
     @abstractmethod
@@ -129,4 +301,30 @@ class Dynamics:
         """ Returns the number of joints. At least 1. """
         return 1
 
+    def joint_states_batch(self, states):
+        ''' 
+            Returns the poses and velocities of all the joints of N
+            states, as two arrays (N, J, 4, 4), where J = num_joints().
+            
+            The states are given as a sequence, or as an array 
+            (N, compact_size()) of compact states.
+            
+            This generic version calls joint_state() for each joint;
+            subclasses can provide faster implementations.
+        '''
+        J = self.num_joints()
+        poses = np.empty((len(states), J, 4, 4))
+        vels = np.empty((len(states), J, 4, 4))
+        for i, state in enumerate(states):
+            for j in range(J):
+                poses[i, j], vels[i, j] = self.joint_state(state, joint=j)
+        return poses, vels
+
 
+def copy_state(state, out):
+    ''' Copies the state (an array, or a tuple of arrays) in out. '''
+    if isinstance(out, np.ndarray):
+        out[...] = state
+    else:
+        for x, y in zip(state, out):
+            y[...] = x
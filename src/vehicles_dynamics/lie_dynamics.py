@@ -1,15 +1,33 @@
-from . import contract, np, SimpleKinematics
+from . import (contract, np, SimpleKinematics, contract_at,
+    VALIDATION_BOUNDARY, VALIDATION_FULL, integrator_for, MidpointIntegrator,
+    ExactIntegrator, exact_weights, is_abelian, ad_matrices, exp_and_phi,
+    commands_jacobian, vectors_from_algebra, algebra_basis, copy_state)
 from abc import abstractmethod
 
 
 class SimpleDynamics(SimpleKinematics):
+    ''' 
+        A subclass for dynamics controlled in force: ::
+        
+            d/dt pose = pose * vel
+            d/dt vel  = (forces - damping * vel) / mass
+            
+        The forces are constant during a step. The step is computed 
+        by an Integrator (see the integrators module). By default,
+        it is 'exact' (the closed-form solution) if the pose space 
+        is abelian, and otherwise one explicit midpoint step; 
+        'rk4' and 'adaptive' are more accurate, and allow much 
+        larger steps.
+    '''
     # TODO: add noise
 
-    @contract(mass='>0')
-    def __init__(self, pose_space, commands_spec, mass, damping):
-        SimpleKinematics.__init__(self, pose_space, commands_spec)
+    @contract(mass='>0', dtype='str')
+    def __init__(self, pose_space, commands_spec, mass, damping,
+                 integrator=None, dtype='float64'):
+        SimpleKinematics.__init__(self, pose_space, commands_spec, dtype=dtype)
         self.mass = mass
         self.damping = damping
+        self.set_integrator(integrator)
 
     def __repr__(self):
         return "LieDynamics(%s)" % self.pose_space
@@ -17,20 +35,275 @@ class SimpleDynamics(SimpleKinematics):
     def compute_velocities(self, commands):
         raise ValueError('Not needed!.')
 
+    def compute_velocities_batch(self, commands):
+        raise ValueError('Not needed!.')
+
+    def compute_velocities_jacobian_batch(self, commands):
+        raise ValueError('Not needed!.')
+
+    def enable_step_cache(self, maxsize=1024, quantum=1e-9):
+        msg = ('Cannot cache the steps of %s: they depend on the '
+               'velocity, not only on the commands.' % self)
+        raise ValueError(msg)
+
+    def set_integrator(self, integrator, **params):
+        ''' 
+            Sets the integrator: an Integrator instance, or one of
+            'midpoint', 'rk4', 'adaptive', 'exact', created with the 
+            given parameters (for example, tol=1e-10 for 'adaptive').
+            None chooses 'exact' if possible, else 'midpoint'.
+        '''
+        abelian = is_abelian(self.pose_space.get_algebra())
+        if integrator is None:
+            integrator = 'exact' if abelian else 'midpoint'
+        integrator = integrator_for(integrator, **params)
+        if isinstance(integrator, ExactIntegrator) and not abelian:
+            msg = ('The exact integrator needs an abelian pose space, '
+                   'not %s.' % self.pose_space)
+            raise ValueError(msg)
+        self._integrator = integrator
+
+    def get_integrator(self):
+        return self._integrator
+
+    def _acceleration(self, vels, forces):
+        return (forces - vels * self.damping) / self.mass
+
     @abstractmethod
     def compute_forces(self, commands):
         pass
 
+    def compute_forces_batch(self, commands):
+        ''' 
+            Batched version of :py:func:`compute_forces`: given an
+            array (N, m) of commands, returns an array (N, k, k) of 
+            elements of the algebra.
+            
+            Subclasses should override this with a vectorized 
+            implementation; the default calls compute_forces() 
+            once per row.
+        '''
+        return np.array([self.compute_forces(c) for c in commands])
+
+    def compute_forces_jacobian_batch(self, commands):
+        ''' 
+            Given an array (N, m) of commands, returns the array (N, n, m)
+            of the derivatives of the coordinates of the forces 
+            with respect to the commands.
+            
+            Subclasses should override this with the analytic 
+            derivatives; the default uses central differences.
+        '''
+        return commands_jacobian(self.pose_space.get_algebra(),
+                                 self.compute_forces_batch, commands)
+
+    def _force_vector_into(self, commands, out):
+        ''' 
+            Writes the coordinates of compute_forces(commands) in the 
+            array out (n,). The default allocates; subclasses can 
+            override this with a version which does not.
+        '''
+        algebra = self.pose_space.get_algebra()
+        out[...] = algebra.vector_from_algebra(self.compute_forces(commands))
+
+    def _step_coefficients(self, dt):
+        ''' 
+            For the midpoint and exact integrators, where the step is 
+            linear in the velocity vel and the forces F: ::
+            
+                vel2  = gamma vel + delta F
+                omega = alpha vel + beta F     (pose2 = pose exp(omega))
+            
+            returns (alpha, beta, gamma, delta); otherwise None.
+        '''
+        integrator = self._integrator
+        if isinstance(integrator, MidpointIntegrator):
+            c = float(self.damping) / self.mass
+            gamma = 1 - c * dt
+            delta = dt / self.mass
+            alpha = dt * (1 + gamma) / 2
+            beta = dt * delta / 2
+        elif isinstance(integrator, ExactIntegrator):
+            c = float(self.damping) / self.mass
+            phi1, phi2 = exact_weights(c, dt)
+            gamma = 1 - c * phi1
+            delta = phi1 / self.mass
+            alpha = phi1
+            beta = phi2 / self.mass
+        else:
+            return None
+        return alpha, beta, gamma, delta
+
+    def _linearize_batch(self, poses, vels, commands, dt):
+        coefficients = self._step_coefficients(dt)
+        if coefficients is None:
+            return self._linearize_numerically(poses, vels, commands, dt)
+        alpha, beta, gamma, delta = coefficients
+        algebra = self.pose_space.get_algebra()
+        N = poses.shape[0]
+        n = algebra.get_dimension()
+        m = commands.shape[1]
+        forces = self.compute_forces_batch(commands)
+        dF = self.compute_forces_jacobian_batch(commands)
+        omega = alpha * vels + beta * forces
+        Ad_inv, Jr = exp_and_phi(-ad_matrices(algebra, omega))
+        A = np.zeros((N, 2 * n, 2 * n))
+        B = np.zeros((N, 2 * n, m))
+        A[:, :n, :n] = Ad_inv
+        A[:, :n, n:] = alpha * Jr
+        A[:, n:, n:] = gamma * np.eye(n)
+        B[:, :n] = beta * np.matmul(Jr, dF)
+        B[:, n:] = delta * dF
+        return A, B
+
+    def _linearize_numerically(self, poses, vels, commands, dt, eps=1e-6):
+        ''' 
+            Linearization by central differences, for the integrators
+            whose step is not linear in the velocity and the forces.
+            All the perturbed states are integrated in one batch.
+        '''
+        algebra = self.pose_space.get_algebra()
+        basis, _ = algebra_basis(algebra)
+        N, k, _ = poses.shape
+        n = basis.shape[0]
+        m = commands.shape[1]
+        P = 2 * n + m
+        # perturbations along each direction, with sign +1 and -1
+        sp = np.zeros((P, k, k)) # pose
+        sv = np.zeros((P, k, k)) # vel
+        sc = np.zeros((P, m)) # commands
+        sp[:n] = basis * eps
+        sv[n:2 * n] = basis * eps
+        sc[2 * n:] = np.eye(m) * eps
+        result = []
+        for sign in [+1, -1]:
+            step = self._group_from_algebra(sign * sp)
+            p = np.matmul(poses[:, np.newaxis], step)
+            v = vels[:, np.newaxis] + sign * sv
+            c = commands[:, np.newaxis] + sign * sc
+            forces = self.compute_forces_batch(c.reshape(N * P, m))
+            steps, v2 = self._integrator.increment(self,
+                                                   v.reshape(N * P, k, k),
+                                                   forces, dt)
+            p2 = np.matmul(p.reshape(N * P, k, k), steps)
+            result.append((p2.reshape(N, P, k, k), v2.reshape(N, P, k, k)))
+        (p_plus, v_plus), (p_minus, v_minus) = result
+        # nominal next pose, for the right-trivialization
+        forces = self.compute_forces_batch(commands)
+        steps, _ = self._integrator.increment(self, vels, forces, dt)
+        inv = np.linalg.inv(np.matmul(poses, steps))[:, np.newaxis]
+        dpose = (np.matmul(inv, p_plus) - np.matmul(inv, p_minus)) / (2 * eps)
+        dvel = (v_plus - v_minus) / (2 * eps)
+        # (N, P, n) -> (N, n, P)
+        dpose = np.swapaxes(vectors_from_algebra(algebra, dpose), 1, 2)
+        dvel = np.swapaxes(vectors_from_algebra(algebra, dvel), 1, 2)
+        J = np.concatenate((dpose, dvel), axis=1)
+        return J[:, :, :2 * n], J[:, :, 2 * n:]
+
     def _integrate(self, state, commands, dt):
-        pose1, vel1 = state #@UnusedVariable
-        forces = self.compute_forces(commands)
+        if not self._validating(VALIDATION_FULL):
+            return self._integrate_one(state, commands, dt)
+        pose1, vel1 = self._cast(state[0]), self._cast(state[1])
+        profiler = self._active_profiler()
+        if profiler is not None:
+            t = profiler.clock()
+        forces = self._cast(self.compute_forces(commands))
         #self.pose_space.algebra.belongs(forces)
-        # TODO: this is not in closed form
-        # TODO: make smaller step
-        acc = (forces - vel1 * self.damping) / self.mass # XXX: like this?
-        vel2 = vel1 + dt * acc
-        midvel = 0.5 * (vel1 + vel2)
-        step = self.pose_space.group_from_algebra(midvel * dt)
-        pose2 = np.dot(pose1, step)
-        return pose2, vel2
+        if profiler is not None:
+            t = profiler.lap('forces', t)
+        steps, vels2 = self._integrator.increment(self, vel1[np.newaxis],
+                                                  forces[np.newaxis], dt)
+        if profiler is not None:
+            t = profiler.lap('integrator', t)
+        pose2 = np.dot(pose1, steps[0])
+        if profiler is not None:
+            profiler.lap('composition', t)
+        return pose2, vels2[0]
+
+    def _integrate_into(self, buffers, state, commands, dt, out):
+        coefficients = self._step_coefficients(dt)
+        if coefficients is None:
+            # the other integrators allocate anyway
+            copy_state(self._integrate(state, commands, dt), out)
+            return
+        alpha, beta, gamma, delta = coefficients
+        b = buffers
+        pose1, vel1 = state
+        self._force_vector_into(commands, b.w)
+        np.dot(b.w, b.basis, out=b.forces_flat)
+        np.multiply(vel1, gamma, out=b.vel)
+        np.multiply(b.forces, delta, out=b.omega)
+        b.vel += b.omega
+        np.multiply(b.forces, beta, out=b.forces)
+        np.multiply(vel1, alpha, out=b.omega)
+        b.omega += b.forces
+        self._group_from_algebra(b.omega, out=b.step)
+        np.dot(pose1, b.step, out=b.pose)
+        copy_state((b.pose, b.vel), out)
+
+    @contract_at(VALIDATION_BOUNDARY,
+                 poses='array[NxKxK]', vels='array[NxKxK]',
+                 commands='array[NxM]', dt='>=0')
+    def integrate_batch(self, poses, vels, commands, dt):
+        ''' Batched version of _integrate(); see SimpleKinematics. '''
+        commands = self._checked_commands(commands, VALIDATION_BOUNDARY)
+        return self._integrate_batch(poses, vels, commands, dt)
+
+    def _integrate_batch(self, poses, vels, commands, dt):
+        profiler = self._active_profiler()
+        if profiler is not None:
+            t = profiler.clock()
+        forces = self._cast(self.compute_forces_batch(commands))
+        if profiler is not None:
+            t = profiler.lap('forces', t)
+        steps, vels2 = self._integrator.increment(self, self._cast(vels),
+                                                  forces, dt)
+        if profiler is not None:
+            t = profiler.lap('integrator', t)
+        poses2 = np.matmul(self._cast(poses), steps)
+        if profiler is not None:
+            profiler.lap('composition', t)
+        return poses2, vels2
 
+    @contract_at(VALIDATION_BOUNDARY,
+                 state='tuple(*,*)', commands_seq='array[TxM]', dt='>=0')
+    def rollout(self, state, commands_seq, dt):
+        ''' 
+            Fused version of Dynamics.rollout(). The forces are computed
+            all at once; with the midpoint and exact integrators, the 
+            velocity recursion is done in place, and the exponentials
+            are computed all at once. 
+        '''
+        commands_seq = self._checked_commands(commands_seq,
+                                              VALIDATION_BOUNDARY)
+        poses, vels = self._rollout_buffers(state, commands_seq)
+        T = commands_seq.shape[0]
+        if T == 0:
+            return poses, vels
+        forces = self._cast(self.compute_forces_batch(commands_seq))
+        integrator = self._integrator
+        if isinstance(integrator, MidpointIntegrator):
+            # (Python floats, which do not change the dtype of the arrays)
+            decay = 1 - float(dt * self.damping / self.mass)
+            gain = float(dt) / self.mass
+            for t in range(T):
+                np.multiply(vels[t], decay, out=vels[t + 1])
+                vels[t + 1] += gain * forces[t]
+            midvels = 0.5 * (vels[:-1] + vels[1:])
+            self._accumulate_steps(poses, midvels * dt)
+        elif isinstance(integrator, ExactIntegrator):
+            c = float(self.damping) / self.mass
+            phi1, phi2 = exact_weights(c, dt)
+            accs = forces / self.mass
+            decay = 1 - c * phi1
+            for t in range(T):
+                np.multiply(vels[t], decay, out=vels[t + 1])
+                vels[t + 1] += phi1 * accs[t]
+            self._accumulate_steps(poses, vels[:-1] * phi1 + accs * phi2)
+        else:
+            for t in range(T):
+                steps, vels2 = integrator.increment(self, vels[t:t + 1],
+                                                    forces[t:t + 1], dt)
+                vels[t + 1] = vels2[0]
+                np.dot(poses[t], steps[0], out=poses[t + 1])
+        return poses, vels
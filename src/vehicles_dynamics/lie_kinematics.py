@@ -1,4 +1,8 @@
-from . import Dynamics, contract, np
+from . import (Dynamics, contract, np, vectors_from_algebra,
+    algebra_from_vectors, exponential_for, contract_at, VALIDATION_FULL,
+    VALIDATION_BOUNDARY, embed_in_SE3, embed_in_se3, NoiseStream, StepCache,
+    compact_layout, ad_matrices, exp_and_phi, commands_jacobian,
+    algebra_basis, copy_state, COMMANDS_RAISE)
 from abc import abstractmethod
 from geometry import SE3, se3
 from geometry.yaml import to_yaml
@@ -27,29 +31,49 @@ class SimpleKinematics(Dynamics):
         For simplicity, both M0 and M1 are assumed to be diagonal matrices.
         They are called, respectively, noise_drift and noise_mult below.
         
+        If both are zero, the noise is skipped altogether. Otherwise, 
+        the samples come from a per-instance NoiseStream; see 
+        :py:func:`seed_noise` and :py:func:`set_noise_stream`.
+        
         configuration = (pose, vel)
         
+        The poses and velocities are arrays of the given *dtype*, 
+        either 'float64' (the default) or 'float32', which halves
+        the memory traffic of large batches. With float32, each 
+        step adds a relative rounding error of about 1e-7, which
+        accumulates about linearly: for all the specializations, 
+        after 1000 steps (dt = 0.01) the entries of the poses and
+        velocities differ from the float64 ones by less than 1e-4
+        (see tests/test_dtypes.py). The compact states, the joint 
+        states and the linearization are always float64.
+        
     '''
 
     @contract(pose_space='DifferentiableManifold',
               noise_drift='None|seq[K](>=0)',
-              noise_mult='None|seq[K](>=0)')
+              noise_mult='None|seq[K](>=0)',
+              dtype='str')
     def __init__(self, pose_space, commands_spec,
-                 noise_drift=None, noise_mult=None):
-        if not pose_space.embeddable_in(SE3):
+                 noise_drift=None, noise_mult=None, dtype='float64'):
+        # (geometry does not consider SE3 embeddable in itself)
+        if not (pose_space is SE3 or pose_space.embeddable_in(SE3)):
             msg = 'I expect a subgroup of SE3.'
             raise ValueError(msg)
+        if not dtype in ['float32', 'float64']:
+            msg = 'Expected dtype float32 or float64, got %r.' % dtype
+            raise ValueError(msg)
+        self.dtype = np.dtype(dtype)
         algebra = pose_space.get_algebra()
         n = algebra.get_dimension()
 
         if noise_drift is None:
-            noise_drift = np.zeros(n)
+            noise_drift = np.zeros(n, dtype=self.dtype)
 
         if noise_mult is None:
-            noise_mult = np.zeros(n)
+            noise_mult = np.zeros(n, dtype=self.dtype)
 
-        noise_drift = np.array(noise_drift)
-        noise_mult = np.array(noise_mult)
+        noise_drift = np.array(noise_drift, dtype=self.dtype)
+        noise_mult = np.array(noise_mult, dtype=self.dtype)
 
         if noise_mult.size != n:
             msg = 'Wrong size for noise_mult: %s' % str(noise_mult)
@@ -61,7 +85,13 @@ class SimpleKinematics(Dynamics):
 
         self.noise_drift = noise_drift
         self.noise_mult = noise_mult
+        self._noiseless = not (np.any(noise_drift) or np.any(noise_mult))
+        self._noise = None # created on first use
+        self._step_cache = None
+        self._step_buffers = None # created by integrate_into()
         self.pose_space = pose_space
+        # closed-form exponential map, if available for this space
+        self._group_from_algebra = exponential_for(pose_space)
 
         conf_space = pose_space.tangent_bundle()
 
@@ -71,38 +101,198 @@ class SimpleKinematics(Dynamics):
     def __repr__(self):
         return "LieKinematics(%s)" % self.pose_space
 
+    def _cast(self, x):
+        ''' Returns x as an array of our dtype (without copying, if it is). '''
+        return np.asarray(x, dtype=self.dtype)
+
+    def __setattr__(self, name, value):
+        if not name.startswith('_') and isinstance(value, np.ndarray):
+            # The parameters can only be changed by assigning them, so
+            # that the cached steps are never stale.
+            value = value.copy()
+            value.flags.writeable = False
+        object.__setattr__(self, name, value)
+        if name.startswith('_'):
+            return
+        # A parameter changed: cached steps are not valid anymore.
+        cache = self.__dict__.get('_step_cache')
+        if cache is not None:
+            cache.clear()
+        noise_params = ['noise_drift', 'noise_mult']
+        if name in noise_params and '_noiseless' in self.__dict__:
+            self._noiseless = not (np.any(self.noise_drift) or
+                                   np.any(self.noise_mult))
+
+    def enable_step_cache(self, maxsize=1024, quantum=1e-9):
+        ''' 
+            Enables caching of the integration steps in integrate(),
+            keyed by the commands and dt quantized to *quantum*.
+            This is useful when the commands take few distinct values
+            (discrete or quantized commands). Only used if the 
+            dynamics is noise-free. Returns the StepCache.
+
+            The cache is cleared when a parameter is assigned. The
+            array parameters are read-only, so that they cannot be
+            changed in place behind the back of the cache: ::
+
+                dynamics.max_velocity[0] = 2       # ValueError
+                dynamics.max_velocity = np.array([2, 1])  # ok
+        '''
+        self._step_cache = StepCache(maxsize=maxsize, quantum=quantum)
+        return self._step_cache
+
+    def disable_step_cache(self):
+        self._step_cache = None
+
+    def get_step_cache(self):
+        ''' Returns the StepCache in use, or None. '''
+        return self._step_cache
+
+    @contract(commands_list='array[NxM]', dt='>=0')
+    def precompute_steps(self, commands_list, dt):
+        ''' 
+            Fills the step cache (which must be enabled) with the 
+            steps for the given commands, in one batch.
+        '''
+        cache = self._step_cache
+        if cache is None:
+            raise ValueError('The step cache is not enabled.')
+        keys = []
+        snapped = []
+        for commands in commands_list:
+            key, commands, dt_q = cache.quantize(commands, dt)
+            keys.append(key)
+            snapped.append(commands)
+        vels = self.compute_velocities_batch(np.array(snapped))
+        steps = self._group_from_algebra(vels * dt_q)
+        for key, step, vel in zip(keys, steps, vels):
+            cache.put(key, self._cache_entry(step, vel))
+
+    def is_noiseless(self):
+        ''' Returns True if both noise_drift and noise_mult are zero. '''
+        return self._noiseless
+
+    def seed_noise(self, seed):
+        ''' Resets the noise with a new NoiseStream with the given seed. '''
+        self.set_noise_stream(NoiseStream(seed))
+
+    @contract(stream=NoiseStream)
+    def set_noise_stream(self, stream):
+        ''' 
+            Sets the source of the noise samples; use NoiseStream.spawn()
+            to obtain independent streams for parallel workers. 
+        '''
+        self._noise = stream
+
+    def get_noise_stream(self):
+        ''' 
+            Returns the NoiseStream used by this instance. Unless one was
+            set explicitly, it is created on first use, with a seed drawn
+            from numpy's global random state, so that np.random.seed()
+            still makes the simulations reproducible.
+        '''
+        if self._noise is None:
+            self._noise = NoiseStream(np.random.randint(2 ** 31))
+        return self._noise
+
     def state_to_yaml(self, state):
-        my_pose, my_vel = state
-        self.pose_space.belongs(my_pose)
-        self.pose_space.algebra.belongs(my_vel)
-        pose = self.pose_space.embed_in(SE3, my_pose)
-        vel = self.pose_space.algebra.embed_in(se3, my_vel)
+        pose, vel = self._embed_state(state)
         return to_yaml('TSE3', (pose, vel))
 
-    @contract(pose='SE3')
-    def pose2state(self, pose):
+    def _embed_state(self, state):
+        ''' Returns the state embedded in (SE3, se3). '''
+        my_pose, my_vel = self._state_from(state)
+        if self._validating(VALIDATION_FULL) and self.pose_space is not SE3:
+            self.pose_space.belongs(my_pose)
+            self.pose_space.algebra.belongs(my_vel)
+            pose = self.pose_space.embed_in(SE3, my_pose)
+            vel = self.pose_space.algebra.embed_in(se3, my_vel)
+        else:
+            if self._validating(VALIDATION_FULL):
+                self.pose_space.belongs(my_pose)
+                self.pose_space.algebra.belongs(my_vel)
+            pose = embed_in_SE3(self.pose_space, my_pose)
+            vel = embed_in_se3(self.pose_space.algebra, my_vel)
+        return pose, vel
+
+    @contract_at(VALIDATION_FULL, pose='SE3', compact='bool')
+    def pose2state(self, pose, compact=False):
         ''' 
             Projects the pose to our subgroup, and sets the 
-            velocity to zero. 
+            velocity to zero. If compact is True, returns the
+            state in the compact form.
         '''
-        my_pose = self.pose_space.project_from(SE3, pose)
-        my_vel = self.pose_space.algebra.zero()
+        if self.pose_space is SE3:
+            my_pose = self._cast(pose).copy()
+        else:
+            my_pose = self._cast(self.pose_space.project_from(SE3, pose))
+        my_vel = self._cast(self.pose_space.algebra.zero())
         assert my_pose.shape == my_vel.shape
         configuration = (my_pose, my_vel)
+        if compact:
+            return self.to_compact(configuration)
         return configuration
 
-    @contract(state='tuple(*,*)', returns='tuple(SE3, se3)')
+    def get_compact_layout(self):
+        ''' 
+            Returns the CompactLayout of the states; it can convert 
+            whole stacks of states, such as the output of rollout().
+        '''
+        return compact_layout(self.pose_space)
+
+    def compact_size(self):
+        return self.get_compact_layout().size
+
+    def to_compact(self, state):
+        pose, vel = state
+        return self.get_compact_layout().pack(pose, vel)
+
+    def from_compact(self, x):
+        pose, vel = self.get_compact_layout().unpack(x)
+        return self._cast(pose), self._cast(vel)
+
+    @contract_at(VALIDATION_FULL,
+                 state='tuple(*,*)|array[N]', returns='tuple(SE3, se3)')
     def joint_state(self, state, joint=0):
         if joint != 0:
             raise ValueError('Must be implemented by subclasses.')
-        my_pose, my_vel = state
-        self.pose_space.belongs(my_pose)
-        self.pose_space.algebra.belongs(my_vel)
-        pose = self.pose_space.embed_in(SE3, my_pose)
-        vel = self.pose_space.algebra.embed_in(se3, my_vel)
+        pose, vel = self._embed_state(state)
         configuration = (pose, vel)
         return configuration
 
+    def joint_states_batch(self, states):
+        ''' 
+            Vectorized version of Dynamics.joint_states_batch(). 
+            See also joint_states_arrays().
+        '''
+        poses, vels = self._stack_states(states)
+        return self.joint_states_arrays(poses, vels)
+
+    def joint_states_arrays(self, poses, vels):
+        ''' 
+            Same as joint_states_batch(), for the states given as
+            arrays (N, k, k) of poses and velocities (for example,
+            the output of rollout()).
+        '''
+        return (embed_in_SE3(self.pose_space, poses)[:, np.newaxis],
+                embed_in_se3(self.pose_space.algebra, vels)[:, np.newaxis])
+
+    def _stack_states(self, states):
+        ''' 
+            Converts a sequence of states, or an array of compact states,
+            to two arrays (N, k, k). 
+        '''
+        if isinstance(states, np.ndarray) and states.ndim == 2:
+            return self.get_compact_layout().unpack(states)
+        states = [self._state_from(s) for s in states]
+        k = self.get_compact_layout().pose_layout.template.shape[0]
+        poses = np.empty((len(states), k, k), dtype=self.dtype)
+        vels = np.empty((len(states), k, k), dtype=self.dtype)
+        for i, (pose, vel) in enumerate(states):
+            poses[i] = pose
+            vels[i] = vel
+        return poses, vels
+
     @abstractmethod
     def compute_velocities(self, commands):
         ''' 
@@ -110,24 +300,345 @@ class SimpleKinematics(Dynamics):
             of the algebra. 
         '''
 
+    def compute_velocities_batch(self, commands):
+        ''' 
+            Batched version of :py:func:`compute_velocities`: given an
+            array (N, m) of commands, returns an array (N, k, k) of 
+            elements of the algebra.
+            
+            Subclasses should override this with a vectorized 
+            implementation; the default calls compute_velocities() 
+            once per row.
+        '''
+        return np.array([self.compute_velocities(c) for c in commands])
+
+    def compute_velocities_jacobian_batch(self, commands):
+        ''' 
+            Given an array (N, m) of commands, returns the array (N, n, m)
+            of the derivatives of the coordinates of the velocity 
+            (see compute_velocities()) with respect to the commands.
+            
+            Subclasses should override this with the analytic 
+            derivatives; the default uses central differences.
+        '''
+        return commands_jacobian(self.pose_space.get_algebra(),
+                                 self.compute_velocities_batch, commands)
+
+    @contract_at(VALIDATION_FULL, state='tuple(*,*)|array[N]', dt='>=0')
+    def linearize(self, state, commands, dt):
+        ''' 
+            Returns the Jacobians (A, B) of integrate() at the given
+            state and commands, for the perturbations in the 
+            parametrization described in the linearization module.
+            A has shape (2n, 2n) and B has shape (2n, m). The noise 
+            is not considered.
+        '''
+        pose, vel = self._state_from(state)
+        A, B = self._linearize_batch(pose[np.newaxis], vel[np.newaxis],
+                                     np.asarray(commands)[np.newaxis], dt)
+        return A[0], B[0]
+
+    @contract_at(VALIDATION_BOUNDARY,
+                 poses='array[NxKxK]', vels='array[NxKxK]',
+                 commands='array[NxM]', dt='>=0')
+    def linearize_batch(self, poses, vels, commands, dt):
+        ''' 
+            Batched version of linearize(); for example, along the 
+            trajectory given by rollout(): ::
+            
+                poses, vels = dynamics.rollout(state, commands_seq, dt)
+                A, B = dynamics.linearize_batch(poses[:-1], vels[:-1],
+                                                commands_seq, dt)
+        '''
+        return self._linearize_batch(poses, vels, commands, dt)
+
+    def _linearize_batch(self, poses, vels, commands, dt):
+        # pose2 = pose * exp(dt * V(commands)); vel2 = V(commands)
+        algebra = self.pose_space.get_algebra()
+        N = poses.shape[0]
+        n = algebra.get_dimension()
+        m = commands.shape[1]
+        V = self.compute_velocities_batch(commands)
+        dV = self.compute_velocities_jacobian_batch(commands)
+        Ad_inv, Jr = exp_and_phi(-ad_matrices(algebra, V * dt))
+        A = np.zeros((N, 2 * n, 2 * n))
+        B = np.zeros((N, 2 * n, m))
+        A[:, :n, :n] = Ad_inv
+        B[:, :n] = dt * np.matmul(Jr, dV)
+        B[:, n:] = dV
+        return A, B
+
     def _integrate(self, state, commands, dt):
+        if self._step_cache is not None and self._noiseless:
+            return self._integrate_cached(state, commands, dt)
+        if not self._validating(VALIDATION_FULL):
+            # skip the checks done by geometry, using the batch kernel
+            return self._integrate_one(state, commands, dt)
         pose1, unused_vel1 = state #@UnusedVariable
+        pose1 = self._cast(pose1)
+        profiler = self._active_profiler()
+        if profiler is not None:
+            t = profiler.clock()
         # This is the noiseless part of the dynamics
-        noiseless_vel = self.compute_velocities(commands)
+        noiseless_vel = self._cast(self.compute_velocities(commands))
+        if profiler is not None:
+            t = profiler.lap('velocities', t)
+        if self._noiseless:
+            vel2 = noiseless_vel
+        else:
+            vel2 = self._add_noise(noiseless_vel)
+            if profiler is not None:
+                t = profiler.lap('noise', t)
+        step = self._group_from_algebra(vel2 * dt)
+        if profiler is not None:
+            t = profiler.lap('exponential', t)
+        pose2 = np.dot(pose1, step)
+        if profiler is not None:
+            profiler.lap('composition', t)
+        config2 = pose2, vel2
+        return config2
+
+    def _integrate_cached(self, state, commands, dt):
+        ''' Noise-free step, using the step cache: a single product. '''
+        profiler = self._active_profiler()
+        if profiler is not None:
+            t = profiler.clock()
+        cache = self._step_cache
+        key, commands_q, dt_q = cache.quantize(commands, dt)
+        entry = cache.get(key)
+        if entry is None:
+            vel = self.compute_velocities_batch(commands_q[np.newaxis])[0]
+            step = self._group_from_algebra(vel * dt_q)
+            entry = self._cache_entry(step, vel)
+            cache.put(key, entry)
+        if profiler is not None:
+            t = profiler.lap('cache', t)
+        step, vel2 = entry
+        pose2 = np.dot(self._cast(state[0]), step)
+        if profiler is not None:
+            profiler.lap('composition', t)
+        return pose2, vel2
+
+    def _cache_entry(self, step, vel):
+        # The same arrays are shared by all the states that use them.
+        step = np.array(step, dtype=self.dtype)
+        vel = np.array(vel, dtype=self.dtype)
+        step.flags.writeable = False
+        vel.flags.writeable = False
+        return step, vel
+
+    def _add_noise(self, noiseless_vel):
+        ''' Applies the noise model to the "intentional" velocity. '''
         # Convert them to the vector representation
-        # TODO: do not do any of this if the noise is 0
         algebra = self.pose_space.get_algebra()
         w0 = algebra.vector_from_algebra(noiseless_vel)
         # w = w0 + Normal(M0 + M1*|w|)
         # Variance of the noise
         variance = self.noise_drift + self.noise_mult * np.abs(w0)
         # Noise contribution
-        wN = np.random.randn(variance.size) * np.sqrt(variance)
+        noise = self.get_noise_stream()
+        wN = noise.standard_normal(variance.size) * np.sqrt(variance)
         w = w0 + wN
         # Convert back to algebra
-        vel2 = algebra.algebra_from_vector(w)
-        step = self.pose_space.group_from_algebra(vel2 * dt)
-        pose2 = np.dot(pose1, step)
-        config2 = pose2, vel2
-        return config2
+        return self._cast(algebra.algebra_from_vector(w))
+
+    def _add_noise_batch(self, noiseless_vels):
+        ''' 
+            Applies the noise model to an array (N, k, k) of 
+            "intentional" velocities.
+        '''
+        if self._noiseless:
+            return noiseless_vels
+        algebra = self.pose_space.get_algebra()
+        w = self._add_noise_vectors(vectors_from_algebra(algebra,
+                                                         noiseless_vels))
+        return self._cast(algebra_from_vectors(algebra, w))
+
+    def _add_noise_vectors(self, w0):
+        ''' 
+            Applies the noise model to an array (N, n) of coordinates 
+            of the "intentional" velocities.
+        '''
+        if self._noiseless:
+            return w0
+        variance = self.noise_drift + self.noise_mult * np.abs(w0)
+        noise = self.get_noise_stream()
+        wN = noise.standard_normal(variance.shape) * np.sqrt(variance)
+        return w0 + wN
+
+    @contract_at(VALIDATION_FULL, dt='>=0')
+    def integrate_into(self, state, commands, dt, out):
+        ''' 
+            Same as Dynamics.integrate_into(). In the steady state of a
+            control loop: ::
+            
+                state = dynamics.pose2state(pose)
+                for ...:
+                    dynamics.integrate_into(state, commands, dt, out=state)
+            
+            no array is allocated: the step is computed in buffers 
+            kept by the instance, using _velocity_vector_into() and the
+            exponentials with out=. This needs states (pose, vel) of our 
+            dtype, and out of the same form; otherwise, and with the
+            step cache, this falls back to integrate(). 
+        '''
+        buffers = self._buffers_for(state, out)
+        if buffers is None:
+            return Dynamics.integrate_into(self, state, commands, dt, out)
+        if (self._validating(VALIDATION_FULL) or
+            self._commands_mode != COMMANDS_RAISE):
+            commands = self.check_commands(commands)
+        self._integrate_into(buffers, state, commands, dt, out)
+        return out
+
+    def _buffers_for(self, state, out):
+        ''' 
+            Returns the _StepBuffers if integrate_into() can use them 
+            for these arrays, or None. 
+        '''
+        if self._step_cache is not None and self._noiseless:
+            return None
+        if isinstance(state, np.ndarray) or isinstance(out, np.ndarray):
+            return None
+        buffers = self._step_buffers
+        if buffers is None:
+            buffers = _StepBuffers(self.pose_space.get_algebra(), self.dtype)
+            self._step_buffers = buffers
+        shape = buffers.pose.shape
+        for x in (state[0], state[1], out[0], out[1]):
+            if not (isinstance(x, np.ndarray) and x.shape == shape and
+                    x.dtype == self.dtype):
+                return None
+        return buffers
+
+    def _integrate_into(self, buffers, state, commands, dt, out):
+        b = buffers
+        self._velocity_vector_into(commands, b.w)
+        if not self._noiseless:
+            self._add_noise_into(b)
+        np.dot(b.w, b.basis, out=b.vel_flat)
+        np.multiply(b.vel, dt, out=b.omega)
+        self._group_from_algebra(b.omega, out=b.step)
+        np.dot(state[0], b.step, out=b.pose)
+        copy_state((b.pose, b.vel), out)
+
+    def _velocity_vector_into(self, commands, out):
+        ''' 
+            Writes the coordinates of compute_velocities(commands) in 
+            the array out (n,). The default allocates; subclasses can 
+            override this with a version which does not.
+        '''
+        algebra = self.pose_space.get_algebra()
+        vel = self.compute_velocities(commands)
+        out[...] = algebra.vector_from_algebra(vel)
+
+    def _add_noise_into(self, buffers):
+        ''' Same as _add_noise_vectors(), in place on buffers.w. '''
+        noise = buffers.noise
+        np.abs(buffers.w, out=noise)
+        noise *= self.noise_mult
+        noise += self.noise_drift
+        np.sqrt(noise, out=noise)
+        noise *= self.get_noise_stream().standard_normal(noise.size)
+        buffers.w += noise
+
+    @contract_at(VALIDATION_BOUNDARY,
+                 poses='array[NxKxK]', vels='array[NxKxK]',
+                 commands='array[NxM]', dt='>=0')
+    def integrate_batch(self, poses, vels, commands, dt):
+        ''' 
+            Integrates N independent copies of the dynamics at once. 
+            
+            The states are given as stacked arrays: poses[i] and vels[i]
+            are the two components of the i-th state, and commands[i]
+            are its commands. Returns the tuple (poses2, vels2) 
+            with the same shapes.
+        '''
+        commands = self._checked_commands(commands, VALIDATION_BOUNDARY)
+        return self._integrate_batch(poses, vels, commands, dt)
+
+    def _integrate_batch(self, poses, vels, commands, dt):
+        ''' 
+            Implementation of integrate_batch(), without any check.
+            If profiling, each stage is recorded once per batch. 
+        '''
+        profiler = self._active_profiler()
+        if profiler is not None:
+            t = profiler.clock()
+        noiseless_vels = self._cast(self.compute_velocities_batch(commands))
+        if profiler is not None:
+            t = profiler.lap('velocities', t)
+        vels2 = self._add_noise_batch(noiseless_vels)
+        if profiler is not None and not self._noiseless:
+            t = profiler.lap('noise', t)
+        steps = self._group_from_algebra(vels2 * dt)
+        if profiler is not None:
+            t = profiler.lap('exponential', t)
+        poses2 = np.matmul(self._cast(poses), steps)
+        if profiler is not None:
+            profiler.lap('composition', t)
+        return poses2, vels2
+
+    def _integrate_one(self, state, commands, dt):
+        ''' Integrates a single state using _integrate_batch(). '''
+        pose1, vel1 = state
+        poses2, vels2 = self._integrate_batch(pose1[np.newaxis],
+                                              vel1[np.newaxis],
+                                              np.asarray(commands)[np.newaxis],
+                                              dt)
+        return poses2[0], vels2[0]
+
+    @contract_at(VALIDATION_BOUNDARY,
+                 state='tuple(*,*)', commands_seq='array[TxM]', dt='>=0')
+    def rollout(self, state, commands_seq, dt):
+        ''' 
+            Fused version of Dynamics.rollout(). 
+            
+            As the velocities do not depend on the state, they are all
+            computed at once; the only sequential part is the product
+            of the steps, which is written in place.
+        '''
+        commands_seq = self._checked_commands(commands_seq,
+                                              VALIDATION_BOUNDARY)
+        poses, vels = self._rollout_buffers(state, commands_seq)
+        if commands_seq.shape[0] > 0:
+            noiseless_vels = self.compute_velocities_batch(commands_seq)
+            vels[1:] = self._add_noise_batch(noiseless_vels)
+            self._accumulate_steps(poses, vels[1:] * dt)
+        return poses, vels
+
+    def _rollout_buffers(self, state, commands_seq):
+        ''' Allocates the (T+1, k, k) buffers and sets the initial state. '''
+        pose, vel = state
+        T = commands_seq.shape[0]
+        poses = np.empty((T + 1,) + pose.shape, dtype=self.dtype)
+        vels = np.empty((T + 1,) + vel.shape, dtype=self.dtype)
+        poses[0] = pose
+        vels[0] = vel
+        return poses, vels
+
+    def _accumulate_steps(self, poses, increments):
+        ''' Fills poses[t + 1] = poses[t] * exp(increments[t]). '''
+        steps = self._group_from_algebra(increments)
+        for t in range(steps.shape[0]):
+            np.dot(poses[t], steps[t], out=poses[t + 1])
+
+
+class _StepBuffers(object):
+    ''' The arrays used by integrate_into(), for one instance. '''
 
+    def __init__(self, algebra, dtype):
+        basis, _ = algebra_basis(algebra)
+        n, k, _ = basis.shape
+        self.basis = basis.reshape(n, k * k).astype(dtype)
+        # coordinates of the velocity (or of the forces)
+        self.w = np.zeros(n, dtype=dtype)
+        self.noise = np.zeros(n, dtype=dtype)
+        # the new velocity, and (k*k,) view
+        self.vel = np.zeros((k, k), dtype=dtype)
+        self.vel_flat = self.vel.reshape(k * k)
+        self.forces = np.zeros((k, k), dtype=dtype)
+        self.forces_flat = self.forces.reshape(k * k)
+        self.omega = np.zeros((k, k), dtype=dtype)
+        self.step = np.zeros((k, k), dtype=dtype)
+        self.pose = np.zeros((k, k), dtype=dtype)
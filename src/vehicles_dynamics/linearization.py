@@ -0,0 +1,58 @@
+'''
+    Helpers for the linearization of the dynamics.
+
+    The perturbations are parametrized in the algebra, on the right: ::
+
+        pose = pose0 * exp(dpose)
+        vel  = vel0 + dvel
+        commands = commands0 + dcommands
+
+    where dpose and dvel are vectors of coordinates (n each).
+    The linearization of a step is the pair of matrices (A, B) with: ::
+
+        [dpose2; dvel2] = A [dpose; dvel] + B dcommands
+'''
+from . import (np, algebra_basis, vectors_from_algebra, expm_batch,
+    commutator)
+
+
+def ad_matrices(algebra, xi):
+    '''
+        Given an array (N, k, k) of elements of the algebra, returns
+        the array (N, n, n) of the matrices of ad(xi) = [xi, .]
+        in coordinates.
+    '''
+    basis, _ = algebra_basis(algebra)
+    brackets = commutator(xi[:, np.newaxis], basis[np.newaxis])
+    # brackets[:, j] = [xi, b_j]; its coordinates are the j-th column
+    return np.swapaxes(vectors_from_algebra(algebra, brackets), -1, -2)
+
+
+def exp_and_phi(x):
+    '''
+        Returns exp(x) and phi(x) = sum_k x^k / (k+1)! for an array
+        (N, n, n), using the exponential of the block matrix
+        [[x, I], [0, 0]].
+
+        With x = -ad(xi), these are the adjoint of exp(-xi) and the
+        right Jacobian of the exponential at xi.
+    '''
+    N, n, _ = x.shape
+    block = np.zeros((N, 2 * n, 2 * n))
+    block[:, :n, :n] = x
+    block[:, :n, n:] = np.eye(n)
+    e = expm_batch(block)
+    return e[:, :n, :n], e[:, :n, n:]
+
+
+def commands_jacobian(algebra, f, commands, eps=1e-6):
+    '''
+        Jacobian (N, n, m) of a function from commands (N, m) to
+        elements of the algebra (N, k, k), by central differences.
+    '''
+    N, m = commands.shape
+    delta = np.eye(m) * eps
+    plus = f((commands[:, np.newaxis] + delta).reshape(N * m, m))
+    minus = f((commands[:, np.newaxis] - delta).reshape(N * m, m))
+    d = vectors_from_algebra(algebra, (plus - minus) / (2 * eps))
+    return np.swapaxes(d.reshape(N, m, -1), 1, 2)
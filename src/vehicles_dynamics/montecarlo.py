@@ -0,0 +1,156 @@
+'''
+    Monte Carlo simulation of particle ensembles, sharded
+    across a pool of worker processes.
+'''
+from . import contract, np, NoiseStream, VALIDATION_OFF, VALIDATION_BOUNDARY
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+import pickle
+
+
+@contract(commands_seq='array[TxM]', dt='>=0', num_particles='int,>=1',
+          shard_size='int,>=1', num_workers='None|int,>=0')
+def simulate_particles(dynamics, state, commands_seq, dt, num_particles,
+                       seed=None, shard_size=1024, num_workers=None):
+    '''
+        Simulates *num_particles* copies of the dynamics, all starting
+        from *state* and driven by the same commands, which differ
+        only by the realization of the noise.
+
+        Returns the arrays of the rollout() of the dynamics, each with
+        a first axis for the particles: a tuple (poses, vels) of arrays
+        of shape (num_particles, T+1, ...), and the steering angles
+        (num_particles, T+1) for the cars with wheels.
+
+        The particles are divided in shards of *shard_size*; shard i
+        uses the i-th stream spawned from NoiseStream(seed). The
+        result depends only on seed and shard_size: running with
+        num_workers=0 (serially, in this process) gives the same
+        result as any number of workers. (The noise samples are
+        identical; the poses can differ by a few ulps, as numpy's 
+        vectorized sin/cos round differently depending on the 
+        memory alignment.) If num_workers is None, it is the 
+        number of CPUs.
+
+        The workers write the trajectories directly in shared memory.
+    '''
+    commands_seq = dynamics._checked_commands(commands_seq,
+                                              VALIDATION_BOUNDARY)
+    T = commands_seq.shape[0]
+    # (shape, dtype) of each array of the result
+    layout = [((num_particles, T + 1) + shape, dtype)
+              for shape, dtype in _trajectory_layout(dynamics, state)]
+
+    shards = []
+    streams = NoiseStream(seed).spawn(_num_shards(num_particles, shard_size))
+    for i, stream in enumerate(streams):
+        start = i * shard_size
+        stop = min(num_particles, start + shard_size)
+        shards.append((start, stop, stream))
+
+    blob = pickle.dumps(dynamics)
+    problem = (blob, state, commands_seq, dt)
+
+    if num_workers == 0:
+        arrays = [np.empty(shape, dtype=dtype) for shape, dtype in layout]
+        for start, stop, stream in shards:
+            _simulate_shard(problem, start, stop, stream, arrays)
+        return tuple(arrays)
+
+    memories = [shared_memory.SharedMemory(create=True,
+                                           size=_nbytes(shape, dtype))
+                for shape, dtype in layout]
+    try:
+        outputs = [(m.name, shape, dtype.str)
+                   for m, (shape, dtype) in zip(memories, layout)]
+        with ProcessPoolExecutor(max_workers=num_workers,
+                                 initializer=_init_worker,
+                                 initargs=(problem, outputs)) as executor:
+            futures = [executor.submit(_run_shard, start, stop, stream)
+                       for start, stop, stream in shards]
+            for f in futures:
+                f.result()
+        arrays = [np.array(_view(m, shape, dtype))
+                  for m, (shape, dtype) in zip(memories, layout)]
+    finally:
+        for m in memories:
+            m.close()
+            m.unlink()
+    return tuple(arrays)
+
+
+def _num_shards(num_particles, shard_size):
+    return (num_particles + shard_size - 1) // shard_size
+
+
+def _nbytes(shape, dtype):
+    return int(np.prod(shape)) * np.dtype(dtype).itemsize
+
+
+def _view(memory, shape, dtype):
+    return np.ndarray(shape, dtype=dtype, buffer=memory.buf)
+
+
+def _trajectory_layout(dynamics, state):
+    '''
+        Returns the list of the (shape, dtype) of one step of each
+        array of the rollout: the pose and the velocity (and the
+        steering angle for the cars with wheels).
+    '''
+    num_commands = int(np.prod(dynamics.get_commands_spec()['shape']))
+    no_commands = np.zeros((0, num_commands))
+    arrays = dynamics.rollout(state, no_commands, 0.0)
+    return [(a.shape[1:], a.dtype) for a in arrays]
+
+
+def _simulate_shard(problem, start, stop, stream, arrays):
+    '''
+        Simulates the particles start...stop-1, writing their
+        trajectories in arrays[k][start:stop] (poses, vels, ...).
+    '''
+    blob, state, commands_seq, dt = problem
+    # each shard works on its own copy, so that it can change
+    # the noise stream and the validation level
+    dynamics = pickle.loads(blob)
+    dynamics.set_validation_level(VALIDATION_OFF)
+    if hasattr(dynamics, 'set_noise_stream'):
+        dynamics.set_noise_stream(stream)
+
+    if hasattr(dynamics, 'integrate_batch'):
+        # all the particles of the shard together, step by step
+        poses, vels = arrays
+        n = stop - start
+        pose, vel = state
+        poses[start:stop, 0] = pose
+        vels[start:stop, 0] = vel
+        for t in range(commands_seq.shape[0]):
+            commands = np.tile(commands_seq[t], (n, 1))
+            pose2, vel2 = dynamics.integrate_batch(poses[start:stop, t],
+                                                   vels[start:stop, t],
+                                                   commands, dt)
+            poses[start:stop, t + 1] = pose2
+            vels[start:stop, t + 1] = vel2
+    else:
+        for i in range(start, stop):
+            rollout = dynamics.rollout(state, commands_seq, dt)
+            for a, r in zip(arrays, rollout):
+                a[i] = r
+
+
+# State of each worker process, set by _init_worker().
+_worker = {}
+
+
+def _init_worker(problem, outputs):
+    _worker['problem'] = problem
+    _worker['memories'] = []
+    _worker['arrays'] = []
+    for name, shape, dtype in outputs:
+        memory = shared_memory.SharedMemory(name=name)
+        _worker['memories'].append(memory)
+        _worker['arrays'].append(_view(memory, shape, dtype))
+
+
+def _run_shard(start, stop, stream):
+    _simulate_shard(_worker['problem'], start, stop, stream,
+                    _worker['arrays'])
@@ -0,0 +1,58 @@
+'''
+    Seedable sources of Gaussian noise for the stochastic dynamics.
+'''
+from . import contract, np
+
+
+class NoiseStream(object):
+    '''
+        A stream of standard normal samples, drawn in large blocks from
+        a numpy.random.Generator so that taking a few samples per
+        step is cheap.
+
+        Streams are reproducible given the seed, and independent
+        streams (for example, one per parallel worker) can be
+        obtained with :py:func:`spawn`. The samples do not depend on
+        how they are requested: taking n and then m samples gives
+        the same values as taking n + m samples at once.
+    '''
+
+    @contract(block_size='int,>0')
+    def __init__(self, seed=None, block_size=4096):
+        '''
+            :param seed: an int, a numpy.random.SeedSequence, or None
+                         to use fresh entropy from the OS.
+        '''
+        if isinstance(seed, np.random.SeedSequence):
+            self.seed_sequence = seed
+        else:
+            self.seed_sequence = np.random.SeedSequence(seed)
+        self.block_size = block_size
+        self.generator = np.random.default_rng(self.seed_sequence)
+        self._block = np.zeros(0)
+        self._pos = 0
+
+    def __repr__(self):
+        return 'NoiseStream(%s)' % self.seed_sequence.entropy
+
+    def standard_normal(self, shape):
+        ''' Returns an array of the given shape of N(0,1) samples. '''
+        n = int(np.prod(shape))
+        available = self._block.size - self._pos
+        if n > available:
+            # keep the leftover samples, so that the sequence does not
+            # depend on the sizes of the requests
+            leftover = self._block[self._pos:]
+            fresh = self.generator.standard_normal(max(self.block_size,
+                                                       n - available))
+            self._block = np.concatenate((leftover, fresh))
+            self._pos = 0
+        samples = self._block[self._pos:self._pos + n]
+        self._pos += n
+        return samples.reshape(shape)
+
+    @contract(n='int,>=1', returns='list')
+    def spawn(self, n):
+        ''' Returns n new streams, independent of this one and each other. '''
+        return [NoiseStream(seed=s, block_size=self.block_size)
+                for s in self.seed_sequence.spawn(n)]
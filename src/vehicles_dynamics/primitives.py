@@ -0,0 +1,221 @@
+'''
+    Motion primitives for the car models, with an on-disk cache.
+
+    A primitive is the trajectory of the car, starting at the origin
+    and at rest, for constant commands held for a given duration.
+    For a grid of commands and a list of durations, the library
+    contains, for each pair (duration, commands):
+
+        commands   the commands (P, m)
+        durations  the duration (P,)
+        samples    the poses (SE2) at the times k * duration / S,
+                   for k = 0, ..., S (P, S + 1, 3, 3)
+        end_poses  the final poses, samples[:, -1] (P, 3, 3)
+        costs      the length of the path (P,)
+
+    Generating a library is slow for fine grids, so load_primitives()
+    keeps the results in a cache directory, as .npz files named by
+    the SHA-256 hash of everything they depend on: the model, its
+    parameters (max_linear_velocity, max_steering_angle, L, axis_dist),
+    its commands spec and commands mode, the commands (as corrected by
+    check_commands()), the durations and S. Changing any
+    of them gives a different file, which is generated on first use. ::
+
+        commands = commands_grid(car, 9)
+        primitives = load_primitives(car, commands, [0.5, 1, 2])
+'''
+from . import contract, np, logger
+import hashlib
+import itertools
+import json
+import os
+import tempfile
+import zipfile
+
+# Changing the contents of the files requires a new version.
+PRIMITIVES_VERSION = 1
+
+ENV_PRIMITIVES_CACHE = 'VEHICLES_DYNAMICS_PRIMITIVES_CACHE'
+
+car_parameters = ['max_linear_velocity', 'max_steering_angle', 'L',
+                  'axis_dist']
+
+
+class MotionPrimitives(object):
+    ''' A library of motion primitives; see the module documentation. '''
+
+    def __init__(self, commands, durations, samples, costs, key=None):
+        self.commands = commands
+        self.durations = durations
+        self.samples = samples
+        self.end_poses = samples[:, -1]
+        self.costs = costs
+        self.key = key
+
+    def __repr__(self):
+        return 'MotionPrimitives(%d primitives)' % len(self)
+
+    def __len__(self):
+        return self.commands.shape[0]
+
+    @contract(filename='str')
+    def save(self, filename):
+        '''
+            Writes the primitives in a .npz file. The file is written
+            under a temporary name and then renamed, so that readers
+            never see a partial file.
+        '''
+        dirname = os.path.dirname(os.path.abspath(filename))
+        fd, tmp = tempfile.mkstemp(dir=dirname, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                np.savez(f, commands=self.commands,
+                         durations=self.durations,
+                         samples=self.samples, costs=self.costs,
+                         key=np.array(self.key or ''))
+            os.replace(tmp, filename)
+        except:
+            os.unlink(tmp)
+            raise
+
+    @staticmethod
+    @contract(filename='str')
+    def load(filename):
+        ''' Reads the primitives written by save(). '''
+        with np.load(filename, allow_pickle=False) as data:
+            return MotionPrimitives(commands=data['commands'],
+                                    durations=data['durations'],
+                                    samples=data['samples'],
+                                    costs=data['costs'],
+                                    key=str(data['key']) or None)
+
+
+def _car_of(dynamics):
+    ''' Returns the SimpleCar inside the dynamics. '''
+    car = getattr(dynamics, 'car', dynamics)
+    for p in car_parameters:
+        if not hasattr(car, p):
+            msg = 'Expected a car model, with the parameters %s; got %s.' % (
+                car_parameters, dynamics)
+            raise ValueError(msg)
+    return car
+
+
+@contract(num_values='int,>=2', returns='array[PxM]')
+def commands_grid(dynamics, num_values):
+    '''
+        Returns the grid of commands of the commands spec: all the
+        integers in the range for the discrete ('D') channels, and
+        *num_values* equally spaced values for the continuous ones.
+    '''
+    spec = dynamics.get_commands_spec()
+    values = []
+    for f, (lower, upper) in zip(spec['format'], spec['range']):
+        if f == 'D':
+            values.append(np.arange(np.ceil(lower), np.floor(upper) + 1))
+        else:
+            values.append(np.linspace(lower, upper, num_values))
+    return np.array(list(itertools.product(*values)), dtype='float64')
+
+
+def primitives_key(dynamics, commands, durations, samples):
+    '''
+        Returns the SHA-256 (hex) of the description of the library,
+        which determines its contents. The commands are checked first
+        (see Dynamics.check_commands()), so the key describes the
+        commands that are actually integrated.
+    '''
+    car = _car_of(dynamics)
+    commands = car.check_commands(np.asarray(commands, dtype='float64'))
+    spec = car.get_commands_spec()
+    ranges = np.array(spec['range'], dtype='float64')
+    description = dict(version=PRIMITIVES_VERSION,
+                       model=type(car).__name__,
+                       parameters=[float(getattr(car, p))
+                                   for p in car_parameters],
+                       format=list(spec['format']),
+                       range=ranges.tolist(),
+                       dtype=str(car.dtype),
+                       commands_mode=car.get_commands_mode(),
+                       commands=commands.tolist(),
+                       durations=durations.tolist(),
+                       samples=samples)
+    text = json.dumps(description, sort_keys=True)
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+@contract(commands='array[PxM]', durations='seq(>0)|array',
+          samples='int,>=1')
+def generate_primitives(dynamics, commands, durations, samples=10):
+    '''
+        Computes the library for the given commands and durations (in
+        this order: primitive i * len(commands) + j has duration i and
+        commands j). All the commands are integrated together, with
+        integrate_batch(). The dynamics must be noise-free.
+    '''
+    car = _car_of(dynamics)
+    if not car.is_noiseless():
+        raise ValueError('The primitives need a noise-free model.')
+    commands = np.asarray(commands, dtype='float64')
+    durations = np.asarray(durations, dtype='float64')
+    commands = car.check_commands(commands)
+    key = primitives_key(car, commands, durations, samples)
+    C = commands.shape[0]
+    P = C * durations.size
+    k = 3
+    poses = np.empty((P, samples + 1, k, k))
+    costs = np.empty(P)
+    poses[:, 0] = np.eye(k)
+    for i, duration in enumerate(durations):
+        rows = slice(i * C, (i + 1) * C)
+        dt = float(duration) / samples
+        vels = np.zeros((C, k, k))
+        for t in range(samples):
+            pose2, vels = car._integrate_batch(poses[rows, t], vels,
+                                               commands, dt)
+            poses[rows, t + 1] = pose2
+        # the commands are constant, so is the linear velocity
+        costs[rows] = np.hypot(vels[:, 0, 2], vels[:, 1, 2]) * duration
+    return MotionPrimitives(commands=np.tile(commands, (durations.size, 1)),
+                            durations=np.repeat(durations, C),
+                            samples=poses, costs=costs, key=key)
+
+
+def default_cache_dir():
+    '''
+        Returns the directory of the cache: the environment variable
+        VEHICLES_DYNAMICS_PRIMITIVES_CACHE, if set, or else
+        ~/.cache/vehicles_dynamics/primitives.
+    '''
+    directory = os.environ.get(ENV_PRIMITIVES_CACHE)
+    if directory is None:
+        directory = os.path.join(os.path.expanduser('~'), '.cache',
+                                 'vehicles_dynamics', 'primitives')
+    return directory
+
+
+@contract(samples='int,>=1', cache_dir='None|str')
+def load_primitives(dynamics, commands, durations, samples=10,
+                    cache_dir=None):
+    '''
+        Same as generate_primitives(), but the result is read from the
+        cache if present, and written there otherwise.
+    '''
+    if cache_dir is None:
+        cache_dir = default_cache_dir()
+    commands = np.asarray(commands, dtype='float64')
+    durations = np.asarray(durations, dtype='float64')
+    key = primitives_key(dynamics, commands, durations, samples)
+    filename = os.path.join(cache_dir, '%s.npz' % key)
+    if os.path.exists(filename):
+        try:
+            primitives = MotionPrimitives.load(filename)
+            if primitives.key == key:
+                return primitives
+        except (OSError, ValueError, KeyError, zipfile.BadZipFile) as e:
+            logger.warning('Ignoring the invalid cache file %s: %s' %
+                           (filename, e))
+    primitives = generate_primitives(dynamics, commands, durations, samples)
+    os.makedirs(cache_dir, exist_ok=True)
+    primitives.save(filename)
+    return primitives
@@ -0,0 +1,113 @@
+'''
+    Batched unit quaternions, for the rotations of SO3 and SE3.
+
+    A quaternion is an array (..., 4) with the scalar part first:
+    (w, x, y, z). All the functions work on stacks of quaternions
+    (and of vectors (..., 3)), broadcasting the leading dimensions.
+'''
+from . import np, SMALL_ANGLE
+
+
+def quaternion_multiply(a, b):
+    ''' Returns the product a * b (the rotation b, followed by a). '''
+    aw = a[..., :1]
+    bw = b[..., :1]
+    av = a[..., 1:]
+    bv = b[..., 1:]
+    w = aw * bw - np.sum(av * bv, axis=-1, keepdims=True)
+    v = aw * bv + bw * av + np.cross(av, bv)
+    return np.concatenate((w, v), axis=-1)
+
+
+def quaternion_rotate(q, v):
+    ''' Rotates the vectors v (..., 3) by the quaternions q. '''
+    u = q[..., 1:]
+    t = 2 * np.cross(u, v)
+    return v + q[..., :1] * t + np.cross(u, t)
+
+
+def quaternion_exp(w):
+    '''
+        Returns the quaternions of the rotations exp(hat(w)), for
+        an array (..., 3) of rotation vectors.
+    '''
+    theta = np.sqrt(np.sum(w * w, axis=-1, keepdims=True))
+    small = theta < SMALL_ANGLE
+    ts = np.where(small, 1.0, theta)
+    t2 = theta * theta
+    # sin(t/2)/t
+    k = np.where(small, 0.5 - t2 / 48 + t2 * t2 / 3840,
+                 np.sin(0.5 * ts) / ts)
+    return np.concatenate((np.cos(0.5 * theta), k * w), axis=-1)
+
+
+def quaternion_normalize(q):
+    ''' Returns q / |q|, to remove the drift due to the rounding. '''
+    return q / np.sqrt(np.sum(q * q, axis=-1, keepdims=True))
+
+
+def rotation_from_quaternion(q):
+    ''' Returns the rotation matrices (..., 3, 3) of the quaternions. '''
+    w, x, y, z = q[..., 0], q[..., 1], q[..., 2], q[..., 3]
+    R = np.empty(q.shape[:-1] + (3, 3), dtype=q.dtype)
+    R[..., 0, 0] = 1 - 2 * (y * y + z * z)
+    R[..., 0, 1] = 2 * (x * y - w * z)
+    R[..., 0, 2] = 2 * (x * z + w * y)
+    R[..., 1, 0] = 2 * (x * y + w * z)
+    R[..., 1, 1] = 1 - 2 * (x * x + z * z)
+    R[..., 1, 2] = 2 * (y * z - w * x)
+    R[..., 2, 0] = 2 * (x * z - w * y)
+    R[..., 2, 1] = 2 * (y * z + w * x)
+    R[..., 2, 2] = 1 - 2 * (x * x + y * y)
+    return R
+
+
+def quaternion_from_rotation(R):
+    '''
+        Returns the quaternions (..., 4), with w >= 0, of the rotation
+        matrices R (..., 3, 3). For each matrix, the formula is chosen
+        according to its largest diagonal term, for accuracy.
+    '''
+    r00, r11, r22 = R[..., 0, 0], R[..., 1, 1], R[..., 2, 2]
+    d21 = R[..., 2, 1] - R[..., 1, 2]
+    d02 = R[..., 0, 2] - R[..., 2, 0]
+    d10 = R[..., 1, 0] - R[..., 0, 1]
+    s01 = R[..., 0, 1] + R[..., 1, 0]
+    s02 = R[..., 0, 2] + R[..., 2, 0]
+    s12 = R[..., 1, 2] + R[..., 2, 1]
+    # the squares of the components, times 4
+    traces = np.stack([1 + r00 + r11 + r22, 1 + r00 - r11 - r22,
+                       1 - r00 + r11 - r22, 1 - r00 - r11 + r22], axis=-1)
+    s = 2 * np.sqrt(np.maximum(traces, 1e-300))
+    s0, s1, s2, s3 = s[..., 0], s[..., 1], s[..., 2], s[..., 3]
+    options = np.stack([
+        np.stack([s0 / 4, d21 / s0, d02 / s0, d10 / s0], axis=-1),
+        np.stack([d21 / s1, s1 / 4, s01 / s1, s02 / s1], axis=-1),
+        np.stack([d02 / s2, s01 / s2, s2 / 4, s12 / s2], axis=-1),
+        np.stack([d10 / s3, s02 / s3, s12 / s3, s3 / 4], axis=-1)],
+        axis=-2)
+    best = np.argmax(traces, axis=-1)[..., np.newaxis, np.newaxis]
+    q = np.take_along_axis(options, best, axis=-2)[..., 0, :]
+    return np.where(q[..., :1] < 0, -q, q)
+
+
+def se3_exp_quaternion(xi):
+    '''
+        Closed-form exponential of twists xi (..., 6) = (w, v), as
+        in the coordinates of se3. Returns the rotations as
+        quaternions (..., 4) and the translations (..., 3).
+    '''
+    w = xi[..., :3]
+    v = xi[..., 3:]
+    theta = np.sqrt(np.sum(w * w, axis=-1, keepdims=True))
+    small = theta < SMALL_ANGLE
+    ts = np.where(small, 1.0, theta)
+    t2 = theta * theta
+    # (1 - cos(t))/t^2 and (t - sin(t))/t^3
+    k2 = np.where(small, 0.5 - t2 / 24 + t2 * t2 / 720,
+                  (1 - np.cos(ts)) / (ts * ts))
+    k3 = np.where(small, 1.0 / 6 - t2 / 120 + t2 * t2 / 5040,
+                  (ts - np.sin(ts)) / (ts * ts * ts))
+    wv = np.cross(w, v)
+    translation = v + k2 * wv + k3 * np.cross(w, wv)
+    return quaternion_exp(w), translation
@@ -0,0 +1,93 @@
+'''
+    Registry of the dynamics, by name.
+
+    The built-in dynamics are registered by the name of their module,
+    which is imported only when they are first needed, so that
+    creating one vehicle does not import all the others: ::
+
+        dynamics = create_dynamics('DifferentialDrive',
+                                   max_linear_velocity=1,
+                                   max_angular_velocity=1)
+'''
+from . import contract
+import importlib
+
+# name -> 'module:attribute' of the built-in dynamics
+builtin_dynamics = {}
+for _module, _names in [
+    ('cars', ['SimpleCar', 'CarWithWheels', 'ReedsSheepCar', 'DubinsCar',
+              'ReedsSheepCarWithWheels', 'DubinsCarWithWheels']),
+    ('circle', ['CircleVel', 'CircleForce']),
+    ('differential_drive', ['DifferentialDrive']),
+    ('euclidean', ['EuclideanVel', 'EuclideanForce']),
+    ('se2', ['SE2Dynamics']),
+    ('se2forward', ['SE2Forward']),
+    ('so3', ['SO3Vel', 'SO3Force']),
+    ('se3', ['SE3Vel', 'SE3Force']),
+]:
+    for _name in _names:
+        builtin_dynamics[_name] = ('vehicles_dynamics.specializations.%s:%s'
+                                   % (_module, _name))
+
+# name -> callable, or 'module:attribute' not imported yet
+_factories = dict(builtin_dynamics)
+
+
+@contract(name='str', overwrite='bool')
+def register_dynamics(name, factory, overwrite=False):
+    '''
+        Registers a factory for the dynamics called *name*: either a
+        callable (such as a class), or a string 'module:attribute',
+        which is imported on first use. The built-in names can only
+        be replaced with overwrite=True (and only for create_dynamics():
+        the classes of the package stay the same).
+    '''
+    if not callable(factory) and not isinstance(factory, str):
+        msg = 'Expected a callable or a "module:attribute" string, got %r.'
+        raise ValueError(msg % factory)
+    if name in builtin_dynamics and not overwrite:
+        msg = ('%r is a built-in dynamics; use overwrite=True to replace '
+               'it.' % name)
+        raise ValueError(msg)
+    _factories[name] = factory
+
+
+@contract(returns='list(str)')
+def registered_dynamics():
+    ''' Returns the sorted list of the registered names. '''
+    return sorted(_factories)
+
+
+@contract(name='str')
+def get_dynamics_factory(name):
+    ''' Returns the factory registered as *name*, importing it if needed. '''
+    if not name in _factories:
+        msg = ('Unknown dynamics %r; registered: %s.' %
+               (name, ', '.join(registered_dynamics())))
+        raise ValueError(msg)
+    factory = _factories[name]
+    if isinstance(factory, str):
+        factory = _import_attribute(factory)
+        _factories[name] = factory
+    return factory
+
+
+@contract(name='str')
+def get_builtin_dynamics(name):
+    '''
+        Returns the built-in class called *name*, importing its module
+        if needed, regardless of register_dynamics().
+    '''
+    return _import_attribute(builtin_dynamics[name])
+
+
+def _import_attribute(spec):
+    ''' Returns the attribute given by the string 'module:attribute'. '''
+    module, attribute = spec.split(':')
+    return getattr(importlib.import_module(module), attribute)
+
+
+@contract(name='str')
+def create_dynamics(name, **params):
+    ''' Creates an instance of the dynamics registered as *name*. '''
+    return get_dynamics_factory(name)(**params)
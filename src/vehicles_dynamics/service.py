@@ -0,0 +1,250 @@
+'''
+    An asyncio service that steps vehicles for many clients,
+    grouping the requests in vectorized batches.
+
+    In the same process: ::
+
+        service = SimulationService(max_delay=0.002)
+        service.add_dynamics('car', dynamics)
+        state2 = await service.step('car', state, commands, dt)
+
+    Requests for the same dynamics and dt that arrive within
+    *max_delay* seconds of each other (up to *max_batch* of them)
+    are integrated together with integrate_batch().
+
+    Other processes can connect through a local socket: ::
+
+        server = await service.serve_unix('/tmp/dynamics.sock')
+        ...
+        client = await ServiceClient.connect_unix('/tmp/dynamics.sock')
+        x2 = await client.step('car', x, commands, dt)
+
+    where x is a compact state (see Dynamics.to_compact()). The
+    protocol is one JSON object per line; floats are written with
+    repr(), so the states are transmitted exactly. Clients can send
+    many requests without waiting for the answers; the service stops
+    reading from a client while *max_batch* of its answers are
+    waiting to be sent.
+'''
+from . import contract, np, logger
+import asyncio
+import itertools
+import json
+
+
+class SimulationService(object):
+
+    @contract(max_batch='int,>=1', max_delay='>=0')
+    def __init__(self, max_batch=1024, max_delay=0.002):
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self._dynamics = {}
+        # (name, dt) -> list of (state, commands, future)
+        self._pending = {}
+        # (name, dt) -> timer of the pending batch
+        self._timers = {}
+        # statistics
+        self.num_requests = 0
+        self.num_batches = 0
+
+    def __repr__(self):
+        return ('SimulationService(%s; requests=%d, batches=%d)' %
+                (sorted(self._dynamics), self.num_requests,
+                 self.num_batches))
+
+    @contract(name='str')
+    def add_dynamics(self, name, dynamics):
+        ''' Makes the dynamics available to the clients as *name*. '''
+        self._dynamics[name] = dynamics
+
+    @contract(dt='>=0')
+    async def step(self, name, state, commands, dt):
+        '''
+            Integrates the state (in any form accepted by integrate())
+            and returns the new state, in the same form.
+        '''
+        if not name in self._dynamics:
+            raise ValueError('Unknown dynamics %r.' % name)
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        key = (name, float(dt))
+        pending = self._pending.setdefault(key, [])
+        pending.append((state, np.asarray(commands, dtype='float64'), future))
+        self.num_requests += 1
+        if len(pending) >= self.max_batch:
+            self._flush(key)
+        elif len(pending) == 1:
+            self._timers[key] = loop.call_later(self.max_delay,
+                                                self._flush, key)
+        return await future
+
+    def _flush(self, key):
+        ''' Integrates the pending requests for key. '''
+        timer = self._timers.pop(key, None)
+        if timer is not None:
+            timer.cancel()
+        requests = self._pending.pop(key, [])
+        requests = [r for r in requests if not r[2].cancelled()]
+        if not requests:
+            return
+        name, dt = key
+        self.num_batches += 1
+        dynamics = self._dynamics[name]
+        try:
+            results = step_batch(dynamics, [r[0] for r in requests],
+                                 [r[1] for r in requests], dt)
+        except Exception as e:
+            if len(requests) == 1:
+                requests[0][2].set_exception(e)
+                return
+            # find out which requests are to blame
+            logger.debug('Batch failed (%s); stepping one by one.' % e)
+            for state, commands, future in requests:
+                try:
+                    future.set_result(dynamics.integrate(state, commands, dt))
+                except Exception as e:
+                    future.set_exception(e)
+            return
+        for (_, _, future), result in zip(requests, results):
+            future.set_result(result)
+
+    async def serve_unix(self, path):
+        ''' Accepts clients on a Unix socket. Returns the asyncio server. '''
+        return await asyncio.start_unix_server(self._serve_client, path)
+
+    async def serve_tcp(self, host='127.0.0.1', port=0):
+        ''' Accepts clients on a TCP socket. Returns the asyncio server. '''
+        return await asyncio.start_server(self._serve_client, host, port)
+
+    async def _serve_client(self, reader, writer):
+        tasks = set()
+        # Answers are written one at a time, waiting for the socket
+        # buffer to drain; while *max_batch* of them are waiting, we
+        # stop reading, so a client that does not read its answers
+        # is slowed down instead of filling our memory.
+        lock = asyncio.Lock()
+        slots = asyncio.Semaphore(self.max_batch)
+        try:
+            while True:
+                await slots.acquire()
+                line = await reader.readline()
+                if not line:
+                    break
+                task = asyncio.ensure_future(self._answer(line, writer,
+                                                          lock))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+                task.add_done_callback(lambda _: slots.release())
+            if tasks:
+                await asyncio.wait(tasks)
+        finally:
+            writer.close()
+
+    async def _answer(self, line, writer, lock):
+        request_id = None
+        try:
+            request = json.loads(line)
+            request_id = request['id']
+            dynamics = self._dynamics.get(request['dynamics'])
+            if dynamics is None:
+                raise ValueError('Unknown dynamics %r.' %
+                                 request['dynamics'])
+            x = np.array(request['state'], dtype='float64')
+            if x.shape != (dynamics.compact_size(),):
+                raise ValueError('Expected a compact state of size %d.' %
+                                 dynamics.compact_size())
+            x2 = await self.step(request['dynamics'], x,
+                                 request['commands'], request['dt'])
+            answer = dict(id=request_id, state=x2.tolist())
+        except Exception as e:
+            answer = dict(id=request_id, error='%s: %s' %
+                          (type(e).__name__, e))
+        async with lock:
+            try:
+                writer.write((json.dumps(answer) + '\n').encode('utf-8'))
+                await writer.drain()
+            except ConnectionError:
+                logger.debug('Client gone; answer %r dropped.' % request_id)
+
+
+def step_batch(dynamics, states, commands, dt):
+    '''
+        Integrates the given states (each in any form accepted by
+        integrate()) with one call to integrate_batch(), if the
+        dynamics has it. Returns the list of new states, each in
+        the same form as given.
+    '''
+    if not hasattr(dynamics, 'integrate_batch'):
+        return [dynamics.integrate(s, c, dt) for s, c in zip(states, commands)]
+    usual = [dynamics._state_from(s) for s in states]
+    poses = np.array([s[0] for s in usual])
+    vels = np.array([s[1] for s in usual])
+    poses2, vels2 = dynamics.integrate_batch(poses, vels, np.array(commands),
+                                             dt)
+    results = []
+    for i, state in enumerate(states):
+        state2 = (poses2[i], vels2[i])
+        if dynamics.is_compact(state):
+            state2 = dynamics.to_compact(state2)
+        results.append(state2)
+    return results
+
+
+class ServiceClient(object):
+    ''' Client for SimulationService, over a socket. '''
+
+    def __init__(self, reader, writer):
+        self._reader = reader
+        self._writer = writer
+        self._ids = itertools.count()
+        self._futures = {}
+        self._reading = asyncio.ensure_future(self._read_answers())
+
+    @staticmethod
+    async def connect_unix(path):
+        reader, writer = await asyncio.open_unix_connection(path)
+        return ServiceClient(reader, writer)
+
+    @staticmethod
+    async def connect_tcp(host, port):
+        reader, writer = await asyncio.open_connection(host, port)
+        return ServiceClient(reader, writer)
+
+    async def step(self, name, x, commands, dt):
+        '''
+            Sends a compact state x to the service, and returns the
+            compact state after the step.
+        '''
+        request_id = next(self._ids)
+        future = asyncio.get_running_loop().create_future()
+        self._futures[request_id] = future
+        request = dict(id=request_id, dynamics=name,
+                       state=np.asarray(x, dtype='float64').tolist(),
+                       commands=np.asarray(commands,
+                                           dtype='float64').tolist(),
+                       dt=float(dt))
+        self._writer.write((json.dumps(request) + '\n').encode('utf-8'))
+        await self._writer.drain()
+        return await future
+
+    async def _read_answers(self):
+        while True:
+            line = await self._reader.readline()
+            if not line:
+                break
+            answer = json.loads(line)
+            future = self._futures.pop(answer['id'], None)
+            if future is None or future.cancelled():
+                continue
+            if 'error' in answer:
+                future.set_exception(ValueError(answer['error']))
+            else:
+                future.set_result(np.array(answer['state'], dtype='float64'))
+        for future in self._futures.values():
+            if not future.done():
+                future.set_exception(ConnectionError('Connection closed.'))
+        self._futures.clear()
+
+    async def close(self):
+        self._writer.close()
+        await self._reading
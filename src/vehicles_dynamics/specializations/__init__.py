@@ -1,9 +1,12 @@
-from .. import SimpleKinematics, SimpleDynamics, np, contract
-from .cars import *
-from .euclidean import *
-from .circle import *
-from .se2 import *
-from .se3 import *
-from .so3 import *
-from .differential_drive import *
-from .se2forward import *
+from .. import (SimpleKinematics, SimpleDynamics, np, contract,
+    algebra_from_vectors, contract_at, VALIDATION_FULL,
+    VALIDATION_BOUNDARY)
+from .. import builtin_dynamics, get_builtin_dynamics
+
+
+def __getattr__(name):
+    # The modules are imported on first use; see registry.py.
+    if name in builtin_dynamics:
+        return get_builtin_dynamics(name)
+    msg = 'module %r has no attribute %r' % (__name__, name)
+    raise AttributeError(msg)
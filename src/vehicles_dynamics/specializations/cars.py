@@ -1,7 +1,9 @@
-from . import np, contract, SimpleKinematics
+from . import (np, contract, SimpleKinematics, algebra_from_vectors,
+    contract_at, VALIDATION_FULL, VALIDATION_BOUNDARY)
 from geometry import (R1, ProductManifold, SE2, se2_from_linear_angular,
     SE2_from_translation_angle, SE3_from_SE2, SE3)
 from vehicles_dynamics import Dynamics
+import math
 
 
 class SimpleCar(SimpleKinematics):
@@ -14,7 +16,8 @@ class SimpleCar(SimpleKinematics):
                        axis_dist,
                        commands_format=['C', 'C'],
                        commands_range=[[-1, +1], [-1, +1]],
-                       desc='Simple car dynamics'):
+                       desc='Simple car dynamics',
+                       dtype='float64'):
         self.max_linear_velocity = max_linear_velocity
         self.max_steering_angle = max_steering_angle
         self.L = L
@@ -35,7 +38,8 @@ class SimpleCar(SimpleKinematics):
 
         SimpleKinematics.__init__(self,
                           pose_space=SE2,
-                          commands_spec=spec)
+                          commands_spec=spec,
+                          dtype=dtype)
 
     def compute_velocities(self, commands):
         steering_angle = commands[1] * self.max_steering_angle
@@ -44,6 +48,33 @@ class SimpleCar(SimpleKinematics):
         vel = se2_from_linear_angular([linear_velocity, 0], angular_velocity)
         return vel
 
+    def compute_velocities_batch(self, commands):
+        steering_angle = commands[:, 1] * self.max_steering_angle
+        linear_velocity = commands[:, 0] * self.max_linear_velocity
+        angular_velocity = np.tan(steering_angle) * linear_velocity / self.L
+        w = np.zeros((commands.shape[0], 3))
+        w[:, 0] = angular_velocity
+        w[:, 1] = linear_velocity
+        return algebra_from_vectors(self.pose_space.algebra, w)
+
+    def compute_velocities_jacobian_batch(self, commands):
+        steering_angle = commands[:, 1] * self.max_steering_angle
+        linear_velocity = commands[:, 0] * self.max_linear_velocity
+        J = np.zeros((commands.shape[0], 3, 2))
+        J[:, 0, 0] = (np.tan(steering_angle) *
+                      self.max_linear_velocity / self.L)
+        J[:, 0, 1] = (linear_velocity * self.max_steering_angle /
+                      (self.L * np.cos(steering_angle) ** 2))
+        J[:, 1, 0] = self.max_linear_velocity
+        return J
+
+    def _velocity_vector_into(self, commands, out):
+        steering_angle = commands[1] * self.max_steering_angle
+        linear_velocity = commands[0] * self.max_linear_velocity
+        out[0] = math.tan(steering_angle) * linear_velocity / self.L
+        out[1] = linear_velocity
+        out[2] = 0
+
 
 class CarWithWheels(Dynamics):
 
@@ -55,17 +86,73 @@ class CarWithWheels(Dynamics):
         Dynamics.__init__(self, state_space=state_space,
                                 commands_spec=commands_spec)
 
-    def pose2state(self, pose):
-        return self.compose_state(car_state=self.car.pose2state(pose),
-                                  steering=0)
+    def set_validation_level(self, level):
+        Dynamics.set_validation_level(self, level)
+        self.car.set_validation_level(level)
+
+    def set_profiler(self, profiler):
+        Dynamics.set_profiler(self, profiler)
+        self.car.set_profiler(profiler)
+
+    def set_commands_mode(self, mode):
+        Dynamics.set_commands_mode(self, mode)
+        self.car.set_commands_mode(mode)
+
+    def enable_step_cache(self, maxsize=1024, quantum=1e-9):
+        ''' See SimpleKinematics.enable_step_cache(). '''
+        return self.car.enable_step_cache(maxsize=maxsize, quantum=quantum)
+
+    def disable_step_cache(self):
+        self.car.disable_step_cache()
+
+    def pose2state(self, pose, compact=False):
+        state = self.compose_state(car_state=self.car.pose2state(pose),
+                                   steering=0)
+        if compact:
+            return self.to_compact(state)
+        return state
+
+    def compact_size(self):
+        return self.car.compact_size() + 1
+
+    def to_compact(self, state):
+        ''' The compact state of the car, followed by the steering. '''
+        car_state = self.car_state_from_big_state(state)
+        steering = self.steering_from_big_state(state)
+        return np.append(self.car.to_compact(car_state), steering)
+
+    def from_compact(self, x):
+        return self.compose_state(car_state=self.car.from_compact(x[:-1]),
+                                  steering=x[-1])
 
     def _integrate(self, state, commands, dt):
         car_state = self.car_state_from_big_state(state)
-        car_state2 = self.car.integrate(car_state, commands, dt)
+        # integrate() already did the checks (and the profiling)
+        car_state2 = self.car._integrate(car_state, commands, dt)
         steering = commands[1] * self.car.max_steering_angle
         return self.compose_state(car_state=car_state2, steering=steering)
 
+    @contract_at(VALIDATION_BOUNDARY, commands_seq='array[TxM]', dt='>=0')
+    def rollout(self, state, commands_seq, dt):
+        ''' 
+            Returns the tuple (poses, vels, steering): the rollout
+            of the car component of the state, as for the other 
+            dynamics, and the array (T+1,) of the steering angles. 
+            The steering angle after step t is determined by 
+            commands_seq[t - 1], as in integrate().
+        '''
+        commands_seq = self._checked_commands(commands_seq,
+                                              VALIDATION_BOUNDARY)
+        state = self._state_from(state)
+        car_state = self.car_state_from_big_state(state)
+        poses, vels = self.car.rollout(car_state, commands_seq, dt)
+        steering = np.empty(commands_seq.shape[0] + 1, dtype=poses.dtype)
+        steering[0] = self.steering_from_big_state(state)
+        steering[1:] = commands_seq[:, 1] * self.car.max_steering_angle
+        return poses, vels, steering
+
     def state_to_yaml(self, state):
+        state = self._state_from(state)
         car_state = self.car_state_from_big_state(state)
         steering = self.steering_from_big_state(state)
         return dict(car=self.car.state_to_yaml(car_state),
@@ -80,8 +167,9 @@ class CarWithWheels(Dynamics):
     def compose_state(self, car_state, steering):
         return dict(car=car_state, steering=steering)
 
-    @contract(returns='tuple(SE3, se3)')
+    @contract_at(VALIDATION_FULL, returns='tuple(SE3, se3)')
     def joint_state(self, state, joint=0):
+        state = self._state_from(state)
         car_state = self.car_state_from_big_state(state)
         steering = self.steering_from_big_state(state)
 
@@ -104,6 +192,53 @@ class CarWithWheels(Dynamics):
     def num_joints(self):
         return 3
 
+    def joint_states_batch(self, states):
+        ''' Vectorized version of Dynamics.joint_states_batch(). '''
+        if isinstance(states, np.ndarray) and states.ndim == 2:
+            poses, vels = self.car.get_compact_layout().unpack(states[:, :-1])
+            steering = states[:, -1]
+        else:
+            states = [self._state_from(s) for s in states]
+            car_states = [self.car_state_from_big_state(s) for s in states]
+            poses, vels = self.car._stack_states(car_states)
+            steering = np.array([self.steering_from_big_state(s)
+                                 for s in states], dtype='float64')
+        return self.joint_states_arrays(poses, vels, steering)
+
+    def joint_states_arrays(self, poses, vels, steering):
+        ''' 
+            Same as joint_states_batch(), for the states given as the
+            arrays (N, 3, 3) of poses and velocities of the car, and 
+            the array (N,) of steering angles.
+        '''
+        N = poses.shape[0]
+        car_poses, car_vels = self.car.joint_states_arrays(poses, vels)
+        # pose of each wheel relative to the car
+        rel = np.zeros((N, 2, 4, 4))
+        c = np.cos(steering)[:, np.newaxis]
+        s = np.sin(steering)[:, np.newaxis]
+        rel[:, :, 0, 0] = c
+        rel[:, :, 0, 1] = -s
+        rel[:, :, 1, 0] = s
+        rel[:, :, 1, 1] = c
+        rel[:, :, 2, 2] = 1
+        rel[:, :, 3, 3] = 1
+        rel[:, :, :2, 3] = self._wheel_offsets()
+        joint_poses = np.empty((N, 3, 4, 4))
+        joint_poses[:, :1] = car_poses
+        np.matmul(car_poses, rel, out=joint_poses[:, 1:])
+        joint_vels = np.repeat(car_vels, 3, axis=1) # XXX: vel, as above
+        return joint_poses, joint_vels
+
+    def _wheel_offsets(self):
+        ''' Returns the (2, 2) positions of the wheels, cached. '''
+        key = (self.car.axis_dist, self.car.L)
+        if getattr(self, '_offsets_key', None) != key:
+            self._offsets = np.array([[self.car.axis_dist, self.car.L],
+                                      [self.car.axis_dist, -self.car.L]])
+            self._offsets_key = key
+        return self._offsets
+
 
 class ReedsSheepCar(SimpleCar):
 
@@ -114,6 +249,14 @@ class ReedsSheepCar(SimpleCar):
                            commands_range=[[-1, +1], [-1, +1]],
                            **kwargs)
 
+    def steering_paths(self, start, goals):
+        ''' 
+            Shortest paths from the pose start (SE2) to the goals;
+            see reeds_shepp_paths() in the steering module. 
+        '''
+        from ..steering import reeds_shepp_paths
+        return reeds_shepp_paths(self, start, goals)
+
 
 class DubinsCar(SimpleCar):
 
@@ -124,6 +267,14 @@ class DubinsCar(SimpleCar):
                            commands_range=[[0, +1], [-1, +1]],
                            **kwargs)
 
+    def steering_paths(self, start, goals):
+        ''' 
+            Shortest forward paths from the pose start (SE2) to the
+            goals; see dubins_paths() in the steering module. 
+        '''
+        from ..steering import dubins_paths
+        return dubins_paths(self, start, goals)
+
 
 class ReedsSheepCarWithWheels(CarWithWheels):
 
@@ -134,6 +285,14 @@ class ReedsSheepCarWithWheels(CarWithWheels):
                            commands_range=[[-1, +1], [-1, +1]],
                            **kwargs)
 
+    def steering_paths(self, start, goals):
+        ''' 
+            Shortest paths from the pose start (SE2) to the goals;
+            see reeds_shepp_paths() in the steering module. 
+        '''
+        from ..steering import reeds_shepp_paths
+        return reeds_shepp_paths(self.car, start, goals)
+
 
 class DubinsCarWithWheels(CarWithWheels):
 
@@ -143,3 +302,11 @@ class DubinsCarWithWheels(CarWithWheels):
                            commands_format=['D', 'C'],
                            commands_range=[[0, +1], [-1, +1]],
                            **kwargs)
+
+    def steering_paths(self, start, goals):
+        ''' 
+            Shortest forward paths from the pose start (SE2) to the
+            goals; see dubins_paths() in the steering module. 
+        '''
+        from ..steering import dubins_paths
+        return dubins_paths(self.car, start, goals)
@@ -1,4 +1,5 @@
-from . import SimpleDynamics, contract, SimpleKinematics
+from . import (SimpleDynamics, contract, SimpleKinematics, algebra_from_vectors,
+    contract_at, VALIDATION_FULL, np)
 from geometry import SO2, hat_map_2d
 
     
@@ -6,7 +7,7 @@ class CircleVel(SimpleKinematics):
     ''' Particle on SO(2) controlled in velocity. '''
     
     @contract(max_velocity='>0')
-    def __init__(self, max_velocity):
+    def __init__(self, max_velocity, dtype='float64'):
         spec = {
             'desc': 'Particle on SO(2) controled in velocity.',
             'shape': [1],
@@ -20,20 +21,33 @@ class CircleVel(SimpleKinematics):
         
         SimpleKinematics.__init__(self,
                           pose_space=SO2,
-                          commands_spec=spec)
+                          commands_spec=spec,
+                          dtype=dtype)
         self.max_velocity = max_velocity    
     
-    @contract(commands='array[1]')
+    @contract_at(VALIDATION_FULL, commands='array[1]')
     def compute_velocities(self, commands):
         omega = self.max_velocity * commands[0]
         return hat_map_2d(omega)
 
+    @contract_at(VALIDATION_FULL, commands='array[Nx1]')
+    def compute_velocities_batch(self, commands):
+        omega = self.max_velocity * commands
+        return algebra_from_vectors(self.pose_space.algebra, omega)
+
+    def compute_velocities_jacobian_batch(self, commands):
+        return np.tile(float(self.max_velocity), (commands.shape[0], 1, 1))
+
+    def _velocity_vector_into(self, commands, out):
+        out[0] = self.max_velocity * commands[0]
+
 
 class CircleForce(SimpleDynamics):
     ''' Particle on SO(2) controlled in force. '''
     
     @contract(max_force='>0', mass='>0', damping='>=0')
-    def __init__(self, max_force, mass, damping):
+    def __init__(self, max_force, mass, damping, integrator=None,
+                 dtype='float64'):
         spec = {
             'desc': 'Particle on SO(2) controled in force.',
             'shape': [1],
@@ -51,10 +65,24 @@ class CircleForce(SimpleDynamics):
                           pose_space=SO2,
                           commands_spec=spec,
                           mass=mass,
-                          damping=damping)
+                          damping=damping,
+                          integrator=integrator,
+                          dtype=dtype)
         self.max_force = max_force
     
-    @contract(commands='array[1]')
+    @contract_at(VALIDATION_FULL, commands='array[1]')
     def compute_forces(self, commands):
         force = self.max_force * commands[0]
         return hat_map_2d(force)
+
+    @contract_at(VALIDATION_FULL, commands='array[Nx1]')
+    def compute_forces_batch(self, commands):
+        force = self.max_force * commands
+        return algebra_from_vectors(self.pose_space.algebra, force)
+
+    def compute_forces_jacobian_batch(self, commands):
+        return np.tile(float(self.max_force), (commands.shape[0], 1, 1))
+
+    def _force_vector_into(self, commands, out):
+        out[0] = self.max_force * commands[0]
+
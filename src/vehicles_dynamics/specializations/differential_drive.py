@@ -1,4 +1,4 @@
-from . import SimpleKinematics, contract
+from . import SimpleKinematics, contract, algebra_from_vectors
 from geometry import (SE2, se2_from_linear_angular)
 import numpy as np
 
@@ -7,7 +7,8 @@ class DifferentialDrive(SimpleKinematics):
 
     @contract(max_linear_velocity='>=0',
               max_angular_velocity='>=0',)
-    def __init__(self, max_linear_velocity, max_angular_velocity):
+    def __init__(self, max_linear_velocity, max_angular_velocity,
+                 dtype='float64'):
         self.max_linear_velocity = max_linear_velocity
         self.max_angular_velocity = max_angular_velocity
         spec = {
@@ -23,7 +24,8 @@ class DifferentialDrive(SimpleKinematics):
         }
         SimpleKinematics.__init__(self,
                           pose_space=SE2,
-                          commands_spec=spec)
+                          commands_spec=spec,
+                          dtype=dtype)
 
     def compute_velocities(self, commands):
         linear = np.array([commands[1] * self.max_linear_velocity, 0])
@@ -31,3 +33,20 @@ class DifferentialDrive(SimpleKinematics):
         vel = se2_from_linear_angular(linear, angular)
         return vel
 
+    def compute_velocities_batch(self, commands):
+        w = np.zeros((commands.shape[0], 3))
+        w[:, 0] = commands[:, 0] * self.max_angular_velocity
+        w[:, 1] = commands[:, 1] * self.max_linear_velocity
+        return algebra_from_vectors(self.pose_space.algebra, w)
+
+    def compute_velocities_jacobian_batch(self, commands):
+        J = np.zeros((commands.shape[0], 3, 2))
+        J[:, 0, 0] = self.max_angular_velocity
+        J[:, 1, 1] = self.max_linear_velocity
+        return J
+
+    def _velocity_vector_into(self, commands, out):
+        out[0] = commands[0] * self.max_angular_velocity
+        out[1] = commands[1] * self.max_linear_velocity
+        out[2] = 0
+
@@ -1,4 +1,5 @@
-from . import SimpleDynamics, SimpleKinematics, np, contract
+from . import (SimpleDynamics, SimpleKinematics, np, contract,
+    algebra_from_vectors)
 from geometry import Tran2, Tran3, Tran1
 
 
@@ -6,7 +7,7 @@ class EuclideanVel(SimpleKinematics):
     ''' Particle in Euclidean space controlled in velocity. '''
 
     @contract(ndim='int,>0,N', max_velocity='seq[N](>0)')
-    def __init__(self, ndim, max_velocity):
+    def __init__(self, ndim, max_velocity, dtype='float64'):
         self.ndim = ndim
         self.max_velocity = np.array(max_velocity)
         pose_space = {1: Tran1, 2: Tran2, 3: Tran3}[ndim]
@@ -20,20 +21,33 @@ class EuclideanVel(SimpleKinematics):
             'extra': {'max_velocity': max_velocity,
                       'pose_space': '%s' % pose_space}
         }
-        SimpleKinematics.__init__(self, pose_space, commands_spec=spec)
+        SimpleKinematics.__init__(self, pose_space, commands_spec=spec,
+                                  dtype=dtype)
 
     def compute_velocities(self, commands):
         vel = self.max_velocity * np.array(commands)
         return self.pose_space.algebra.algebra_from_vector(vel)
 
+    def compute_velocities_batch(self, commands):
+        vel = self.max_velocity * commands
+        return algebra_from_vectors(self.pose_space.algebra, vel)
+
+    def compute_velocities_jacobian_batch(self, commands):
+        J = np.diag(self.max_velocity).astype('float64')
+        return np.tile(J, (commands.shape[0], 1, 1))
+
+    def _velocity_vector_into(self, commands, out):
+        np.multiply(self.max_velocity, commands, out=out)
+
 
 class EuclideanForce(SimpleDynamics):
     ''' Particle in Euclidean space controlled in force. '''
 
     @contract(ndim='int,>0,N', max_force='seq[N](>0)', mass='>0')
-    def __init__(self, ndim, max_force, mass, damping):
+    def __init__(self, ndim, max_force, mass, damping, integrator=None,
+                 dtype='float64'):
         self.ndim = ndim
-        self.max_force = max_force
+        self.max_force = np.array(max_force)
         self.mass = mass
         pose_space = {1: Tran1, 2: Tran2, 3: Tran3}[ndim]
         spec = {
@@ -52,8 +66,24 @@ class EuclideanForce(SimpleDynamics):
                           pose_space=pose_space,
                           commands_spec=spec,
                           mass=mass,
-                          damping=damping)
+                          damping=damping,
+                          integrator=integrator,
+                          dtype=dtype)
 
     def compute_forces(self, commands):
         f = self.max_force * np.array(commands)
         return self.pose_space.algebra.algebra_from_vector(f)
+
+    def compute_forces_batch(self, commands):
+        f = np.array(self.max_force) * commands
+        return algebra_from_vectors(self.pose_space.algebra, f)
+
+    def compute_forces_jacobian_batch(self, commands):
+        J = np.diag(self.max_force).astype('float64')
+        return np.tile(J, (commands.shape[0], 1, 1))
+
+    def _force_vector_into(self, commands, out):
+        # (max_force is kept as given, possibly a list)
+        for i in range(self.ndim):
+            out[i] = self.max_force[i] * commands[i]
+
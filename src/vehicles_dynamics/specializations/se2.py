@@ -1,4 +1,4 @@
-from . import SimpleKinematics, contract
+from . import SimpleKinematics, contract, np, algebra_from_vectors
 from geometry import (SE2, se2_from_linear_angular)
 
 
@@ -7,8 +7,8 @@ class SE2Dynamics(SimpleKinematics):
     @contract(max_linear_velocity='seq[2](>=0)',
               max_angular_velocity='>=0',)
     def __init__(self, max_linear_velocity, max_angular_velocity,
-                 noise_drift=None, noise_mult=None):
-        self.max_linear_velocity = max_linear_velocity
+                 noise_drift=None, noise_mult=None, dtype='float64'):
+        self.max_linear_velocity = np.array(max_linear_velocity)
         self.max_angular_velocity = max_angular_velocity
         spec = {
             'desc': 'Particle in SE2 controlled in velocity',
@@ -25,7 +25,8 @@ class SE2Dynamics(SimpleKinematics):
                           pose_space=SE2,
                           commands_spec=spec,
                           noise_mult=noise_mult,
-                          noise_drift=noise_drift)
+                          noise_drift=noise_drift,
+                          dtype=dtype)
 
     def compute_velocities(self, commands):
         linear = [commands[0] * self.max_linear_velocity[0],
@@ -34,3 +35,22 @@ class SE2Dynamics(SimpleKinematics):
         vel = se2_from_linear_angular(linear, angular)
         return vel
 
+    def compute_velocities_batch(self, commands):
+        w = np.zeros((commands.shape[0], 3))
+        w[:, 0] = commands[:, 2] * self.max_angular_velocity
+        w[:, 1] = commands[:, 0] * self.max_linear_velocity[0]
+        w[:, 2] = commands[:, 1] * self.max_linear_velocity[1]
+        return algebra_from_vectors(self.pose_space.algebra, w)
+
+    def compute_velocities_jacobian_batch(self, commands):
+        J = np.zeros((commands.shape[0], 3, 3))
+        J[:, 0, 2] = self.max_angular_velocity
+        J[:, 1, 0] = self.max_linear_velocity[0]
+        J[:, 2, 1] = self.max_linear_velocity[1]
+        return J
+
+    def _velocity_vector_into(self, commands, out):
+        out[0] = commands[2] * self.max_angular_velocity
+        out[1] = commands[0] * self.max_linear_velocity[0]
+        out[2] = commands[1] * self.max_linear_velocity[1]
+
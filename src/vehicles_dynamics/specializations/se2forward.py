@@ -1,4 +1,4 @@
-from . import SimpleKinematics, contract
+from . import SimpleKinematics, contract, np, algebra_from_vectors
 from geometry import (SE2, se2_from_linear_angular)
 
 
@@ -7,7 +7,7 @@ class SE2Forward(SimpleKinematics):
     @contract(linear_velocity='>0',
               max_angular_velocity='>0')
     def __init__(self, linear_velocity, max_angular_velocity,
-                 noise_mult=None, noise_drift=None):
+                 noise_mult=None, noise_drift=None, dtype='float64'):
         self.linear_velocity = linear_velocity
         self.max_angular_velocity = max_angular_velocity
         spec = {
@@ -26,7 +26,8 @@ class SE2Forward(SimpleKinematics):
                           pose_space=SE2,
                           commands_spec=spec,
                           noise_mult=noise_mult,
-                          noise_drift=noise_drift)
+                          noise_drift=noise_drift,
+                          dtype=dtype)
 
     def compute_velocities(self, commands):
         linear = [self.linear_velocity, 0]
@@ -34,3 +35,19 @@ class SE2Forward(SimpleKinematics):
         vel = se2_from_linear_angular(linear, float(angular))
         return vel
 
+    def compute_velocities_batch(self, commands):
+        w = np.zeros((commands.shape[0], 3))
+        w[:, 0] = commands[:, 0] * self.max_angular_velocity
+        w[:, 1] = self.linear_velocity
+        return algebra_from_vectors(self.pose_space.algebra, w)
+
+    def compute_velocities_jacobian_batch(self, commands):
+        J = np.zeros((commands.shape[0], 3, 1))
+        J[:, 0, 0] = self.max_angular_velocity
+        return J
+
+    def _velocity_vector_into(self, commands, out):
+        out[0] = commands[0] * self.max_angular_velocity
+        out[1] = self.linear_velocity
+        out[2] = 0
+
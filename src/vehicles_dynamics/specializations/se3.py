@@ -1 +1,176 @@
-# TODO: 
+'''
+    Rigid bodies in SE3 (drones, underwater vehicles), controlled
+    in velocity (SE3Vel) or in force (SE3Force).
+
+    The commands are scaled coordinates of se3: angular (w1, w2, w3),
+    then linear (v1, v2, v3).
+
+    The usual interface, on 4x4 matrices, uses the closed-form
+    exponential of SE3. Besides, both classes can step whole fleets
+    in a quaternion form, without building any matrix: ::
+
+        q, p, twists = dynamics.quaternion_states(poses, vels)
+        for t in range(T):
+            q, p, twists = dynamics.integrate_quaternions(q, p, twists,
+                                                          commands, dt)
+        poses, vels = dynamics.matrix_states(q, p, twists)
+
+    where q (N, 4) are the unit quaternions of the rotations (see the
+    quaternions module), p (N, 3) the positions, and twists (N, 6)
+    the coordinates of the velocities. This form has a larger fixed
+    cost per call, and it is faster than integrate_batch() for fleets
+    of some thousands of bodies and more; the benchmarks compare the
+    two (operation 'integrate_quaternions').
+'''
+from . import (SimpleKinematics, contract, np, SimpleDynamics,
+    algebra_from_vectors, contract_at)
+from .. import (VALIDATION_BOUNDARY, MidpointIntegrator, vectors_from_algebra,
+    quaternion_multiply, quaternion_rotate, quaternion_normalize,
+    quaternion_from_rotation, rotation_from_quaternion, se3_exp_quaternion)
+from geometry import SE3
+
+
+class SE3QuaternionStates(object):
+    ''' The quaternion form of the states; see the module documentation. '''
+
+    def quaternion_states(self, poses, vels):
+        ''' Converts arrays (N, 4, 4) of poses and velocities. '''
+        q = quaternion_from_rotation(poses[:, :3, :3])
+        algebra = self.pose_space.get_algebra()
+        return q, poses[:, :3, 3].copy(), vectors_from_algebra(algebra, vels)
+
+    def matrix_states(self, q, p, twists):
+        ''' Inverse of quaternion_states(). '''
+        poses = np.zeros((q.shape[0], 4, 4), dtype=q.dtype)
+        poses[:, :3, :3] = rotation_from_quaternion(q)
+        poses[:, :3, 3] = p
+        poses[:, 3, 3] = 1
+        algebra = self.pose_space.get_algebra()
+        return poses, algebra_from_vectors(algebra, twists)
+
+    @contract_at(VALIDATION_BOUNDARY,
+                 q='array[Nx4]', p='array[Nx3]', twists='array[Nx6]',
+                 commands='array[NxM]', dt='>=0')
+    def integrate_quaternions(self, q, p, twists, commands, dt):
+        '''
+            Same as integrate_batch(), for states in the quaternion
+            form. Returns the new (q, p, twists).
+        '''
+        commands = self._checked_commands(commands, VALIDATION_BOUNDARY)
+        dq, dp, twists2 = self._quaternion_steps(twists, commands, dt)
+        p2 = p + quaternion_rotate(q, dp)
+        q2 = quaternion_normalize(quaternion_multiply(q, dq))
+        return q2, p2, twists2
+
+    def _quaternion_steps(self, twists, commands, dt):
+        '''
+            Returns the increments of the poses, as quaternions and
+            translations, and the new twists.
+        '''
+        raise NotImplementedError()
+
+
+class SE3Vel(SE3QuaternionStates, SimpleKinematics):
+
+    @contract(max_angular_velocity='seq[3](>0)',
+              max_linear_velocity='seq[3](>0)')
+    def __init__(self, max_angular_velocity, max_linear_velocity,
+                 noise_drift=None, noise_mult=None, dtype='float64'):
+        self.max_angular_velocity = np.array(max_angular_velocity)
+        self.max_linear_velocity = np.array(max_linear_velocity)
+        spec = {
+            'desc': 'Rigid body in SE3 controlled in velocity.',
+            'shape': [6],
+            'format': ['C'] * 6,
+            'range': [[-1, +1]] * 6,
+            'names': ['w1', 'w2', 'w3', 'v1', 'v2', 'v3'],
+            'default': [0] * 6,
+            'extra': {'max_angular_velocity': max_angular_velocity,
+                      'max_linear_velocity': max_linear_velocity,
+                      'pose_space': 'SE3'}
+        }
+        SimpleKinematics.__init__(self, pose_space=SE3, commands_spec=spec,
+                                  noise_drift=noise_drift,
+                                  noise_mult=noise_mult, dtype=dtype)
+
+    def _max_twist(self):
+        return np.concatenate((self.max_angular_velocity,
+                               self.max_linear_velocity))
+
+    def compute_velocities(self, commands):
+        return self.pose_space.algebra.algebra_from_vector(
+            self._max_twist() * commands)
+
+    def compute_velocities_batch(self, commands):
+        return algebra_from_vectors(self.pose_space.algebra,
+                                    self._max_twist() * commands)
+
+    def compute_velocities_jacobian_batch(self, commands):
+        J = np.diag(self._max_twist()).astype('float64')
+        return np.tile(J, (commands.shape[0], 1, 1))
+
+    def _velocity_vector_into(self, commands, out):
+        np.concatenate((self.max_angular_velocity, self.max_linear_velocity),
+                       out=out)
+        out *= commands
+
+    def _quaternion_steps(self, twists, commands, dt):
+        twists2 = self._cast(self._add_noise_vectors(self._max_twist() *
+                                                     commands))
+        dq, dp = se3_exp_quaternion(twists2 * dt)
+        return dq, dp, twists2
+
+
+class SE3Force(SE3QuaternionStates, SimpleDynamics):
+
+    @contract(max_force='seq[6](>0)', mass='>0', damping='>=0')
+    def __init__(self, max_force, mass, damping, integrator=None,
+                 dtype='float64'):
+        self.max_force = np.array(max_force)
+        spec = {
+            'desc': 'Rigid body in SE3 controlled in force.',
+            'shape': [6],
+            'format': ['C'] * 6,
+            'range': [[-1, +1]] * 6,
+            'names': ['t1', 't2', 't3', 'f1', 'f2', 'f3'],
+            'default': [0] * 6,
+            'extra': {'max_force': max_force,
+                      'mass': mass,
+                      'damping': damping,
+                      'pose_space': 'SE3'}
+        }
+        SimpleDynamics.__init__(self,
+                          pose_space=SE3,
+                          commands_spec=spec,
+                          mass=mass, damping=damping,
+                          integrator=integrator,
+                          dtype=dtype)
+
+    def compute_forces(self, commands):
+        return self.pose_space.algebra.algebra_from_vector(self.max_force *
+                                                           commands)
+
+    def compute_forces_batch(self, commands):
+        return algebra_from_vectors(self.pose_space.algebra,
+                                    self.max_force * commands)
+
+    def compute_forces_jacobian_batch(self, commands):
+        J = np.diag(self.max_force).astype('float64')
+        return np.tile(J, (commands.shape[0], 1, 1))
+
+    def _force_vector_into(self, commands, out):
+        np.multiply(self.max_force, commands, out=out)
+
+    def _quaternion_steps(self, twists, commands, dt):
+        forces = self._cast(self.max_force * commands)
+        if isinstance(self._integrator, MidpointIntegrator):
+            # the same step as MidpointIntegrator, on the coordinates
+            twists2 = twists + dt * (forces - twists * self.damping) / self.mass
+            dq, dp = se3_exp_quaternion(0.5 * (twists + twists2) * dt)
+            return dq, dp, twists2
+        algebra = self.pose_space.get_algebra()
+        steps, vels2 = self._integrator.increment(
+            self, algebra_from_vectors(algebra, twists),
+            algebra_from_vectors(algebra, forces), dt)
+        return (quaternion_from_rotation(steps[:, :3, :3]), steps[:, :3, 3],
+                vectors_from_algebra(algebra, vels2))
@@ -1,11 +1,195 @@
-from . import SimpleKinematics, contract, np, SimpleDynamics
+'''
+    Particles in SO3, controlled in velocity (SO3Vel) or in force
+    (SO3Force).
+
+    By default, the states are (R, vel), with R a 3x3 rotation matrix
+    and vel the 3x3 skew matrix of the angular velocity. With the
+    option quaternions=True, pose2state() gives states (q, w) instead,
+    where q (4,) is the unit quaternion of the rotation (see the
+    quaternions module) and w (3,) the angular velocity. A step is then
+    a quaternion product followed by a normalization, so that the
+    rotations do not drift away from SO3 over long runs, as the
+    products of matrices do.
+
+    Both forms are accepted everywhere: the methods look at the shape
+    of the given states. In particular, integrate_batch() and
+    rollout() take arrays (N, 4) and (N, 3) for the quaternion form;
+    joint_state() and state_to_yaml() convert to the matrix form.
+    The compact states are always in the form chosen by the option:
+    [q, w] (7 numbers) with quaternions=True, the matrices otherwise.
+'''
+from . import (SimpleKinematics, contract, np, SimpleDynamics,
+    algebra_from_vectors, contract_at)
+from .. import (VALIDATION_BOUNDARY, MidpointIntegrator, vectors_from_algebra,
+    quaternion_multiply, quaternion_normalize, quaternion_exp,
+    quaternion_from_rotation, rotation_from_quaternion)
 from geometry import (SO3, hat_map)
 
 
-class SO3Vel(SimpleKinematics):
+class SO3QuaternionStates(object):
+    ''' The quaternion form of the states; see the module documentation. '''
+
+    def __init__(self, quaternions):
+        self.quaternions = quaternions
+
+    @staticmethod
+    def _is_quaternion_state(state):
+        return np.ndim(state[0]) == 1
+
+    def quaternion_states(self, poses, vels):
+        ''' Converts arrays (N, 3, 3) of poses and velocities. '''
+        algebra = self.pose_space.get_algebra()
+        return (quaternion_from_rotation(self._cast(poses)),
+                self._cast(vectors_from_algebra(algebra, vels)))
+
+    def matrix_states(self, q, w):
+        ''' Inverse of quaternion_states(). '''
+        algebra = self.pose_space.get_algebra()
+        return (rotation_from_quaternion(q),
+                self._cast(algebra_from_vectors(algebra, w)))
+
+    def quaternion_state(self, state):
+        ''' Returns the state (in any form) in the quaternion form. '''
+        pose, vel = self._state_from(state)
+        if self._is_quaternion_state((pose, vel)):
+            return pose, vel
+        q, w = self.quaternion_states(pose[np.newaxis], vel[np.newaxis])
+        return q[0], w[0]
+
+    def matrix_state(self, state):
+        ''' Returns the state (in any form) in the matrix form. '''
+        pose, vel = self._state_from(state)
+        if not self._is_quaternion_state((pose, vel)):
+            return pose, vel
+        poses, vels = self.matrix_states(pose[np.newaxis], vel[np.newaxis])
+        return poses[0], vels[0]
+
+    @contract_at(VALIDATION_BOUNDARY,
+                 q='array[Nx4]', w='array[Nx3]',
+                 commands='array[NxM]', dt='>=0')
+    def integrate_quaternions(self, q, w, commands, dt):
+        '''
+            Same as integrate_batch(), for states in the quaternion
+            form. Returns the new (q, w).
+        '''
+        commands = self._checked_commands(commands, VALIDATION_BOUNDARY)
+        return self._integrate_quaternions(q, w, commands, dt)
+
+    def _integrate_quaternions(self, q, w, commands, dt):
+        dq, w2 = self._quaternion_steps(self._cast(w), commands, dt)
+        q2 = quaternion_normalize(quaternion_multiply(self._cast(q), dq))
+        return q2, w2
+
+    def _quaternion_steps(self, w, commands, dt):
+        '''
+            Returns the increments of the rotations, as quaternions,
+            and the new angular velocities.
+        '''
+        raise NotImplementedError()
+
+    # The methods of SimpleKinematics, extended to the quaternion form.
+
+    def pose2state(self, pose, compact=False):
+        state = SimpleKinematics.pose2state(self, pose)
+        if self.quaternions:
+            state = self.quaternion_state(state)
+        if compact:
+            return self.to_compact(state)
+        return state
+
+    def _embed_state(self, state):
+        return SimpleKinematics._embed_state(self, self.matrix_state(state))
+
+    def compact_size(self):
+        if self.quaternions:
+            return 7
+        return SimpleKinematics.compact_size(self)
+
+    def to_compact(self, state):
+        # (in the form of the instance, whatever the form of the state)
+        if self.quaternions:
+            q, w = self.quaternion_state(state)
+            return np.concatenate((q, w)).astype('float64')
+        return SimpleKinematics.to_compact(self, self.matrix_state(state))
+
+    def from_compact(self, x):
+        if self.quaternions:
+            return self._cast(x[:4]), self._cast(x[4:])
+        return SimpleKinematics.from_compact(self, x)
 
-    @contract(max_angular_velocity='seq[3](>0)')
-    def __init__(self, max_angular_velocity):
+    def _stack_states(self, states):
+        if not self.quaternions:
+            return SimpleKinematics._stack_states(self, states)
+        if isinstance(states, np.ndarray) and states.ndim == 2:
+            return states[:, :4], states[:, 4:]
+        states = [self.quaternion_state(s) for s in states]
+        return (self._cast([q for q, _ in states]),
+                self._cast([w for _, w in states]))
+
+    def joint_states_arrays(self, poses, vels):
+        if poses.ndim == 2:
+            poses, vels = self.matrix_states(poses, vels)
+        return SimpleKinematics.joint_states_arrays(self, poses, vels)
+
+    def linearize(self, state, commands, dt):
+        # the perturbations do not depend on the form of the state
+        return SimpleKinematics.linearize(self, self.matrix_state(state),
+                                          commands, dt)
+
+    def _integrate(self, state, commands, dt):
+        if not self._is_quaternion_state(state):
+            return super(SO3QuaternionStates, self)._integrate(state,
+                                                               commands, dt)
+        q, w = state
+        q2, w2 = self._integrate_quaternions(q[np.newaxis], w[np.newaxis],
+                                             np.asarray(commands)[np.newaxis],
+                                             dt)
+        return q2[0], w2[0]
+
+    @contract_at(VALIDATION_BOUNDARY,
+                 poses='array[NxKxK]|array[Nx4]',
+                 vels='array[NxKxK]|array[Nx3]',
+                 commands='array[NxM]', dt='>=0')
+    def integrate_batch(self, poses, vels, commands, dt):
+        '''
+            See SimpleKinematics.integrate_batch(); the states can
+            also be in the quaternion form (arrays (N, 4) and (N, 3)).
+        '''
+        commands = self._checked_commands(commands, VALIDATION_BOUNDARY)
+        return self._integrate_batch(poses, vels, commands, dt)
+
+    def _integrate_batch(self, poses, vels, commands, dt):
+        if poses.ndim == 2:
+            return self._integrate_quaternions(poses, vels, commands, dt)
+        return super(SO3QuaternionStates, self)._integrate_batch(poses, vels,
+                                                                 commands, dt)
+
+    @contract_at(VALIDATION_BOUNDARY,
+                 state='tuple(*,*)', commands_seq='array[TxM]', dt='>=0')
+    def rollout(self, state, commands_seq, dt):
+        ''' See SimpleKinematics.rollout(), also for the quaternion form. '''
+        if not self._is_quaternion_state(state):
+            return super(SO3QuaternionStates, self).rollout(state,
+                                                            commands_seq, dt)
+        commands_seq = self._checked_commands(commands_seq,
+                                              VALIDATION_BOUNDARY)
+        T = commands_seq.shape[0]
+        q = np.empty((T + 1, 4), dtype=self.dtype)
+        w = np.empty((T + 1, 3), dtype=self.dtype)
+        q[0], w[0] = state
+        for t in range(T):
+            q2, w2 = self._integrate_quaternions(q[t:t + 1], w[t:t + 1],
+                                                 commands_seq[t:t + 1], dt)
+            q[t + 1] = q2[0]
+            w[t + 1] = w2[0]
+        return q, w
+
+
+class SO3Vel(SO3QuaternionStates, SimpleKinematics):
+
+    @contract(max_angular_velocity='seq[3](>0)', quaternions='bool')
+    def __init__(self, max_angular_velocity, dtype='float64',
+                 quaternions=False):
         self.max_angular_velocity = np.array(max_angular_velocity)
         spec = {
             'desc': 'Particle in SO3 controlled in velocity.',
@@ -18,16 +202,36 @@ class SO3Vel(SimpleKinematics):
                       'pose_space': 'SO3'}
         }
 
-        SimpleKinematics.__init__(self, pose_space=SO3, commands_spec=spec)
+        SimpleKinematics.__init__(self, pose_space=SO3, commands_spec=spec,
+                                  dtype=dtype)
+        SO3QuaternionStates.__init__(self, quaternions)
 
     def compute_velocities(self, commands):
         return hat_map(self.max_angular_velocity * commands)
 
+    def compute_velocities_batch(self, commands):
+        w = self.max_angular_velocity * commands
+        return algebra_from_vectors(self.pose_space.algebra, w)
 
-class SO3Force(SimpleDynamics):
+    def compute_velocities_jacobian_batch(self, commands):
+        J = np.diag(self.max_angular_velocity).astype('float64')
+        return np.tile(J, (commands.shape[0], 1, 1))
 
-    @contract(max_force='seq[3](>0)', mass='>0', damping='>=0')
-    def __init__(self, max_force, mass, damping):
+    def _velocity_vector_into(self, commands, out):
+        np.multiply(self.max_angular_velocity, commands, out=out)
+
+    def _quaternion_steps(self, w, commands, dt):
+        w2 = self._cast(self._add_noise_vectors(self.max_angular_velocity *
+                                                commands))
+        return quaternion_exp(w2 * dt), w2
+
+
+class SO3Force(SO3QuaternionStates, SimpleDynamics):
+
+    @contract(max_force='seq[3](>0)', mass='>0', damping='>=0',
+              quaternions='bool')
+    def __init__(self, max_force, mass, damping, integrator=None,
+                 dtype='float64', quaternions=False):
         self.max_force = np.array(max_force)
         spec = {
             'desc': 'Particle in SO3 controlled in force.',
@@ -44,7 +248,34 @@ class SO3Force(SimpleDynamics):
         SimpleDynamics.__init__(self,
                           pose_space=SO3,
                           commands_spec=spec,
-                          mass=mass, damping=damping)
+                          mass=mass, damping=damping,
+                          integrator=integrator,
+                          dtype=dtype)
+        SO3QuaternionStates.__init__(self, quaternions)
 
     def compute_forces(self, commands):
         return hat_map(self.max_force * commands)
+
+    def compute_forces_batch(self, commands):
+        f = self.max_force * commands
+        return algebra_from_vectors(self.pose_space.algebra, f)
+
+    def compute_forces_jacobian_batch(self, commands):
+        J = np.diag(self.max_force).astype('float64')
+        return np.tile(J, (commands.shape[0], 1, 1))
+
+    def _force_vector_into(self, commands, out):
+        np.multiply(self.max_force, commands, out=out)
+
+    def _quaternion_steps(self, w, commands, dt):
+        forces = self._cast(self.max_force * commands)
+        if isinstance(self._integrator, MidpointIntegrator):
+            # the same step as MidpointIntegrator, on the coordinates
+            w2 = w + dt * (forces - w * self.damping) / self.mass
+            return quaternion_exp(0.5 * (w + w2) * dt), w2
+        algebra = self.pose_space.get_algebra()
+        steps, vels2 = self._integrator.increment(
+            self, algebra_from_vectors(algebra, w),
+            algebra_from_vectors(algebra, forces), dt)
+        return (quaternion_from_rotation(steps),
+                self._cast(vectors_from_algebra(algebra, vels2)))
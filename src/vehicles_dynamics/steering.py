@@ -0,0 +1,420 @@
+'''
+    Shortest paths between two poses of the car models, in closed form.
+
+    For a car with minimum turning radius R = L / tan(max_steering_angle):
+
+    - dubins_paths() gives the shortest forward paths (DubinsCar),
+      among the 6 words LSL, RSR, LSR, RSL, RLR, LRL of Dubins;
+    - reeds_shepp_paths() gives the shortest paths with reverse
+      (ReedsSheepCar). As in OMPL, the 48 words of Reeds and Shepp
+      are reduced to 11 formulas for the families CSC, CCC, CCCC,
+      CCSC and CCSCC, each one evaluated in its original,
+      time-flipped, reflected and time-flipped reflected versions:
+      44 candidates, written with the 18 words of reeds_shepp_words.
+      The formulas are those of the paper, with the corrections
+      used in OMPL.
+
+    Both take a start pose and N goal poses (SE2 matrices), and solve
+    the N problems at once. The result is a SteeringPaths, which gives
+    the length of each path, its segments as commands and durations
+    for integrate(), and the poses along it, computed in closed form.
+
+    The segments are given in units of R, with a sign: positive when
+    driving forward, negative in reverse. L turns left (counterclockwise
+    when driving forward), R turns right, S is straight.
+'''
+from . import contract, np
+
+# tolerance on the signs of the segments
+ZERO = 10 * np.finfo(float).eps
+# maximum number of segments in a word
+MAX_SEGMENTS = 5
+
+dubins_words = ['LSL', 'RSR', 'LSR', 'RSL', 'RLR', 'LRL']
+
+# The words of the Reeds-Shepp families (as in OMPL).
+reeds_shepp_words = ['LRL', 'RLR', 'LRLR', 'RLRL', 'LRSL', 'RLSR', 'LSRL',
+                     'RSLR', 'LRSR', 'RLSL', 'RSRL', 'LSLR', 'LSR', 'RSL',
+                     'LSL', 'RSR', 'LRSLR', 'RLSRL']
+
+# steering command for each kind of segment
+steering_commands = {'L': +1, 'R': -1, 'S': 0}
+
+
+class SteeringPaths(object):
+    '''
+        N shortest paths from the same start pose; see the module
+        documentation. The attributes are:
+
+            words      the list of the possible words
+            word_index the index of the word of each path (N,)
+            segments   the signed lengths of the segments, in units
+                       of radius, padded with zeros (N, 5)
+            lengths    the lengths of the paths (N,)
+    '''
+
+    def __init__(self, start, radius, speed, words, word_index, segments):
+        self.start = start
+        self.radius = radius
+        self.speed = speed
+        self.words = words
+        self.word_index = word_index
+        self.segments = segments
+        self.lengths = radius * np.sum(np.abs(segments), axis=1)
+        # kinds of the segments: +1 for L, -1 for R, 0 for S or unused
+        kinds = np.zeros((len(words), MAX_SEGMENTS))
+        for w, word in enumerate(words):
+            for j, c in enumerate(word):
+                kinds[w, j] = steering_commands[c]
+        self._kinds = kinds[word_index]
+
+    def __repr__(self):
+        return 'SteeringPaths(%d paths)' % len(self)
+
+    def __len__(self):
+        return self.segments.shape[0]
+
+    def word(self, i):
+        '''
+            Returns the word of the i-th path, such as 'L+ S+ R-',
+            without the segments of length zero.
+        '''
+        word = self.words[self.word_index[i]]
+        return ' '.join('%s%s' % (c, '+' if s > 0 else '-')
+                        for c, s in zip(word, self.segments[i]) if s != 0)
+
+    @contract(i='int')
+    def commands(self, i):
+        '''
+            Returns the i-th path as a list of (commands, duration),
+            one for each segment: applying the commands with
+            integrate() for the duration follows the path.
+        '''
+        word = self.words[self.word_index[i]]
+        result = []
+        for c, s in zip(word, self.segments[i]):
+            if s == 0:
+                continue
+            commands = np.array([np.sign(s), steering_commands[c]],
+                                dtype='float64')
+            duration = self.radius * abs(s) / self.speed
+            result.append((commands, duration))
+        return result
+
+    @contract(num_samples='int,>=2')
+    def sample(self, num_samples):
+        '''
+            Returns the array (N, num_samples, 3, 3) of the poses
+            at equally spaced points of each path, including the
+            start and the goal.
+        '''
+        s = np.linspace(0, 1, num_samples)
+        total = np.sum(np.abs(self.segments), axis=1)
+        return self._poses_at(total[:, np.newaxis] * s)
+
+    def _poses_at(self, s):
+        ''' Poses (N, S, 3, 3) at the distances s (N, S), in units of R. '''
+        N, S = s.shape
+        x = np.zeros((N, S))
+        y = np.zeros((N, S))
+        phi = np.zeros((N, S))
+        done = np.zeros((N, 1))
+        for j in range(MAX_SEGMENTS):
+            segment = self.segments[:, j:j + 1]
+            length = np.abs(segment)
+            v = np.clip(s - done, 0, length) * np.sign(segment)
+            kind = self._kinds[:, j:j + 1]
+            x, y, phi = _move(x, y, phi, kind, v)
+            done = done + length
+        poses = np.zeros((N, S, 3, 3))
+        poses[..., 0, 0] = np.cos(phi)
+        poses[..., 0, 1] = -np.sin(phi)
+        poses[..., 1, 0] = np.sin(phi)
+        poses[..., 1, 1] = np.cos(phi)
+        poses[..., 0, 2] = x * self.radius
+        poses[..., 1, 2] = y * self.radius
+        poses[..., 2, 2] = 1
+        return np.matmul(self.start, poses)
+
+
+def _move(x, y, phi, kind, v):
+    '''
+        Moves along a segment of the given kind (+1 for L, -1 for R,
+        0 for S) and signed length v, in units of R.
+    '''
+    turning = kind != 0
+    # for the turns
+    phi2 = phi + kind * v
+    safe = np.where(turning, kind, 1)
+    xt = x + (np.sin(phi2) - np.sin(phi)) / safe
+    yt = y - (np.cos(phi2) - np.cos(phi)) / safe
+    # for the straight lines
+    xs = x + v * np.cos(phi)
+    ys = y + v * np.sin(phi)
+    return (np.where(turning, xt, xs), np.where(turning, yt, ys),
+            np.where(turning, phi2, phi))
+
+
+def turning_radius(car):
+    ''' Returns the minimum turning radius of a SimpleCar. '''
+    return car.L / np.tan(car.max_steering_angle)
+
+
+def _relative(car, start, goals):
+    '''
+        Returns the goals in the frame of the start, as arrays (N,)
+        x, y, phi, with x and y in units of the turning radius.
+    '''
+    goals = np.asarray(goals, dtype='float64')
+    if goals.ndim == 2:
+        goals = goals[np.newaxis]
+    R = turning_radius(car)
+    relative = np.matmul(np.linalg.inv(start), goals)
+    x = relative[:, 0, 2] / R
+    y = relative[:, 1, 2] / R
+    phi = np.arctan2(relative[:, 1, 0], relative[:, 0, 0])
+    return x, y, phi
+
+
+def _shortest(car, start, words, candidates, N):
+    '''
+        Chooses the shortest valid candidate for each problem.
+        candidates is a list of (word index, valid (N,), segments (N, 5)).
+    '''
+    lengths = np.full((len(candidates), N), np.inf)
+    for k, (_, valid, segments) in enumerate(candidates):
+        lengths[k, valid] = np.sum(np.abs(segments[valid]), axis=1)
+    best = np.argmin(lengths, axis=0)
+    if np.any(np.isinf(lengths[best, np.arange(N)])):
+        raise ValueError('No path found; are the poses valid?')
+    word_index = np.empty(N, dtype='int')
+    segments = np.empty((N, MAX_SEGMENTS))
+    for k, (w, _, segs) in enumerate(candidates):
+        chosen = best == k
+        word_index[chosen] = w
+        segments[chosen] = segs[chosen]
+    return SteeringPaths(start=np.asarray(start, dtype='float64'),
+                         radius=turning_radius(car),
+                         speed=car.max_linear_velocity,
+                         words=words, word_index=word_index,
+                         segments=segments)
+
+
+def _segments(*columns):
+    ''' Stacks the columns (arrays (N,) or numbers) into an array (N, 5). '''
+    N = max(np.size(c) for c in columns)
+    result = np.zeros((N, MAX_SEGMENTS))
+    for j, c in enumerate(columns):
+        result[:, j] = c
+    return result
+
+
+def _mod(x):
+    ''' Angle in [0, 2pi). '''
+    return np.mod(x, 2 * np.pi)
+
+
+def _mod2pi(x):
+    ''' Angle in [-pi, pi] (as in OMPL). '''
+    v = np.fmod(x, 2 * np.pi)
+    v = np.where(v < -np.pi, v + 2 * np.pi, v)
+    return np.where(v > np.pi, v - 2 * np.pi, v)
+
+
+@contract(start='array[3x3]')
+def dubins_paths(car, start, goals):
+    '''
+        Shortest forward paths from the SE2 pose start to each of the
+        goals (an array (N, 3, 3), or a single pose).
+    '''
+    x, y, phi = _relative(car, start, goals)
+    N = x.size
+    d = np.hypot(x, y)
+    theta = _mod(np.arctan2(y, x))
+    a = _mod(-theta)
+    b = _mod(phi - theta)
+    sa, sb, ca, cb = np.sin(a), np.sin(b), np.cos(a), np.cos(b)
+    cab = np.cos(a - b)
+    candidates = []
+    with np.errstate(invalid='ignore'):
+        # LSL
+        p2 = 2 + d * d - 2 * cab + 2 * d * (sa - sb)
+        t1 = np.arctan2(cb - ca, d + sa - sb)
+        candidates.append((0, p2 >= 0,
+                           _segments(_mod(-a + t1), np.sqrt(p2),
+                                     _mod(b - t1))))
+        # RSR
+        p2 = 2 + d * d - 2 * cab + 2 * d * (sb - sa)
+        t1 = np.arctan2(ca - cb, d - sa + sb)
+        candidates.append((1, p2 >= 0,
+                           _segments(_mod(a - t1), np.sqrt(p2),
+                                     _mod(-b + t1))))
+        # LSR
+        p2 = -2 + d * d + 2 * cab + 2 * d * (sa + sb)
+        p = np.sqrt(p2)
+        t2 = np.arctan2(-ca - cb, d + sa + sb) - np.arctan2(-2, p)
+        candidates.append((2, p2 >= 0,
+                           _segments(_mod(-a + t2), p, _mod(-b + t2))))
+        # RSL
+        p2 = d * d - 2 + 2 * cab - 2 * d * (sa + sb)
+        p = np.sqrt(p2)
+        t2 = np.arctan2(ca + cb, d - sa - sb) - np.arctan2(2, p)
+        candidates.append((3, p2 >= 0,
+                           _segments(_mod(a - t2), p, _mod(b - t2))))
+        # RLR
+        c = (6 - d * d + 2 * cab + 2 * d * (sa - sb)) / 8
+        p = _mod(2 * np.pi - np.arccos(c))
+        t = _mod(a - np.arctan2(ca - cb, d - sa + sb) + p / 2)
+        candidates.append((4, np.abs(c) <= 1,
+                           _segments(t, p, _mod(a - b - t + p))))
+        # LRL
+        c = (6 - d * d + 2 * cab + 2 * d * (sb - sa)) / 8
+        p = _mod(2 * np.pi - np.arccos(c))
+        t = _mod(-a - np.arctan2(ca - cb, d + sa - sb) + p / 2)
+        candidates.append((5, np.abs(c) <= 1,
+                           _segments(t, p, _mod(b - a - t + p))))
+    return _shortest(car, start, dubins_words, candidates, N)
+
+
+# The base formulas of Reeds and Shepp, for all the problems at once.
+# Each returns (valid, t, u, v).
+
+def _polar(x, y):
+    return np.hypot(x, y), np.arctan2(y, x)
+
+
+def _LpSpLp(x, y, phi):
+    # formula 8.1
+    u, t = _polar(x - np.sin(phi), y - 1 + np.cos(phi))
+    v = _mod2pi(phi - t)
+    return (t >= -ZERO) & (v >= -ZERO), t, u, v
+
+
+def _LpSpRp(x, y, phi):
+    # formula 8.2
+    u1, t1 = _polar(x + np.sin(phi), y - 1 - np.cos(phi))
+    u1 = u1 * u1
+    u = np.sqrt(np.maximum(u1 - 4, 0))
+    t = _mod2pi(t1 + np.arctan2(2, u))
+    v = _mod2pi(t - phi)
+    return (u1 >= 4) & (t >= -ZERO) & (v >= -ZERO), t, u, v
+
+
+def _LpRmL(x, y, phi):
+    # formula 8.3/8.4
+    u1, theta = _polar(x - np.sin(phi), y - 1 + np.cos(phi))
+    u = -2 * np.arcsin(np.minimum(0.25 * u1, 1))
+    t = _mod2pi(theta + 0.5 * u + np.pi)
+    v = _mod2pi(phi - t + u)
+    return (u1 <= 4) & (t >= -ZERO) & (u <= ZERO), t, u, v
+
+
+def _tau_omega(u, v, xi, eta, phi):
+    delta = _mod2pi(u - v)
+    A = np.sin(u) - np.sin(delta)
+    B = np.cos(u) - np.cos(delta) - 1
+    t1 = np.arctan2(eta * A - xi * B, xi * A + eta * B)
+    t2 = 2 * (np.cos(delta) - np.cos(v) - np.cos(u)) + 3
+    tau = np.where(t2 < 0, _mod2pi(t1 + np.pi), _mod2pi(t1))
+    omega = _mod2pi(tau - u + v - phi)
+    return tau, omega
+
+
+def _LpRupLumRm(x, y, phi):
+    # formula 8.7
+    xi = x + np.sin(phi)
+    eta = y - 1 - np.cos(phi)
+    rho = 0.25 * (2 + np.hypot(xi, eta))
+    u = np.arccos(np.minimum(rho, 1))
+    t, v = _tau_omega(u, -u, xi, eta, phi)
+    return (rho <= 1) & (t >= -ZERO) & (v <= ZERO), t, u, v
+
+
+def _LpRumLumRp(x, y, phi):
+    # formula 8.8
+    xi = x + np.sin(phi)
+    eta = y - 1 - np.cos(phi)
+    rho = (20 - xi * xi - eta * eta) / 16
+    u = -np.arccos(np.clip(rho, 0, 1))
+    t, v = _tau_omega(u, u, xi, eta, phi)
+    valid = (rho >= 0) & (rho <= 1) & (u >= -0.5 * np.pi)
+    return valid & (t >= -ZERO) & (v >= -ZERO), t, u, v
+
+
+def _LpRmSmLm(x, y, phi):
+    # formula 8.9
+    rho, theta = _polar(x - np.sin(phi), y - 1 + np.cos(phi))
+    r = np.sqrt(np.maximum(rho * rho - 4, 0))
+    u = 2 - r
+    t = _mod2pi(theta + np.arctan2(r, -2))
+    v = _mod2pi(phi - 0.5 * np.pi - t)
+    return (rho >= 2) & (t >= -ZERO) & (u <= ZERO) & (v <= ZERO), t, u, v
+
+
+def _LpRmSmRm(x, y, phi):
+    # formula 8.10
+    xi = x + np.sin(phi)
+    eta = y - 1 - np.cos(phi)
+    rho, theta = _polar(-eta, xi)
+    t = theta
+    u = 2 - rho
+    v = _mod2pi(t + 0.5 * np.pi - phi)
+    return (rho >= 2) & (t >= -ZERO) & (u <= ZERO) & (v <= ZERO), t, u, v
+
+
+def _LpRmSLmRp(x, y, phi):
+    # formula 8.11
+    xi = x + np.sin(phi)
+    eta = y - 1 - np.cos(phi)
+    rho, _ = _polar(xi, eta)
+    u = 4 - np.sqrt(np.maximum(rho * rho - 4, 0))
+    t = _mod2pi(np.arctan2((4 - u) * xi - 2 * eta, -2 * xi + (u - 4) * eta))
+    v = _mod2pi(t - phi)
+    valid = (rho >= 2) & (u <= ZERO)
+    return valid & (t >= -ZERO) & (v >= -ZERO), t, u, v
+
+
+H = 0.5 * np.pi
+
+# formula, word, reflected word, backward, segments(t, u, v)
+reeds_shepp_families = [
+    (_LpSpLp, 14, 15, False, lambda t, u, v: (t, u, v)),
+    (_LpSpRp, 12, 13, False, lambda t, u, v: (t, u, v)),
+    (_LpRmL, 0, 1, False, lambda t, u, v: (t, u, v)),
+    (_LpRmL, 0, 1, True, lambda t, u, v: (v, u, t)),
+    (_LpRupLumRm, 2, 3, False, lambda t, u, v: (t, u, -u, v)),
+    (_LpRumLumRp, 2, 3, False, lambda t, u, v: (t, u, u, v)),
+    (_LpRmSmLm, 4, 5, False, lambda t, u, v: (t, -H, u, v)),
+    (_LpRmSmRm, 8, 9, False, lambda t, u, v: (t, -H, u, v)),
+    (_LpRmSmLm, 6, 7, True, lambda t, u, v: (v, u, -H, t)),
+    (_LpRmSmRm, 10, 11, True, lambda t, u, v: (v, u, -H, t)),
+    (_LpRmSLmRp, 16, 17, False, lambda t, u, v: (t, -H, u, -H, v)),
+]
+
+
+@contract(start='array[3x3]')
+def reeds_shepp_paths(car, start, goals):
+    '''
+        Shortest paths, forward and in reverse, from the SE2 pose
+        start to each of the goals (an array (N, 3, 3), or a single
+        pose).
+    '''
+    x, y, phi = _relative(car, start, goals)
+    N = x.size
+    # the problems seen from the goal, for the backward versions
+    xb = x * np.cos(phi) + y * np.sin(phi)
+    yb = x * np.sin(phi) - y * np.cos(phi)
+    candidates = []
+    with np.errstate(invalid='ignore'):
+        for formula, word, reflected, backward, segments in \
+                reeds_shepp_families:
+            px, py = (xb, yb) if backward else (x, y)
+            # original, time-flipped, reflected, both
+            for sx, sy, sphi, w, sign in [(1, 1, 1, word, 1),
+                                          (-1, 1, -1, word, -1),
+                                          (1, -1, -1, reflected, 1),
+                                          (-1, -1, 1, reflected, -1)]:
+                valid, t, u, v = formula(sx * px, sy * py, sphi * phi)
+                columns = [sign * c for c in segments(t, u, v)]
+                candidates.append((w, valid, _segments(*columns)))
+    return _shortest(car, start, reeds_shepp_words, candidates, N)
@@ -0,0 +1,64 @@
+'''
+    Cache of integration steps for noise-free kinematics.
+'''
+from . import contract, np
+from collections import OrderedDict
+
+
+class StepCache(object):
+    '''
+        A bounded (least-recently-used) table of integration steps,
+        keyed by the commands and dt, for kinematics whose
+        velocity depends only on the commands.
+
+        Commands and dt are snapped to a grid of size *quantum*; the
+        cached step is computed at the grid point, so the result does
+        not depend on which of the nearby commands came first.
+
+        The cache is cleared when the parameters of the dynamics
+        change (see SimpleKinematics.__setattr__).
+    '''
+
+    @contract(maxsize='int,>0', quantum='>0')
+    def __init__(self, maxsize=1024, quantum=1e-9):
+        self.maxsize = maxsize
+        self.quantum = quantum
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __repr__(self):
+        return ('StepCache(size=%d/%d, hits=%d, misses=%d)' %
+                (len(self._entries), self.maxsize, self.hits, self.misses))
+
+    def __len__(self):
+        return len(self._entries)
+
+    def quantize(self, commands, dt):
+        '''
+            Returns a tuple (key, commands, dt), where commands and dt
+            have been snapped to the grid.
+        '''
+        q = np.round(np.asarray(commands, dtype='float64') / self.quantum)
+        qdt = round(dt / self.quantum)
+        key = (q.tobytes(), qdt)
+        return key, q * self.quantum, qdt * self.quantum
+
+    def get(self, key):
+        ''' Returns the cached value, or None. '''
+        value = self._entries.get(key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self._entries.move_to_end(key)
+        return value
+
+    def put(self, key, value):
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
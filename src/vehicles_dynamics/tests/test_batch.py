@@ -0,0 +1,52 @@
+from geometry import SE3
+from utils import all_dynamics, random_commands
+import unittest
+import numpy as np
+
+
+class BatchTest(unittest.TestCase):
+
+    def test_batch_matches_single(self):
+        np.random.seed(0)
+        dt = 0.1
+        N = 5
+        for dynamics in all_dynamics():
+            m = dynamics.get_commands_spec()['shape'][0]
+            commands = random_commands(dynamics, (N, m))
+            states = [dynamics.pose2state(SE3.unity()) for _ in range(N)]
+            # take two steps so that the velocities are not all zero
+            for _ in range(2):
+                poses = np.array([s[0] for s in states])
+                vels = np.array([s[1] for s in states])
+                poses2, vels2 = dynamics.integrate_batch(poses, vels,
+                                                         commands, dt)
+                states = [dynamics.integrate(s, c, dt)
+                          for s, c in zip(states, commands)]
+                for i in range(N):
+                    msg = '%s: vehicle %d' % (dynamics, i)
+                    np.testing.assert_allclose(poses2[i], states[i][0],
+                                               atol=1e-10, err_msg=msg)
+                    np.testing.assert_allclose(vels2[i], states[i][1],
+                                               atol=1e-10, err_msg=msg)
+
+    def test_joint_states_batch(self):
+        from vehicles_dynamics import CarWithWheels, Dynamics
+        car = CarWithWheels(max_linear_velocity=1, max_steering_angle=0.5,
+                            L=1, axis_dist=0.5)
+        np.random.seed(3)
+        for dynamics in all_dynamics() + [car]:
+            m = dynamics.get_commands_spec()['shape'][0]
+            states = []
+            state = dynamics.pose2state(SE3.unity())
+            for _ in range(4):
+                state = dynamics.integrate(state,
+                                           random_commands(dynamics, m), 0.5)
+                states.append(state)
+            expected = Dynamics.joint_states_batch(dynamics, states)
+            compact = np.array([dynamics.to_compact(s) for s in states])
+            for given in [states, compact]:
+                poses, vels = dynamics.joint_states_batch(given)
+                J = dynamics.num_joints()
+                self.assertEqual(poses.shape, (4, J, 4, 4))
+                np.testing.assert_allclose(poses, expected[0], atol=1e-12)
+                np.testing.assert_allclose(vels, expected[1], atol=1e-12)
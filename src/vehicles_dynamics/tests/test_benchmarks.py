@@ -0,0 +1,37 @@
+import json
+import unittest
+
+
+class BenchmarksTest(unittest.TestCase):
+
+    def test_run_and_compare(self):
+        from vehicles_dynamics.benchmarks import (run_benchmarks,
+                                                  compare_benchmarks)
+        names = ['CarWithWheels', 'SO3Force', 'DubinsCar']
+        results = run_benchmarks(names=names, min_time=0.001, sizes=[1, 10])
+        results = json.loads(json.dumps(results))
+        ops = set((r['dynamics'], r['noise'], r['operation'])
+                  for r in results['results'])
+        self.assertIn(('CarWithWheels', True, 'state_to_yaml'), ops)
+        self.assertIn(('SO3Force', False, 'integrate_batch'), ops)
+        # the commands of DubinsCar are discrete
+        self.assertIn(('DubinsCar', True, 'integrate_batch'), ops)
+        # no noise model for SO3Force; no batches for CarWithWheels
+        self.assertNotIn(('SO3Force', True, 'integrate'), ops)
+        self.assertNotIn(('CarWithWheels', False, 'integrate_batch'), ops)
+        for r in results['results']:
+            self.assertTrue(r['steps_per_second'] > 0)
+
+        comparison = compare_benchmarks(results, results)
+        self.assertEqual(len(comparison), len(results['results']))
+        self.assertFalse(any(c['regression'] for c in comparison))
+
+    def test_quaternions(self):
+        from vehicles_dynamics.benchmarks import run_benchmarks
+        ops = ['integrate_batch', 'integrate_quaternions']
+        results = run_benchmarks(names=['SE3Force'], min_time=0.001,
+                                 sizes=[1, 10], ops=ops)
+        measured = set((r['operation'], r['batch_size'])
+                       for r in results['results'])
+        self.assertEqual(measured, set((op, n) for op in ops
+                                       for n in [1, 10]))
@@ -0,0 +1,65 @@
+from geometry import SE3
+import unittest
+import numpy as np
+
+
+def dubins():
+    from vehicles_dynamics import DubinsCar
+    # commands: linear in {0, 1} ('D'), steering in [-1, 1] ('C')
+    return DubinsCar(max_linear_velocity=1, max_steering_angle=0.5, L=1,
+                     axis_dist=0.5)
+
+
+class CommandsCheckerTest(unittest.TestCase):
+
+    def test_invalid_commands(self):
+        from vehicles_dynamics import InvalidCommands
+        dynamics = dubins()
+        state = dynamics.pose2state(SE3.unity())
+        for commands in [[0.5, 0], [2, 0], [1, 1.5], [1, np.nan], [1, 0, 0]]:
+            self.assertRaises(InvalidCommands, dynamics.check_commands,
+                              np.array(commands))
+            self.assertRaises(InvalidCommands, dynamics.integrate, state,
+                              np.array(commands), 0.1)
+        good = np.array([[0, -1], [1, 1], [1, 0.3]])
+        self.assertIs(dynamics.check_commands(good), good)
+        # one bad row in a batch
+        bad = good.copy()
+        bad[2, 0] = -1
+        try:
+            dynamics.check_commands(bad)
+        except InvalidCommands as e:
+            self.assertIs(e.dynamics, dynamics)
+            self.assertIn('(2, 0)', str(e))
+        else:
+            self.fail()
+        poses = np.tile(state[0], (3, 1, 1))
+        vels = np.tile(state[1], (3, 1, 1))
+        self.assertRaises(InvalidCommands, dynamics.integrate_batch,
+                          poses, vels, bad, 0.1)
+        self.assertRaises(InvalidCommands, dynamics.rollout, state, bad, 0.1)
+
+    def test_modes(self):
+        from vehicles_dynamics import InvalidCommands
+        dynamics = dubins()
+        commands = np.array([[0.7, 2.0], [-3, -0.5], [0.2, 0.1]])
+        self.assertRaises(ValueError, dynamics.set_commands_mode, 'ignore')
+
+        dynamics.set_commands_mode('clip')
+        expected = np.array([[1, 1], [0, -0.5], [0, 0.1]])
+        self.assertTrue(np.all(dynamics.check_commands(commands) == expected))
+        self.assertRaises(InvalidCommands, dynamics.check_commands,
+                          np.array([1, np.nan]))
+
+        dynamics.set_commands_mode('round')
+        self.assertTrue(np.all(dynamics.check_commands(commands[2]) ==
+                               [0, 0.1]))
+        self.assertRaises(InvalidCommands, dynamics.check_commands, commands)
+
+        # the corrections are applied even without validation
+        dynamics.set_commands_mode('clip')
+        dynamics.set_validation_level('off')
+        state = dynamics.pose2state(SE3.unity())
+        poses, _ = dynamics.rollout(state, commands, 0.1)
+        expected_poses, _ = dubins().rollout(state, expected, 0.1)
+        self.assertTrue(np.allclose(poses, expected_poses))
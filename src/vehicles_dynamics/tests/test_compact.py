@@ -0,0 +1,38 @@
+from geometry import SE3
+from utils import all_dynamics, random_commands
+import unittest
+import numpy as np
+
+
+class CompactTest(unittest.TestCase):
+
+    def test_compact_states(self):
+        from vehicles_dynamics import CarWithWheels
+        car = CarWithWheels(max_linear_velocity=1, max_steering_angle=0.5,
+                            L=1, axis_dist=0.5)
+        np.random.seed(2)
+        for dynamics in all_dynamics() + [car]:
+            m = dynamics.get_commands_spec()['shape'][0]
+            commands = random_commands(dynamics, m)
+            state = dynamics.pose2state(SE3.unity())
+            state = dynamics.integrate(state, commands, 0.3)
+            x = dynamics.to_compact(state)
+            msg = str(dynamics)
+            self.assertEqual(x.shape, (dynamics.compact_size(),), msg)
+            # lossless
+            np.testing.assert_equal(dynamics.to_compact(
+                                        dynamics.from_compact(x)), x)
+            # the other methods accept compact states
+            x2 = dynamics.integrate(x, commands, 0.3)
+            state2 = dynamics.integrate(state, commands, 0.3)
+            np.testing.assert_equal(x2, dynamics.to_compact(state2))
+            self.assertEqual(dynamics.state_to_yaml(x),
+                             dynamics.state_to_yaml(state))
+            for a, b in zip(dynamics.joint_state(x),
+                            dynamics.joint_state(state)):
+                np.testing.assert_equal(a, b)
+        # SE2: [c, s, x, y] + (omega, vx, vy)
+        se2 = all_dynamics()[0]
+        self.assertEqual(se2.compact_size(), 7)
+        self.assertEqual(se2.pose2state(SE3.unity(), compact=True).tolist(),
+                         [1, 0, 0, 0, 0, 0, 0])
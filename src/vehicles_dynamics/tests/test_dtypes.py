@@ -0,0 +1,37 @@
+from geometry import SE3
+from utils import all_dynamics, random_commands
+import unittest
+import numpy as np
+
+
+class DtypeTest(unittest.TestCase):
+
+    def test_float32(self):
+        np.random.seed(0)
+        T = 1000
+        dt = 0.01
+        for d64, d32 in zip(all_dynamics(), all_dynamics('float32')):
+            m = d64.get_commands_spec()['shape'][0]
+            commands_seq = random_commands(d64, (T, m))
+            state64 = d64.pose2state(SE3.unity())
+            state32 = d32.pose2state(SE3.unity())
+            self.assertEqual(state32[0].dtype, np.float32)
+            poses64, vels64 = d64.rollout(state64, commands_seq, dt)
+            poses32, vels32 = d32.rollout(state32, commands_seq, dt)
+            self.assertEqual(poses32.dtype, np.float32)
+            self.assertEqual(vels32.dtype, np.float32)
+            # documented bound on the drift
+            self.assertLess(np.max(np.abs(poses64 - poses32)), 1e-4)
+            self.assertLess(np.max(np.abs(vels64 - vels32)), 1e-4)
+            # single and batch steps keep the dtype
+            pose2, vel2 = d32.integrate(state32, commands_seq[0], dt)
+            self.assertEqual(pose2.dtype, np.float32)
+            self.assertEqual(vel2.dtype, np.float32)
+            poses2, vels2 = d32.integrate_batch(poses32[:10], vels32[:10],
+                                                commands_seq[:10], dt)
+            self.assertEqual(poses2.dtype, np.float32)
+            self.assertEqual(vels2.dtype, np.float32)
+        from vehicles_dynamics import SimpleCar
+        self.assertRaises(ValueError, SimpleCar, max_linear_velocity=1,
+                          max_steering_angle=0.5, L=1, axis_dist=0.5,
+                          dtype='float16')
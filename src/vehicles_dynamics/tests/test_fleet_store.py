@@ -0,0 +1,105 @@
+from geometry import SE3
+from concurrent.futures import ProcessPoolExecutor
+import unittest
+import numpy as np
+
+
+def read_snapshots(name, num_reads):
+    '''
+        Reads the store many times, checking that each snapshot is
+        consistent; returns the number of distinct generations seen.
+    '''
+    from vehicles_dynamics import FleetStore
+    store = FleetStore.attach(name)
+    generations = set()
+    for i in range(num_reads):
+        snapshot = store.read()
+        if snapshot is None:
+            continue
+        # the writer puts the generation in all the entries
+        values = [snapshot.time, snapshot.states, snapshot.joint_poses]
+        for v in values:
+            assert np.all(np.asarray(v) == snapshot.generation), v
+        generations.add(snapshot.generation)
+    store.close()
+    return len(generations)
+
+
+class ConstantDynamics(object):
+    ''' Writes the same value everywhere, to check the consistency. '''
+
+    def __init__(self, num_joints):
+        self._num_joints = num_joints
+
+    def compact_size(self):
+        return 3
+
+    def num_joints(self):
+        return self._num_joints
+
+    def joint_states_batch(self, states):
+        shape = (states.shape[0], self._num_joints, 4, 4)
+        value = states[0, 0]
+        return np.full(shape, value), np.full(shape, value)
+
+
+class FleetStoreTest(unittest.TestCase):
+
+    def test_read_write(self):
+        from vehicles_dynamics import FleetStore, CarWithWheels
+        dynamics = CarWithWheels(max_linear_velocity=1,
+                                 max_steering_angle=0.5, L=1, axis_dist=0.5)
+        N = 4
+        states = [dynamics.pose2state(SE3.unity()) for _ in range(N)]
+        with FleetStore.create(dynamics, N) as store:
+            reader = FleetStore.attach(store.name, dynamics)
+            self.assertEqual(reader.num_joints, 3)
+            self.assertIsNone(reader.read())
+            commands = np.array([1, 0.5])
+            states = [dynamics.integrate(s, commands, 0.1) for s in states]
+            store.write(states, time=0.1)
+            snapshot = reader.read()
+            self.assertEqual(snapshot.generation, 1)
+            self.assertEqual(snapshot.time, 0.1)
+            poses, vels = dynamics.joint_states_batch(states)
+            np.testing.assert_equal(snapshot.joint_poses, poses)
+            np.testing.assert_equal(snapshot.joint_vels, vels)
+            for s1, s2 in zip(reader.states(snapshot), states):
+                np.testing.assert_equal(s1['car'][0], s2['car'][0])
+                self.assertEqual(s1['steering'], s2['steering'])
+            # a view is valid until its slot is written again
+            view = reader.view()
+            self.assertFalse(view.joint_poses.flags.writeable)
+            store.write(states, time=0.2)
+            self.assertTrue(view.valid())
+            self.assertEqual(reader.read().time, 0.2)
+            store.write(states, time=0.3)
+            self.assertFalse(view.valid())
+            self.assertTrue(snapshot.valid())
+            self.assertRaises(ValueError, store.write, states[:2])
+            compact = np.array([dynamics.to_compact(s) for s in states])
+            for bad in [compact[:, :-1], compact.astype('complex128')]:
+                self.assertRaises(ValueError, store.write, bad)
+            self.assertEqual(reader.read().time, 0.3)
+            # a writer that stopped while writing
+            store._header[6] += 1  # the sequence of slot 1 (write 3)
+            self.assertRaises(RuntimeError, reader.view, max_retries=10)
+            self.assertRaises(RuntimeError, reader.read, max_retries=10)
+            del view
+            reader.close()
+
+    def test_consistent_across_processes(self):
+        from vehicles_dynamics import FleetStore
+        N = 50
+        dynamics = ConstantDynamics(num_joints=2)
+        with FleetStore.create(dynamics, N) as store:
+            with ProcessPoolExecutor(max_workers=2) as executor:
+                futures = [executor.submit(read_snapshots, store.name, 2000)
+                           for _ in range(2)]
+                generation = 0
+                while not all(f.done() for f in futures):
+                    generation += 1
+                    store.write(np.full((N, 3), float(generation)),
+                                time=generation)
+                for f in futures:
+                    self.assertGreater(f.result(), 1)
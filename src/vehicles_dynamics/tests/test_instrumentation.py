@@ -0,0 +1,36 @@
+from geometry import SE3
+from utils import all_dynamics
+import unittest
+import numpy as np
+
+
+class InstrumentationTest(unittest.TestCase):
+
+    def test_profiling(self):
+        from vehicles_dynamics import (StageProfiler, enable_profiling,
+                                       disable_profiling)
+        car, dynamics = all_dynamics()[0], all_dynamics()[6]
+        profiler = StageProfiler()
+        car.set_profiler(profiler)
+        state = car.pose2state(SE3.unity())
+        for _ in range(3):
+            state = car.integrate(state, np.array([1, 0.5]), 0.1)
+        snapshot = profiler.snapshot()
+        for stage in ['check_commands', 'velocities', 'exponential',
+                      'composition', 'integrate']:
+            self.assertEqual(snapshot[stage]['count'], 3, stage)
+            self.assertEqual(snapshot[stage]['buckets'][-1][1], 3)
+        self.assertNotIn('noise', snapshot)
+        text = profiler.to_prometheus()
+        self.assertIn('vehicles_dynamics_stage_seconds_count'
+                      '{stage="integrate"} 3', text)
+        # globally
+        profiler = enable_profiling()
+        try:
+            state = dynamics.pose2state(SE3.unity())
+            dynamics.integrate(state, np.array([1, 0, 0]), 0.1)
+            self.assertEqual(profiler.snapshot()['forces']['count'], 1)
+        finally:
+            disable_profiling()
+        dynamics.integrate(state, np.array([1, 0, 0]), 0.1)
+        self.assertEqual(profiler.snapshot()['forces']['count'], 1)
@@ -0,0 +1,74 @@
+from geometry import SE3
+from utils import all_dynamics, random_commands
+import tracemalloc
+import unittest
+import numpy as np
+
+
+def peak_memory(f, steps=200, repeats=3):
+    '''
+        Returns the smallest (over some repetitions) peak of the
+        memory traced while calling f() *steps* times.
+    '''
+    peaks = []
+    for _ in range(repeats):
+        tracemalloc.start()
+        try:
+            base = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            for _ in range(steps):
+                f()
+            peaks.append(tracemalloc.get_traced_memory()[1] - base)
+        finally:
+            tracemalloc.stop()
+    return min(peaks)
+
+
+class IntegrateIntoTest(unittest.TestCase):
+
+    def test_matches_integrate(self):
+        from vehicles_dynamics import SE2Dynamics, SO3Force, SO3Vel
+        np.random.seed(0)
+        others = [
+            SE2Dynamics(max_linear_velocity=[1, 2], max_angular_velocity=1,
+                        noise_drift=[0.1] * 3, noise_mult=[0.1] * 3),
+            SO3Force(max_force=[1, 2, 3], mass=2, damping=0.1,
+                     integrator='rk4'),
+            SO3Vel(max_angular_velocity=[1, 2, 3], quaternions=True),
+        ]
+        for dynamics in all_dynamics() + all_dynamics('float32') + others:
+            m = dynamics.get_commands_spec()['shape'][0]
+            state = dynamics.pose2state(SE3.unity())
+            out = tuple(x.copy() for x in state)
+            x = dynamics.to_compact(state)
+            for t in range(10):
+                commands = random_commands(dynamics, m)
+                dynamics.seed_noise(t)
+                state = dynamics.integrate(state, commands, 0.1)
+                dynamics.seed_noise(t)
+                result = dynamics.integrate_into(out, commands, 0.1, out=out)
+                self.assertIs(result, out)
+                dynamics.seed_noise(t)
+                x2 = dynamics.integrate(x, commands, 0.1)
+                dynamics.seed_noise(t)
+                self.assertIs(dynamics.integrate_into(x, commands, 0.1, out=x),
+                              x)
+                np.testing.assert_allclose(x, x2)
+            atol = 1e-5 if dynamics.dtype == np.float32 else 1e-12
+            msg = '%s %s' % (dynamics, dynamics.dtype)
+            for a, b in zip(out, state):
+                self.assertEqual(a.dtype, dynamics.dtype)
+                np.testing.assert_allclose(a, b, atol=atol, err_msg=msg)
+
+    def test_no_allocations(self):
+        for dynamics in all_dynamics():
+            dynamics.set_validation_level('off')
+            m = dynamics.get_commands_spec()['shape'][0]
+            state = dynamics.pose2state(SE3.unity())
+            commands = random_commands(dynamics, m)
+            step = lambda: dynamics.integrate_into(state, commands, 0.01,
+                                                   out=state)
+            step()
+            # a few hundred bytes for the bookkeeping of tracemalloc;
+            # integrate() needs several kilobytes
+            self.assertLess(peak_memory(step), 1000, str(dynamics))
@@ -0,0 +1,71 @@
+from geometry import SE3
+import unittest
+import numpy as np
+
+
+class IntegratorsTest(unittest.TestCase):
+
+    def final_pose(self, integrator, dt, T=1.0, **params):
+        from vehicles_dynamics import SO3Force
+        dynamics = SO3Force(max_force=[1, 2, 3], mass=1, damping=0.3)
+        dynamics.set_integrator(integrator, **params)
+        pose, vel = dynamics.pose2state(SE3.unity())
+        vel = dynamics.pose_space.algebra.algebra_from_vector(
+                                        np.array([2, -1, 0.5]))
+        n = int(round(T / dt))
+        commands_seq = np.tile([0.5, -1, 1], (n, 1))
+        poses, _ = dynamics.rollout((pose, vel), commands_seq, dt)
+        return poses[-1]
+
+    def test_accuracy(self):
+        reference = self.final_pose('rk4', 0.0005)
+        error = lambda pose: np.max(np.abs(pose - reference))
+        midpoint = error(self.final_pose('midpoint', 0.1))
+        rk4 = error(self.final_pose('rk4', 0.1))
+        rk4_half = error(self.final_pose('rk4', 0.05))
+        adaptive = error(self.final_pose('adaptive', 0.5, tol=1e-10))
+        self.assertTrue(rk4 < midpoint / 100, (rk4, midpoint))
+        # fourth order
+        self.assertTrue(rk4 / rk4_half > 12, (rk4, rk4_half))
+        self.assertTrue(adaptive < 1e-8, adaptive)
+
+    def test_batch_and_single_agree(self):
+        from vehicles_dynamics import SO3Force
+        dynamics = SO3Force(max_force=[1, 2, 3], mass=1, damping=0.3,
+                            integrator='adaptive')
+        state = dynamics.pose2state(SE3.unity())
+        commands = np.array([0.5, -1, 1])
+        state = dynamics.integrate(state, commands, 0.3)
+        pose2, vel2 = dynamics.integrate(state, commands, 0.3)
+        poses2, vels2 = dynamics.integrate_batch(state[0][np.newaxis],
+                                                 state[1][np.newaxis],
+                                                 commands[np.newaxis], 0.3)
+        np.testing.assert_allclose(poses2[0], pose2, atol=1e-12)
+        np.testing.assert_allclose(vels2[0], vel2, atol=1e-12)
+
+    def test_exact(self):
+        from vehicles_dynamics import EuclideanForce, CircleForce, SO3Force
+        dynamics = EuclideanForce(ndim=2, max_force=[1, 2], mass=2,
+                                  damping=0.5)
+        self.assertEqual(repr(dynamics.get_integrator()), 'ExactIntegrator()')
+        self.assertRaises(ValueError, SO3Force, max_force=[1, 1, 1], mass=1,
+                          damping=0, integrator='exact')
+        # one long step is the same as many short ones
+        state = dynamics.pose2state(SE3.unity())
+        state = dynamics.integrate(state, np.array([1, -1]), 0.7)
+        commands = np.array([-0.5, 1])
+        pose, vel = dynamics.integrate(state, commands, 3.0)
+        poses, vels = dynamics.rollout(state, np.tile(commands, (300, 1)),
+                                       0.01)
+        np.testing.assert_allclose(poses[-1], pose, atol=1e-12)
+        np.testing.assert_allclose(vels[-1], vel, atol=1e-12)
+        # and agrees with a fine adaptive solution
+        dynamics.set_integrator('adaptive', tol=1e-12)
+        pose2, vel2 = dynamics.integrate(state, commands, 3.0)
+        np.testing.assert_allclose(pose2, pose, atol=1e-10)
+        # no damping: uniformly accelerated motion
+        circle = CircleForce(max_force=1, mass=2, damping=0)
+        pose, vel = circle.integrate(circle.pose2state(SE3.unity()),
+                                     np.array([1.0]), 2.0)
+        self.assertAlmostEqual(np.arctan2(pose[1, 0], pose[0, 0]), 1.0)
+        self.assertAlmostEqual(vel[1, 0], 1.0)
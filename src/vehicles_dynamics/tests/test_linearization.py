@@ -0,0 +1,70 @@
+from geometry import SE3
+from utils import all_dynamics, random_commands
+import unittest
+import numpy as np
+
+
+def numeric_jacobians(dynamics, pose, vel, commands, dt, eps=1e-6):
+    ''' Jacobians of integrate() by central differences. '''
+    from vehicles_dynamics import algebra_basis, vectors_from_algebra
+    algebra = dynamics.pose_space.get_algebra()
+    basis, _ = algebra_basis(algebra)
+    n = basis.shape[0]
+    m = commands.size
+    exp = dynamics._group_from_algebra
+    pose2, _ = dynamics.integrate((pose, vel), commands, dt)
+    inv = np.linalg.inv(pose2)
+    columns = []
+    for i in range(2 * n + m):
+        results = []
+        for sign in [+1, -1]:
+            p, v, c = pose, vel, commands.astype('float64')
+            if i < n:
+                p = np.dot(pose, exp(sign * eps * basis[i]))
+            elif i < 2 * n:
+                v = vel + sign * eps * basis[i - n]
+            else:
+                c = c.copy()
+                c[i - 2 * n] += sign * eps
+            # (not integrate(): c can be just out of the commands spec)
+            p2, v2 = dynamics._integrate((p, v), c, dt)
+            results.append(np.concatenate([
+                vectors_from_algebra(algebra, np.dot(inv, p2)),
+                vectors_from_algebra(algebra, v2)]))
+        columns.append((results[0] - results[1]) / (2 * eps))
+    J = np.array(columns).T
+    return J[:, :2 * n], J[:, 2 * n:]
+
+
+class LinearizationTest(unittest.TestCase):
+
+    def test_analytic_matches_numeric(self):
+        from vehicles_dynamics import SO3Force
+        np.random.seed(1)
+        rk4 = SO3Force(max_force=[1, 2, 3], mass=2, damping=0.1,
+                       integrator='rk4')
+        dt = 0.2
+        for dynamics in all_dynamics() + [rk4]:
+            m = dynamics.get_commands_spec()['shape'][0]
+            commands = random_commands(dynamics, m)
+            state = dynamics.pose2state(SE3.unity())
+            state = dynamics.integrate(state, random_commands(dynamics, m), 1)
+            A, B = dynamics.linearize(state, commands, dt)
+            A2, B2 = numeric_jacobians(dynamics, state[0], state[1],
+                                       commands, dt)
+            msg = str(dynamics)
+            np.testing.assert_allclose(A, A2, atol=1e-6, err_msg=msg)
+            np.testing.assert_allclose(B, B2, atol=1e-6, err_msg=msg)
+
+    def test_batch_along_trajectory(self):
+        dynamics = all_dynamics()[0]
+        commands_seq = np.random.uniform(-1, 1, (5, 2))
+        poses, vels = dynamics.rollout(dynamics.pose2state(SE3.unity()),
+                                       commands_seq, 0.1)
+        A, B = dynamics.linearize_batch(poses[:-1], vels[:-1], commands_seq,
+                                        0.1)
+        self.assertEqual(A.shape, (5, 6, 6))
+        self.assertEqual(B.shape, (5, 6, 2))
+        A3, B3 = dynamics.linearize((poses[3], vels[3]), commands_seq[3], 0.1)
+        np.testing.assert_allclose(A[3], A3)
+        np.testing.assert_allclose(B[3], B3)
@@ -0,0 +1,58 @@
+from geometry import SE3
+import unittest
+import numpy as np
+
+
+class MonteCarloTest(unittest.TestCase):
+
+    def test_parallel_matches_serial(self):
+        from vehicles_dynamics import SE2Dynamics, simulate_particles
+        dynamics = SE2Dynamics(max_linear_velocity=[1, 1],
+                               max_angular_velocity=1,
+                               noise_drift=[0.01, 0.01, 0.01],
+                               noise_mult=[0.1, 0.1, 0.1])
+        state = dynamics.pose2state(SE3.unity())
+        commands_seq = np.tile([1, 0, 0.3], (20, 1))
+        args = (dynamics, state, commands_seq, 0.1, 250)
+        serial = simulate_particles(*args, seed=4, shard_size=64,
+                                    num_workers=0)
+        parallel = simulate_particles(*args, seed=4, shard_size=64,
+                                      num_workers=2)
+        self.assertEqual(serial[0].shape, (250, 21, 3, 3))
+        np.testing.assert_equal(serial[1], parallel[1])
+        np.testing.assert_allclose(serial[0], parallel[0], atol=1e-12)
+        # the particles spread out
+        final_xy = serial[0][:, -1, :2, 2]
+        self.assertTrue(np.all(final_xy.std(axis=0) > 0))
+        # another seed gives another ensemble
+        other = simulate_particles(*args, seed=5, shard_size=64,
+                                   num_workers=0)
+        self.assertFalse(np.allclose(serial[1], other[1]))
+
+    def test_float32(self):
+        from vehicles_dynamics import SE2Dynamics, simulate_particles
+        dynamics = SE2Dynamics(max_linear_velocity=[1, 1],
+                               max_angular_velocity=1,
+                               noise_drift=[0.01, 0.01, 0.01],
+                               dtype='float32')
+        state = dynamics.pose2state(SE3.unity())
+        commands_seq = np.tile([1, 0, 0.3], (5, 1))
+        args = (dynamics, state, commands_seq, 0.1, 20)
+        serial = simulate_particles(*args, seed=1, num_workers=0)
+        parallel = simulate_particles(*args, seed=1, num_workers=1)
+        for a, b in zip(serial, parallel):
+            self.assertEqual(a.dtype, np.float32)
+            self.assertEqual(b.dtype, np.float32)
+            np.testing.assert_allclose(a, b, atol=1e-6)
+
+    def test_car_with_wheels(self):
+        from vehicles_dynamics import CarWithWheels, simulate_particles
+        dynamics = CarWithWheels(max_linear_velocity=1, max_steering_angle=0.5,
+                                 L=1, axis_dist=0.5)
+        state = dynamics.pose2state(SE3.unity())
+        commands_seq = np.tile([1, 0.3], (4, 1))
+        poses, vels, steering = simulate_particles(dynamics, state,
+                                                   commands_seq, 0.1, 3,
+                                                   num_workers=0)
+        self.assertEqual(poses.shape, (3, 5, 3, 3))
+        np.testing.assert_allclose(steering[:, 1:], 0.15)
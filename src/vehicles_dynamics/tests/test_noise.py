@@ -0,0 +1,29 @@
+from geometry import SE3
+import unittest
+import numpy as np
+
+
+class NoiseTest(unittest.TestCase):
+
+    def test_noise_streams(self):
+        from vehicles_dynamics import NoiseStream, SE2Dynamics
+        a = NoiseStream(seed=5, block_size=4)
+        b = NoiseStream(seed=5, block_size=100)
+        x = np.concatenate([a.standard_normal(3), a.standard_normal((2, 5)).flat,
+                            a.standard_normal(7)])
+        np.testing.assert_equal(x, b.standard_normal(20))
+        s1, s2 = NoiseStream(seed=5).spawn(2)
+        self.assertFalse(np.allclose(s1.standard_normal(5),
+                                     s2.standard_normal(5)))
+
+        dynamics = SE2Dynamics(max_linear_velocity=[1, 1],
+                               max_angular_velocity=1,
+                               noise_drift=[0.1, 0.1, 0.1])
+        self.assertFalse(dynamics.is_noiseless())
+        state = dynamics.pose2state(SE3.unity())
+        commands_seq = np.zeros((10, 3))
+        dynamics.seed_noise(1)
+        run1 = dynamics.rollout(state, commands_seq, 0.1)
+        dynamics.seed_noise(1)
+        run2 = dynamics.rollout(state, commands_seq, 0.1)
+        np.testing.assert_equal(run1[0], run2[0])
@@ -0,0 +1,86 @@
+from geometry import SE3
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+
+
+class PrimitivesTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_generate(self):
+        from vehicles_dynamics import (DubinsCar, commands_grid,
+            generate_primitives)
+        car = DubinsCar(max_linear_velocity=2, max_steering_angle=0.5, L=1,
+                        axis_dist=0.5)
+        commands = commands_grid(car, 5)
+        # linear in {0, 1}, 5 steering values
+        self.assertEqual(commands.shape, (10, 2))
+        durations = [0.5, 1.5]
+        primitives = generate_primitives(car, commands, durations, samples=4)
+        self.assertEqual(len(primitives), 20)
+        self.assertEqual(primitives.samples.shape, (20, 5, 3, 3))
+        for i in [3, 17]:
+            duration = primitives.durations[i]
+            self.assertEqual(duration, durations[i // 10])
+            self.assertTrue(np.all(primitives.commands[i] ==
+                                   commands[i % 10]))
+            state = car.pose2state(SE3.unity())
+            poses, _ = car.rollout(state, primitives.commands[i:i + 1].repeat(
+                                   4, axis=0), duration / 4)
+            self.assertTrue(np.allclose(primitives.samples[i], poses,
+                                        atol=1e-12))
+            self.assertAlmostEqual(primitives.costs[i],
+                                   2 * primitives.commands[i, 0] * duration)
+
+    def test_cache(self):
+        from vehicles_dynamics import (SimpleCar, ReedsSheepCar,
+            commands_grid, load_primitives)
+        params = dict(max_linear_velocity=1, max_steering_angle=0.5, L=1,
+                      axis_dist=0.5)
+        car = ReedsSheepCar(**params)
+        commands = commands_grid(car, 3)
+        p1 = load_primitives(car, commands, [1.0], cache_dir=self.tmpdir)
+        files = os.listdir(self.tmpdir)
+        self.assertEqual(files, ['%s.npz' % p1.key])
+        p2 = load_primitives(car, commands, [1.0], cache_dir=self.tmpdir)
+        self.assertTrue(np.all(p1.samples == p2.samples))
+        self.assertTrue(np.all(p1.costs == p2.costs))
+        # any change gives a new entry
+        others = [(ReedsSheepCar(**dict(params, L=2)), commands, [1.0]),
+                  (SimpleCar(**params), commands, [1.0]),
+                  (car, commands, [2.0]),
+                  (car, commands[:-1], [1.0])]
+        keys = set([p1.key])
+        for dynamics, c, durations in others:
+            p = load_primitives(dynamics, c, durations, cache_dir=self.tmpdir)
+            keys.add(p.key)
+        self.assertEqual(len(keys), 5)
+        self.assertEqual(len(os.listdir(self.tmpdir)), 5)
+        # a damaged file is regenerated
+        filename = os.path.join(self.tmpdir, '%s.npz' % p1.key)
+        with open(filename, 'wb') as f:
+            f.write(b'garbage')
+        p3 = load_primitives(car, commands, [1.0], cache_dir=self.tmpdir)
+        self.assertTrue(np.all(p1.samples == p3.samples))
+
+    def test_key_of_checked_commands(self):
+        from vehicles_dynamics import SimpleCar, primitives_key
+        car = SimpleCar(max_linear_velocity=1, max_steering_angle=0.5, L=1,
+                        axis_dist=0.5)
+        commands = np.array([[1, 0], [1, 0.5]])
+        outside = np.array([[1, 0], [1, 2.0]])
+        key = primitives_key(car, commands, np.array([1.0]), 10)
+        car.set_commands_mode('clip')
+        key_clip = primitives_key(car, commands, np.array([1.0]), 10)
+        self.assertNotEqual(key, key_clip)
+        # the same library, once the commands are clipped
+        self.assertEqual(primitives_key(car, outside, np.array([1.0]), 10),
+                         primitives_key(car, [[1, 0], [1, 1]],
+                                        np.array([1.0]), 10))
@@ -0,0 +1,90 @@
+import os
+import subprocess
+import sys
+import unittest
+
+
+class RegistryTest(unittest.TestCase):
+
+    def test_create_dynamics(self):
+        from vehicles_dynamics import (create_dynamics, registered_dynamics,
+                                       register_dynamics, DifferentialDrive)
+        dynamics = create_dynamics('DifferentialDrive',
+                                   max_linear_velocity=1,
+                                   max_angular_velocity=1)
+        self.assertIsInstance(dynamics, DifferentialDrive)
+        self.assertIn('SO3Force', registered_dynamics())
+        self.assertRaises(ValueError, create_dynamics, 'NotADynamics')
+        register_dynamics('MyDrive', DifferentialDrive)
+        self.assertIsInstance(create_dynamics('MyDrive',
+                                              max_linear_velocity=1,
+                                              max_angular_velocity=1),
+                              DifferentialDrive)
+
+    def test_builtin_names(self):
+        import vehicles_dynamics
+        from vehicles_dynamics import (register_dynamics, create_dynamics,
+                                       builtin_dynamics, SimpleCar)
+        factory = lambda **params: 'replaced'
+        self.assertRaises(ValueError, register_dynamics, 'SimpleCar',
+                          factory)
+        register_dynamics('SimpleCar', factory, overwrite=True)
+        try:
+            self.assertEqual(create_dynamics('SimpleCar'), 'replaced')
+            # the classes of the package do not change
+            vehicles_dynamics.__dict__.pop('SimpleCar', None)
+            self.assertIs(vehicles_dynamics.SimpleCar, SimpleCar)
+            from vehicles_dynamics.specializations import SimpleCar as car
+            self.assertIs(car, SimpleCar)
+        finally:
+            register_dynamics('SimpleCar', builtin_dynamics['SimpleCar'],
+                              overwrite=True)
+
+    def test_lazy_import(self):
+        # in a fresh interpreter, only the requested module is imported
+        code = ('import sys, vehicles_dynamics as vd\n'
+                'prefix = "vehicles_dynamics.specializations."\n'
+                'before = [m for m in sys.modules if m.startswith(prefix)]\n'
+                'vd.create_dynamics("SE2Forward", linear_velocity=1,\n'
+                '                   max_angular_velocity=1)\n'
+                'after = [m for m in sys.modules if m.startswith(prefix)]\n'
+                'print(len(before), sorted(after))\n')
+        import vehicles_dynamics
+        src = os.path.dirname(os.path.dirname(vehicles_dynamics.__file__))
+        env = dict(os.environ, PYTHONPATH=src)
+        output = subprocess.check_output([sys.executable, '-c', code],
+                                         env=env, universal_newlines=True)
+        self.assertEqual(output.strip(),
+                         "0 ['vehicles_dynamics.specializations.se2forward']")
+
+    def test_lazy_tools(self):
+        # the tools are imported on first use too
+        code = ('import sys, vehicles_dynamics as vd\n'
+                'tools = ["montecarlo", "fleet_store", "service",\n'
+                '         "trajectory_log", "primitives", "steering"]\n'
+                'names = ["vehicles_dynamics." + t for t in tools]\n'
+                'print([n for n in names if n in sys.modules])\n'
+                'vd.create_dynamics("DubinsCar", max_linear_velocity=1,\n'
+                '                   max_steering_angle=0.5, L=1,\n'
+                '                   axis_dist=0.5)\n'
+                'print([n for n in names if n in sys.modules])\n'
+                'vd.FleetStore\n'
+                'print([n for n in names if n in sys.modules])\n')
+        import vehicles_dynamics
+        src = os.path.dirname(os.path.dirname(vehicles_dynamics.__file__))
+        env = dict(os.environ, PYTHONPATH=src)
+        output = subprocess.check_output([sys.executable, '-c', code],
+                                         env=env, universal_newlines=True)
+        self.assertEqual(output.split('\n')[:3],
+                         ["[]", "[]", "['vehicles_dynamics.fleet_store']"])
+        self.assertIn('simulate_particles', dir(vehicles_dynamics))
+
+    def test_star_import(self):
+        namespace = {}
+        exec('from vehicles_dynamics import *', namespace)
+        for name in ['DubinsCar', 'SE2Dynamics', 'CarWithWheels',
+                     'simulate_particles', 'FleetStore', 'Dynamics',
+                     'create_dynamics']:
+            self.assertIn(name, namespace)
+        from vehicles_dynamics import DubinsCar
+        self.assertIs(namespace['DubinsCar'], DubinsCar)
@@ -0,0 +1,55 @@
+from geometry import SE3
+from utils import all_dynamics, random_commands
+import unittest
+import numpy as np
+
+
+class RolloutTest(unittest.TestCase):
+
+    def test_rollout_matches_integrate(self):
+        from vehicles_dynamics import Dynamics, SE2Dynamics
+        noisy = SE2Dynamics(max_linear_velocity=[1, 2], max_angular_velocity=1,
+                            noise_drift=[0.1, 0.1, 0.1],
+                            noise_mult=[0.2, 0.2, 0.2])
+        dt = 0.1
+        T = 7
+        for dynamics in all_dynamics() + [noisy]:
+            m = dynamics.get_commands_spec()['shape'][0]
+            commands_seq = random_commands(dynamics, (T, m))
+            state = dynamics.pose2state(SE3.unity())
+            dynamics.seed_noise(3)
+            poses, vels = dynamics.rollout(state, commands_seq, dt)
+            dynamics.seed_noise(3)
+            generic = Dynamics.rollout(dynamics, state, commands_seq, dt)
+            self.assertEqual(poses.shape, (T + 1,) + state[0].shape)
+            self.assertEqual(vels.shape, (T + 1,) + state[1].shape)
+            msg = '%s' % dynamics
+            np.testing.assert_allclose(poses, generic[0], atol=1e-10,
+                                       err_msg=msg)
+            np.testing.assert_allclose(vels, generic[1], atol=1e-10,
+                                       err_msg=msg)
+
+    def test_car_with_wheels(self):
+        from vehicles_dynamics import CarWithWheels
+        dynamics = CarWithWheels(max_linear_velocity=1, max_steering_angle=0.5,
+                                 L=1, axis_dist=0.5)
+        np.random.seed(1)
+        T = 6
+        commands_seq = random_commands(dynamics, (T, 2))
+        state = dynamics.integrate(dynamics.pose2state(SE3.unity()),
+                                   np.array([1, 0.3]), 0.1)
+        poses, vels, steering = dynamics.rollout(state, commands_seq, 0.1)
+        self.assertEqual(steering.shape, (T + 1,))
+        # the same states as integrate(), from which one can restart
+        for t in range(T + 1):
+            np.testing.assert_allclose(poses[t], state['car'][0], atol=1e-12)
+            np.testing.assert_allclose(vels[t], state['car'][1], atol=1e-12)
+            self.assertAlmostEqual(steering[t], state['steering'])
+            if t < T:
+                state = dynamics.integrate(state, commands_seq[t], 0.1)
+        restart = dynamics.compose_state(car_state=(poses[2], vels[2]),
+                                         steering=steering[2])
+        rest = dynamics.rollout(dynamics.to_compact(restart),
+                                commands_seq[2:], 0.1)
+        for a, b in zip(rest, (poses, vels, steering)):
+            np.testing.assert_allclose(a, b[2:], atol=1e-12)
@@ -0,0 +1,61 @@
+from geometry import SE3, SO3
+import unittest
+import numpy as np
+from utils import random_commands
+
+
+def se3_dynamics():
+    from vehicles_dynamics import SE3Vel, SE3Force
+    return [
+        SE3Vel(max_angular_velocity=[1, 2, 3],
+               max_linear_velocity=[1, 1, 2]),
+        SE3Force(max_force=[1, 2, 3, 1, 1, 2], mass=2, damping=0.1),
+        SE3Force(max_force=[1, 2, 3, 1, 1, 2], mass=2, damping=0.1,
+                 integrator='rk4'),
+    ]
+
+
+class SE3Test(unittest.TestCase):
+
+    def test_quaternion_conversions(self):
+        from vehicles_dynamics import (quaternion_from_rotation,
+            rotation_from_quaternion, quaternion_exp)
+        np.random.seed(1)
+        R = np.array([SO3.sample_uniform() for _ in range(50)] +
+                     [np.eye(3), np.diag([1, -1, -1]), np.diag([-1, 1, -1]),
+                      np.diag([-1, -1, 1])])
+        q = quaternion_from_rotation(R)
+        np.testing.assert_allclose(np.linalg.norm(q, axis=1), 1, atol=1e-12)
+        self.assertTrue(np.all(q[:, 0] >= 0))
+        np.testing.assert_allclose(rotation_from_quaternion(q), R,
+                                   atol=1e-12)
+        w = np.random.uniform(-3, 3, (20, 3))
+        w[0] = 0
+        w[1] = [1e-9, 0, -1e-9]
+        q = quaternion_exp(w)
+        for wi, qi in zip(w, q):
+            R = SO3.group_from_algebra(SO3.algebra.algebra_from_vector(wi))
+            np.testing.assert_allclose(rotation_from_quaternion(qi), R,
+                                       atol=1e-8)
+
+    def test_quaternions_match_matrices(self):
+        np.random.seed(0)
+        N = 6
+        dt = 0.1
+        for dynamics in se3_dynamics():
+            poses = np.array([SE3.sample_uniform() for _ in range(N)])
+            vels = np.zeros((N, 4, 4))
+            q, p, twists = dynamics.quaternion_states(poses, vels)
+            for _ in range(5):
+                commands = random_commands(dynamics, (N, 6))
+                poses, vels = dynamics.integrate_batch(poses, vels,
+                                                       commands, dt)
+                q, p, twists = dynamics.integrate_quaternions(q, p, twists,
+                                                              commands, dt)
+            poses2, vels2 = dynamics.matrix_states(q, p, twists)
+            msg = str(dynamics)
+            np.testing.assert_allclose(poses2, poses, atol=1e-10,
+                                       err_msg=msg)
+            np.testing.assert_allclose(vels2, vels, atol=1e-10, err_msg=msg)
+            for pose in poses2:
+                SE3.belongs(pose)
@@ -0,0 +1,121 @@
+from geometry import SE3
+import asyncio
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+
+
+def make_service():
+    from vehicles_dynamics import SimpleCar
+    from vehicles_dynamics.service import SimulationService
+    dynamics = SimpleCar(max_linear_velocity=1, max_steering_angle=0.5, L=1,
+                         axis_dist=0.5)
+    service = SimulationService(max_delay=0.01)
+    service.add_dynamics('car', dynamics)
+    return service, dynamics
+
+
+class ServiceTest(unittest.TestCase):
+
+    def test_in_process(self):
+        service, dynamics = make_service()
+        state = dynamics.pose2state(SE3.unity())
+        np.random.seed(0)
+        commands = np.random.uniform(-1, 1, (50, 2))
+
+        async def clients():
+            requests = [service.step('car', state, c, 0.1) for c in commands]
+            # compact states work too, and one bad request fails alone
+            requests.append(service.step('car', dynamics.to_compact(state),
+                                         commands[0], 0.1))
+            requests.append(service.step('car', np.zeros(3), [1, 0], 0.1))
+            return await asyncio.gather(*requests, return_exceptions=True)
+
+        results = asyncio.run(clients())
+        for c, (pose2, vel2) in zip(commands, results[:50]):
+            expected = dynamics.integrate(state, c, 0.1)
+            np.testing.assert_allclose(pose2, expected[0], atol=1e-12)
+        np.testing.assert_allclose(results[50],
+                                   dynamics.to_compact(results[0]),
+                                   atol=1e-12)
+        self.assertIsInstance(results[51], Exception)
+        self.assertEqual(service.num_batches, 1)
+
+    def test_unix_socket(self):
+        from vehicles_dynamics.service import ServiceClient
+        service, dynamics = make_service()
+        x = dynamics.pose2state(SE3.unity(), compact=True)
+        tmpdir = tempfile.mkdtemp()
+        path = os.path.join(tmpdir, 'service.sock')
+
+        async def session():
+            server = await service.serve_unix(path)
+            clients = [await ServiceClient.connect_unix(path)
+                       for _ in range(3)]
+            requests = [client.step('car', x, [1, 0.5], 0.1)
+                        for client in clients for _ in range(10)]
+            results = await asyncio.gather(*requests)
+            try:
+                await clients[0].step('plane', x, [1, 0.5], 0.1)
+            except ValueError as e:
+                error = e
+            for client in clients:
+                await client.close()
+            server.close()
+            await server.wait_closed()
+            return results, error
+
+        try:
+            results, error = asyncio.run(session())
+        finally:
+            shutil.rmtree(tmpdir)
+        expected = dynamics.integrate(x, np.array([1, 0.5]), 0.1)
+        for x2 in results:
+            np.testing.assert_allclose(x2, expected, atol=1e-12)
+        self.assertIn('Unknown dynamics', str(error))
+        self.assertTrue(service.num_batches < len(results))
+
+    def test_many_requests(self):
+        # a client that writes many requests before reading the answers
+        import json
+        service, dynamics = make_service()
+        service.max_batch = 4
+        service.max_delay = 0
+        x = dynamics.pose2state(SE3.unity(), compact=True).tolist()
+        # (padded, so that the requests fill the socket buffers)
+        request = dict(id=0, dynamics='car', state=x, commands=[1, 0.5],
+                       dt=0.1, padding=' ' * 10000)
+        line = (json.dumps(request) + '\n').encode('utf-8')
+        N = 500
+        tmpdir = tempfile.mkdtemp()
+        path = os.path.join(tmpdir, 'service.sock')
+
+        async def session():
+            server = await service.serve_unix(path)
+            reader, writer = await asyncio.open_unix_connection(path)
+
+            async def send():
+                for _ in range(N):
+                    writer.write(line)
+                    await writer.drain()
+
+            sending = asyncio.ensure_future(send())
+            await asyncio.sleep(0.2)
+            # the server stopped reading, waiting for us
+            self.assertFalse(sending.done())
+            answers = [json.loads(await reader.readline())
+                       for _ in range(N)]
+            await sending
+            writer.close()
+            server.close()
+            await server.wait_closed()
+            return answers
+
+        try:
+            answers = asyncio.run(session())
+        finally:
+            shutil.rmtree(tmpdir)
+        self.assertEqual(len(answers), N)
+        self.assertFalse(any('error' in a for a in answers))
@@ -0,0 +1,94 @@
+from geometry import SE3
+from utils import random_commands
+import unittest
+import numpy as np
+
+
+def so3_pairs():
+    ''' Pairs of SO3 dynamics, in the matrix and in the quaternion form. '''
+    from vehicles_dynamics import SO3Vel, SO3Force
+    pairs = []
+    for quaternions in [False, True]:
+        pairs.append([
+            SO3Vel(max_angular_velocity=[1, 2, 3], quaternions=quaternions),
+            SO3Force(max_force=[1, 2, 3], mass=2, damping=0.1,
+                     quaternions=quaternions),
+            SO3Force(max_force=[1, 2, 3], mass=2, damping=0.1,
+                     integrator='rk4', quaternions=quaternions),
+        ])
+    return zip(*pairs)
+
+
+class SO3QuaternionsTest(unittest.TestCase):
+
+    def test_quaternions_match_matrices(self):
+        np.random.seed(0)
+        dt = 0.1
+        T = 20
+        N = 4
+        for matrix, quaternion in so3_pairs():
+            msg = str(quaternion)
+            pose = SE3.sample_uniform()
+            state = quaternion.pose2state(pose)
+            self.assertEqual(state[0].shape, (4,))
+            self.assertEqual(state[1].shape, (3,))
+            self.assertEqual(quaternion.pose2state(pose, compact=True).shape,
+                             (7,))
+            commands_seq = random_commands(matrix, (T, 3))
+            poses, vels = matrix.rollout(matrix.pose2state(pose),
+                                         commands_seq, dt)
+            q, w = quaternion.rollout(state, commands_seq, dt)
+            self.assertEqual(q.shape, (T + 1, 4))
+            joint_poses, joint_vels = quaternion.joint_states_arrays(q, w)
+            expected = matrix.joint_states_arrays(poses, vels)
+            np.testing.assert_allclose(joint_poses, expected[0], atol=1e-10,
+                                       err_msg=msg)
+            np.testing.assert_allclose(joint_vels, expected[1], atol=1e-10,
+                                       err_msg=msg)
+            # integrate() and joint_state(), also in the compact form
+            x = quaternion.to_compact(state)
+            for commands in commands_seq:
+                state = quaternion.integrate(state, commands, dt)
+                x = quaternion.integrate(x, commands, dt)
+            np.testing.assert_allclose(quaternion.joint_state(state)[0],
+                                       expected[0][-1, 0], atol=1e-10)
+            np.testing.assert_allclose(quaternion.joint_state(x)[0],
+                                       expected[0][-1, 0], atol=1e-10)
+            # batch
+            commands = random_commands(matrix, (N, 3))
+            poses2, vels2 = matrix.integrate_batch(poses[-N:], vels[-N:],
+                                                   commands, dt)
+            q2, w2 = quaternion.integrate_batch(q[-N:], w[-N:], commands, dt)
+            poses3, vels3 = quaternion.matrix_states(q2, w2)
+            np.testing.assert_allclose(poses3, poses2, atol=1e-10,
+                                       err_msg=msg)
+            np.testing.assert_allclose(vels3, vels2, atol=1e-10, err_msg=msg)
+
+    def test_no_drift(self):
+        from vehicles_dynamics import SO3Vel
+        dynamics = SO3Vel(max_angular_velocity=[1, 2, 3], quaternions=True)
+        dynamics.set_validation_level('off')
+        state = dynamics.pose2state(SE3.unity())
+        commands = np.array([0.3, -0.7, 0.9])
+        for _ in range(2000):
+            state = dynamics.integrate(state, commands, 0.01)
+        self.assertAlmostEqual(np.linalg.norm(state[0]), 1, places=14)
+        R = dynamics.joint_state(state)[0][:3, :3]
+        np.testing.assert_allclose(np.dot(R.T, R), np.eye(3), atol=1e-14)
+
+    def test_compact_both_forms(self):
+        np.random.seed(2)
+        for matrix, quaternion in so3_pairs():
+            state = matrix.integrate(matrix.pose2state(SE3.unity()),
+                                     random_commands(matrix, 3), 0.5)
+            forms = [state, quaternion.quaternion_state(state)]
+            for dynamics in [matrix, quaternion]:
+                for given in forms:
+                    msg = '%s %s' % (dynamics, len(given[0]))
+                    x = dynamics.to_compact(given)
+                    self.assertEqual(x.shape, (dynamics.compact_size(),), msg)
+                    np.testing.assert_equal(
+                        dynamics.to_compact(dynamics.from_compact(x)), x)
+                    for a, b in zip(dynamics.matrix_state(x), state):
+                        np.testing.assert_allclose(a, b, atol=1e-12,
+                                                   err_msg=msg)
@@ -0,0 +1,62 @@
+from geometry import SE2_from_translation_angle
+import unittest
+import numpy as np
+
+params = dict(max_linear_velocity=2, max_steering_angle=0.5, L=1,
+              axis_dist=0.5)
+
+
+def random_poses(N):
+    return np.array([SE2_from_translation_angle(np.random.uniform(-5, 5, 2),
+                                                np.random.uniform(-3, 3))
+                     for _ in range(N)])
+
+
+class SteeringTest(unittest.TestCase):
+
+    def test_paths_reach_the_goals(self):
+        from vehicles_dynamics import DubinsCar, ReedsSheepCar
+        np.random.seed(0)
+        start = SE2_from_translation_angle([1, 2], 0.3)
+        goals = random_poses(300)
+        for car in [DubinsCar(**params), ReedsSheepCar(**params)]:
+            paths = car.steering_paths(start, goals)
+            self.assertEqual(len(paths), 300)
+            samples = paths.sample(20)
+            self.assertTrue(np.allclose(samples[:, 0], start, atol=1e-12))
+            self.assertTrue(np.allclose(samples[:, -1], goals, atol=1e-9))
+            # following the commands with integrate()
+            for i in range(0, 300, 37):
+                state = (start, np.zeros((3, 3)))
+                for commands, duration in paths.commands(i):
+                    state = car.integrate(state, commands, duration)
+                self.assertTrue(np.allclose(state[0], goals[i], atol=1e-9))
+            # the samples are equally spaced
+            steps = np.linalg.norm(np.diff(samples[:, :, :2, 2], axis=1),
+                                   axis=2)
+            self.assertTrue(np.all(steps <= paths.lengths[:, np.newaxis] / 19
+                                   + 1e-9))
+
+    def test_lengths(self):
+        from vehicles_dynamics import (DubinsCar, ReedsSheepCar, dubins_paths,
+            reeds_shepp_paths, turning_radius)
+        np.random.seed(1)
+        car = DubinsCar(**params)
+        R = turning_radius(car)
+        start = np.eye(3)
+        goals = random_poses(200)
+        dubins = dubins_paths(car, start, goals)
+        reeds_shepp = reeds_shepp_paths(ReedsSheepCar(**params), start, goals)
+        self.assertTrue(np.all(dubins.segments >= 0))
+        self.assertTrue(np.all(reeds_shepp.lengths <= dubins.lengths + 1e-9))
+        # straight ahead, and straight back
+        ahead = SE2_from_translation_angle([3, 0], 0)
+        back = SE2_from_translation_angle([-3, 0], 0)
+        self.assertAlmostEqual(dubins_paths(car, start, ahead).lengths[0], 3)
+        rs = reeds_shepp_paths(car, start, back)
+        self.assertAlmostEqual(rs.lengths[0], 3)
+        self.assertEqual(rs.word(0), 'S-')
+        # a half turn, to the left
+        turn = SE2_from_translation_angle([0, 2 * R], np.pi)
+        self.assertAlmostEqual(dubins_paths(car, start, turn).lengths[0],
+                               np.pi * R)
@@ -0,0 +1,68 @@
+from geometry import SE3
+import unittest
+import numpy as np
+
+
+class StepCacheTest(unittest.TestCase):
+
+    def test_step_cache(self):
+        from vehicles_dynamics import DubinsCar
+        cached = DubinsCar(max_linear_velocity=1, max_steering_angle=0.5,
+                           L=1, axis_dist=0.5)
+        plain = DubinsCar(max_linear_velocity=1, max_steering_angle=0.5,
+                          L=1, axis_dist=0.5)
+        cache = cached.enable_step_cache(maxsize=4)
+        cached.precompute_steps(np.array([[1, 0], [1, 1]]), 0.1)
+        commands_seq = np.array([[1, 0], [1, 1], [1, -1], [1, 0], [0, 0]] * 3)
+        s1 = s2 = plain.pose2state(SE3.unity())
+        for commands in commands_seq:
+            s1 = cached.integrate(s1, commands, 0.1)
+            s2 = plain.integrate(s2, commands, 0.1)
+            np.testing.assert_allclose(s1[0], s2[0], atol=1e-8)
+            np.testing.assert_allclose(s1[1], s2[1], atol=1e-8)
+        self.assertTrue(cache.hits > 0)
+        self.assertTrue(len(cache) <= 4)
+        # changing a parameter invalidates the cache
+        cached.L = plain.L = 2
+        self.assertEqual(len(cache), 0)
+        s1 = cached.integrate(s1, commands_seq[1], 0.1)
+        s2 = plain.integrate(s2, commands_seq[1], 0.1)
+        np.testing.assert_allclose(s1[0], s2[0], atol=1e-8)
+
+    def test_parameters_read_only(self):
+        from vehicles_dynamics import EuclideanVel
+        max_velocity = np.array([1.0, 2.0])
+        dynamics = EuclideanVel(ndim=2, max_velocity=max_velocity)
+        cache = dynamics.enable_step_cache()
+        state = dynamics.pose2state(SE3.unity())
+        commands = np.array([1, 1])
+        dynamics.integrate(state, commands, 0.1)
+        self.assertEqual(len(cache), 1)
+        # in-place changes would leave stale steps in the cache
+        def change():
+            dynamics.max_velocity[0] = 2
+        self.assertRaises(ValueError, change)
+        max_velocity[0] = 2
+        self.assertEqual(dynamics.max_velocity[0], 1)
+        dynamics.max_velocity = np.array([2.0, 2.0])
+        self.assertEqual(len(cache), 0)
+        pose, _ = dynamics.integrate(state, commands, 0.1)
+        np.testing.assert_allclose(pose[:2, 2], [0.2, 0.2])
+
+    def test_sequence_parameters_read_only(self):
+        # parameters given as lists are stored as read-only arrays too
+        from vehicles_dynamics import SE2Dynamics, EuclideanForce
+        dynamics = SE2Dynamics(max_linear_velocity=[1, 1],
+                               max_angular_velocity=1)
+        dynamics.enable_step_cache()
+        state = dynamics.pose2state(SE3.unity())
+        commands = np.array([1, 0, 0])
+        dynamics.integrate(state, commands, 0.1)
+        def change():
+            dynamics.max_linear_velocity[0] = 5
+        self.assertRaises(ValueError, change)
+        dynamics.max_linear_velocity = np.array([5, 1])
+        pose, _ = dynamics.integrate(state, commands, 0.1)
+        self.assertAlmostEqual(pose[0, 2], 0.5)
+        force = EuclideanForce(ndim=2, max_force=[1, 2], mass=1, damping=0)
+        self.assertFalse(force.max_force.flags.writeable)
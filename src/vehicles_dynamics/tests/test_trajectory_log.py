@@ -0,0 +1,49 @@
+from geometry import SE3
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+
+
+class TrajectoryLogTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_streaming_roundtrip(self):
+        from vehicles_dynamics import (SimpleCar, TrajectoryWriter,
+                                       load_trajectory, trajectory_to_yaml)
+        dynamics = SimpleCar(max_linear_velocity=1, max_steering_angle=0.5, L=1,
+                             axis_dist=0.5)
+        state = dynamics.pose2state(SE3.unity())
+        commands_seq = np.tile([1, 0.3], (10, 1))
+        filename = os.path.join(self.tmpdir, 'log.npy')
+        with TrajectoryWriter.for_dynamics(filename, dynamics,
+                                           buffer_size=4) as log:
+            log.append(state)
+            for commands in commands_seq[:5]:
+                state = dynamics.integrate(state, commands, 0.1)
+                log.append(state, commands, 0.1)
+            log.flush()
+            # readable while it is still being written
+            self.assertEqual(load_trajectory(filename).shape, (6,))
+            poses, vels = dynamics.rollout(state, commands_seq[5:], 0.1)
+            log.append_many(poses[1:], vels[1:], commands_seq[5:], 0.1)
+
+        records = load_trajectory(filename)
+        self.assertIsInstance(records, np.memmap)
+        self.assertEqual(records.shape, (11,))
+        expected, _ = dynamics.rollout(dynamics.pose2state(SE3.unity()),
+                                       commands_seq, 0.1)
+        np.testing.assert_allclose(records['pose'], expected, atol=1e-12)
+        np.testing.assert_equal(records['dt'][1:], 0.1)
+        # slices are views on the file
+        self.assertIsInstance(records['pose'][3:7], np.memmap)
+
+        yaml = trajectory_to_yaml(dynamics, records[:2])
+        self.assertEqual(len(yaml), 2)
+        self.assertEqual(yaml[1]['commands'], [1, 0.3])
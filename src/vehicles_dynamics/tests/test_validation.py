@@ -0,0 +1,25 @@
+from geometry import SE3
+from utils import all_dynamics, random_commands
+import unittest
+import numpy as np
+
+
+class ValidationTest(unittest.TestCase):
+
+    def test_validation_levels(self):
+        # the trusted paths must give the same results as the checked ones
+        dt = 0.1
+        for dynamics in all_dynamics():
+            m = dynamics.get_commands_spec()['shape'][0]
+            commands = random_commands(dynamics, m)
+            state = dynamics.pose2state(SE3.unity())
+            results = []
+            for level in ['full', 'boundary-only', 'off']:
+                dynamics.set_validation_level(level)
+                state2 = dynamics.integrate(state, commands, dt)
+                state3 = dynamics.integrate(state2, commands, dt)
+                results.append(dynamics.joint_state(state3))
+            dynamics.set_validation_level(None)
+            for pose, vel in results[1:]:
+                np.testing.assert_allclose(pose, results[0][0], atol=1e-10)
+                np.testing.assert_allclose(vel, results[0][1], atol=1e-10)
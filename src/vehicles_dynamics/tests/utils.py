@@ -0,0 +1,39 @@
+'''
+    Helpers shared by the tests.
+'''
+import numpy as np
+
+
+def all_dynamics(dtype='float64'):
+    from vehicles_dynamics import (SimpleCar, DifferentialDrive, SE2Dynamics,
+        SE2Forward, SO3Vel, SO3Force, CircleVel, CircleForce, EuclideanVel,
+        EuclideanForce, DubinsCar, SE3Vel, SE3Force)
+    return [
+        SimpleCar(max_linear_velocity=1, max_steering_angle=0.5, L=1,
+                  axis_dist=0.5, dtype=dtype),
+        DubinsCar(max_linear_velocity=1, max_steering_angle=0.5, L=1,
+                  axis_dist=0.5, dtype=dtype),
+        DifferentialDrive(max_linear_velocity=1, max_angular_velocity=1,
+                          dtype=dtype),
+        SE2Dynamics(max_linear_velocity=[1, 2], max_angular_velocity=1,
+                    dtype=dtype),
+        SE2Forward(linear_velocity=1, max_angular_velocity=1, dtype=dtype),
+        SO3Vel(max_angular_velocity=[1, 2, 3], dtype=dtype),
+        SO3Force(max_force=[1, 2, 3], mass=2, damping=0.1, dtype=dtype),
+        CircleVel(max_velocity=2, dtype=dtype),
+        CircleForce(max_force=2, mass=1, damping=0.5, dtype=dtype),
+        EuclideanVel(ndim=1, max_velocity=[1], dtype=dtype),
+        EuclideanVel(ndim=3, max_velocity=[1, 2, 3], dtype=dtype),
+        EuclideanForce(ndim=2, max_force=[1, 2], mass=1, damping=0.1,
+                       dtype=dtype),
+        SE3Vel(max_angular_velocity=[1, 2, 3],
+               max_linear_velocity=[1, 1, 2], dtype=dtype),
+        SE3Force(max_force=[1, 2, 3, 1, 1, 2], mass=2, damping=0.1,
+                 dtype=dtype),
+    ]
+
+
+def random_commands(dynamics, shape):
+    ''' Random commands, valid for the dynamics (the array has the shape). '''
+    commands = np.random.uniform(-1, 1, shape)
+    return dynamics.get_commands_checker().clip(commands)
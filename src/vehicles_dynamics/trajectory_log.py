@@ -0,0 +1,181 @@
+'''
+    Binary trajectory logs.
+
+    A log is a standard .npy file containing a 1D array of records,
+    one per step, with the fields:
+
+        pose      the pose after the step
+        vel       the velocity after the step
+        commands  the commands used for the step
+        dt        the duration of the step (0 for the initial state)
+
+    It can be written incrementally (TrajectoryWriter) and read
+    back as a memory-mapped array (load_trajectory), so that slicing
+    does not copy the data.
+'''
+from . import contract, np
+from geometry import SE3
+import struct
+
+MAGIC = b'\x93NUMPY'
+# The header is written with room for a count this large, so that it
+# can be rewritten in place as records are appended.
+MAX_RECORDS = 10 ** 15
+
+
+@contract(pose_shape='seq(int)', vel_shape='seq(int)',
+          num_commands='int,>=0')
+def trajectory_dtype(pose_shape, vel_shape, num_commands):
+    ''' Returns the dtype of the records of a trajectory log. '''
+    return np.dtype([('pose', 'float64', tuple(pose_shape)),
+                     ('vel', 'float64', tuple(vel_shape)),
+                     ('commands', 'float64', (num_commands,)),
+                     ('dt', 'float64')])
+
+
+def _npy_header(dtype, count, length=None):
+    '''
+        Returns the .npy header for a 1D array with the given number
+        of records, padded to the given length if specified.
+    '''
+    d = {'descr': np.lib.format.dtype_to_descr(dtype),
+         'fortran_order': False,
+         'shape': (count,)}
+    text = repr(d).encode('latin1')
+    prefix = MAGIC + b'\x02\x00'
+    fixed = len(prefix) + 4 + 1 # 4 for the length, 1 for the newline
+    if length is None:
+        # align the data to 64 bytes
+        length = fixed + len(text)
+        length = ((length + 63) // 64) * 64
+    text = text + b' ' * (length - fixed - len(text)) + b'\n'
+    assert len(prefix) + 4 + len(text) == length
+    return prefix + struct.pack('<I', len(text)) + text
+
+
+class TrajectoryWriter(object):
+    '''
+        Appends trajectory records to a .npy file.
+
+        Records are buffered in memory and written in blocks of
+        *buffer_size*; the header (containing the number of records)
+        is updated at every flush(), so that the file is always a
+        valid .npy file containing the flushed records.
+
+        Example: ::
+
+            with TrajectoryWriter.for_dynamics(filename, dynamics) as log:
+                log.append(state)
+                for commands in commands_seq:
+                    state = dynamics.integrate(state, commands, dt)
+                    log.append(state, commands, dt)
+    '''
+
+    @contract(filename='str', buffer_size='int,>=1')
+    def __init__(self, filename, dtype, buffer_size=1024):
+        self.filename = filename
+        self.dtype = np.dtype(dtype)
+        self.count = 0
+        self._buffer = np.zeros(buffer_size, self.dtype)
+        self._buffered = 0
+        self._header_length = len(_npy_header(self.dtype, MAX_RECORDS))
+        self._file = open(filename, 'wb')
+        self._write_header()
+
+    @staticmethod
+    def for_dynamics(filename, dynamics, buffer_size=1024):
+        '''
+            Creates a writer for the states of the given dynamics,
+            which must be tuples (pose, vel).
+        '''
+        pose, vel = dynamics.pose2state(SE3.unity())
+        shape = dynamics.get_commands_spec()['shape']
+        dtype = trajectory_dtype(np.shape(pose), np.shape(vel),
+                                 int(np.prod(shape)))
+        return TrajectoryWriter(filename, dtype, buffer_size=buffer_size)
+
+    def append(self, state, commands=None, dt=0.0):
+        ''' Appends one record; commands=None means all zeros. '''
+        if self._buffered == self._buffer.size:
+            self._write_buffer()
+        record = self._buffer[self._buffered]
+        record['pose'], record['vel'] = state
+        if commands is None:
+            record['commands'] = 0
+        else:
+            record['commands'] = commands
+        record['dt'] = dt
+        self._buffered += 1
+
+    @contract(poses='array', vels='array')
+    def append_many(self, poses, vels, commands, dt):
+        '''
+            Appends N records at once, for example the output of
+            Dynamics.rollout(). *commands* is an array (N, m) and *dt*
+            a scalar or an array (N,).
+        '''
+        self._write_buffer()
+        records = np.zeros(poses.shape[0], self.dtype)
+        records['pose'] = poses
+        records['vel'] = vels
+        records['commands'] = commands
+        records['dt'] = dt
+        self._file.write(records.tobytes())
+        self.count += records.size
+
+    def flush(self):
+        ''' Writes the buffered records and updates the header. '''
+        self._write_buffer()
+        self._write_header()
+        self._file.flush()
+
+    def close(self):
+        if self._file is not None:
+            self.flush()
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _write_buffer(self):
+        if self._buffered > 0:
+            self._file.write(self._buffer[:self._buffered].tobytes())
+            self.count += self._buffered
+            self._buffered = 0
+
+    def _write_header(self):
+        position = self._file.tell()
+        self._file.seek(0)
+        self._file.write(_npy_header(self.dtype, self.count,
+                                     self._header_length))
+        if position > 0:
+            self._file.seek(position)
+
+
+@contract(filename='str', mmap='bool')
+def load_trajectory(filename, mmap=True):
+    '''
+        Loads a trajectory log. By default, the file is memory-mapped
+        (read-only), so that slices such as log['pose'][1000:2000]
+        do not copy the data.
+    '''
+    return np.load(filename, mmap_mode='r' if mmap else None)
+
+
+def trajectory_to_yaml(dynamics, records):
+    '''
+        Converts the records of a trajectory log to a list of dicts
+        with the YAML representation of the state, as given by
+        dynamics.state_to_yaml(), and the commands and dt.
+    '''
+    result = []
+    for record in records:
+        state = (np.array(record['pose']), np.array(record['vel']))
+        result.append({'state': dynamics.state_to_yaml(state),
+                       'commands': record['commands'].tolist(),
+                       'dt': float(record['dt'])})
+    return result
@@ -0,0 +1,95 @@
+'''
+    Validation levels, trading safety for speed in the hot path.
+
+    - 'full': every method checks its arguments (the default);
+    - 'boundary-only': only the entry points of bulk operations
+      (rollout(), integrate_batch()) check their inputs, once per call;
+      per-step methods trust their arguments;
+    - 'off': no checks at all.
+
+    The level can be set for the whole process, with
+    set_validation_level() or the environment variable
+    VEHICLES_DYNAMICS_VALIDATION, and overridden per instance
+    with Dynamics.set_validation_level().
+'''
+from . import contract
+import functools
+import os
+
+VALIDATION_OFF = 'off'
+VALIDATION_BOUNDARY = 'boundary-only'
+VALIDATION_FULL = 'full'
+
+# level -> rank; a check is done if the current rank is >= its rank
+validation_ranks = {VALIDATION_OFF: 0,
+                    VALIDATION_BOUNDARY: 1,
+                    VALIDATION_FULL: 2}
+
+ENV_VALIDATION = 'VEHICLES_DYNAMICS_VALIDATION'
+
+
+def validation_rank(level):
+    ''' Returns the rank of a validation level, checking that it is valid. '''
+    if not level in validation_ranks:
+        msg = ('Invalid validation level %r; expected one of %s.' %
+               (level, sorted(validation_ranks)))
+        raise ValueError(msg)
+    return validation_ranks[level]
+
+
+# Process-wide rank (in a list so that it can be updated in place).
+_process_rank = [validation_rank(os.environ.get(ENV_VALIDATION,
+                                                VALIDATION_FULL))]
+
+
+def set_validation_level(level):
+    ''' Sets the process-wide validation level. '''
+    _process_rank[0] = validation_rank(level)
+
+
+def get_validation_level():
+    ''' Returns the process-wide validation level. '''
+    return validation_level_from_rank(_process_rank[0])
+
+
+def validation_level_from_rank(rank):
+    for level, r in validation_ranks.items():
+        if r == rank:
+            return level
+    assert False
+
+
+def validation_enabled(instance_rank, level):
+    '''
+        Returns True if checks at the given level are enabled for an 
+        instance with the given rank (None means the process default).
+    '''
+    if instance_rank is None:
+        instance_rank = _process_rank[0]
+    return instance_rank >= validation_ranks[level]
+
+
+def contract_at(level, **contracts):
+    '''
+        Like @contract, but for methods of Dynamics: the contracts
+        are checked only if the validation level of the instance
+        is at least *level*.
+    '''
+    needed = validation_rank(level)
+
+    def decorator(f):
+        checked = contract(**contracts)(f)
+
+        @functools.wraps(f)
+        def wrapper(self, *args, **kwargs):
+            rank = self._validation_rank
+            if rank is None:
+                rank = _process_rank[0]
+            if rank >= needed:
+                return checked(self, *args, **kwargs)
+            else:
+                return f(self, *args, **kwargs)
+
+        return wrapper
+
+    return decorator